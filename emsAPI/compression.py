@@ -0,0 +1,161 @@
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULTS = {
+    'MIN_SIZE': 860,
+    'PREFERENCE': ['br', 'zstd', 'gzip'],
+    'LEVELS': {'gzip': 6, 'br': 4, 'zstd': 3},
+    'STREAMING_CHUNK_SIZE': 16 * 1024,
+    'SKIP_CONTENT_TYPES': ['text/event-stream', 'image/', 'video/', 'audio/', 'application/zip'],
+}
+
+
+class GzipCodec:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCodec:
+    encoding = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdCodec:
+    encoding = 'zstd'
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+CODECS = {'gzip': GzipCodec}
+if brotli is not None:
+    CODECS['br'] = BrotliCodec
+if zstandard is not None:
+    CODECS['zstd'] = ZstdCodec
+
+
+def get_options(overrides=None):
+    options = {**DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+    if overrides:
+        levels = {**options['LEVELS'], **overrides.get('LEVELS', {})}
+        options.update(overrides, LEVELS=levels)
+    return options
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, preference):
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in preference:
+        if encoding not in CODECS:
+            continue
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(encoding, level, data):
+    codec = CODECS[encoding](level)
+    return codec.compress(data) + codec.finish()
+
+
+def compress_chunks(codec, chunks, chunk_size):
+    """Compress an iterable incrementally, flushing once `chunk_size` bytes are buffered."""
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        output = codec.compress(chunk)
+        pending += len(chunk)
+        if pending >= chunk_size:
+            output += codec.flush()
+            pending = 0
+        if output:
+            yield output
+    yield codec.finish()
+
+
+async def compress_async_chunks(codec, chunks, chunk_size):
+    pending = 0
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        output = codec.compress(chunk)
+        pending += len(chunk)
+        if pending >= chunk_size:
+            output += codec.flush()
+            pending = 0
+        if output:
+            yield output
+    yield codec.finish()
+
+
+def compression(enabled=True, **overrides):
+    """Per-view compression options, e.g. ``@compression(MIN_SIZE=0, LEVELS={'gzip': 9})``."""
+    def decorator(view_func):
+        view_func.compression = overrides if enabled else False
+        return view_func
+    return decorator
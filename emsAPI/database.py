@@ -0,0 +1,69 @@
+import os
+
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',
+]
+
+
+def sqlite_database(name, tuned=False, foreign_keys=True):
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+    }
+    pragmas = list(SQLITE_PRAGMAS) if tuned else []
+    if not foreign_keys:
+        # Shards: their rows reference events and users kept on the primary.
+        pragmas.append('PRAGMA foreign_keys=OFF')
+    if tuned:
+        config.update({
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Take the write lock up front so concurrent writers queue on
+                # the busy timeout instead of failing on a lock upgrade.
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        })
+    if pragmas:
+        config.setdefault('OPTIONS', {})['init_command'] = ';'.join(pragmas)
+    return config
+
+
+def postgres_database(prefix='EMS_PG'):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get(f'{prefix}_NAME', 'ems'),
+        'USER': os.environ.get(f'{prefix}_USER', 'ems'),
+        'PASSWORD': os.environ.get(f'{prefix}_PASSWORD', ''),
+        'HOST': os.environ.get(f'{prefix}_HOST', 'localhost'),
+        'PORT': os.environ.get(f'{prefix}_PORT', '5432'),
+        # psycopg's pool owns connection reuse, so CONN_MAX_AGE must stay 0.
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get(f'{prefix}_POOL_MIN', 2)),
+                'max_size': int(os.environ.get(f'{prefix}_POOL_MAX', 10)),
+                'timeout': 10,
+            },
+        },
+    }
+
+
+def database_profile(profile, base_dir):
+    if profile == 'postgres-pooled':
+        return postgres_database()
+    return sqlite_database(base_dir / 'db.sqlite3', tuned=profile == 'sqlite-tuned')
+
+
+def register_database(alias, config):
+    """Add a connection alias at runtime (benchmarks and tests)."""
+    from django.db import connections
+
+    databases = {'default': connections.settings['default'], alias: config}
+    connections.settings[alias] = connections.configure_settings(databases)[alias]
@@ -0,0 +1,99 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# Backends whose entries only the process that wrote them can see.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Alias that reads should use for the current request: None means "primary",
+# anything else is a replica chosen once so a request sees a single snapshot.
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def begin_request(allow_replicas):
+    replicas = get_replicas()
+    alias = random.choice(replicas) if allow_replicas and replicas else None
+    return _read_alias.set(alias)
+
+
+def end_request(token):
+    _read_alias.reset(token)
+
+
+def use_primary():
+    _read_alias.set(None)
+
+
+def _pin_key(user_id):
+    return f'db-routing:pin:{user_id}'
+
+
+def pin_user(user_id):
+    """Send this user's reads to the primary for a short window after a write."""
+    use_primary()
+    if get_replicas():
+        cache.set(_pin_key(user_id), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+
+
+def is_user_pinned(user_id):
+    return bool(get_replicas()) and cache.get(_pin_key(user_id), False)
+
+
+def cache_is_process_local(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+@checks.register(checks.Tags.caches, checks.Tags.database)
+def check_pin_cache(app_configs, **kwargs):
+    if not get_replicas() or not cache_is_process_local():
+        return []
+    return [checks.Error(
+        'Read replicas are configured but the default cache is local to each process.',
+        hint=(
+            'A write handled by one worker would not pin the user to the primary on the others. '
+            'Set EMS_REDIS_URL (or another shared CACHES backend), or add emsAPI.E001 to '
+            'SILENCED_SYSTEM_CHECKS when running a single process.'
+        ),
+        id='emsAPI.E001',
+    )]
+
+
+class ReplicaRouter:
+    # Returning None defers to Django's default: the hinted instance's database,
+    # otherwise the primary.
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[PRIMARY].in_atomic_block:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, PRIMARY, alias):
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Anything read after a write in the same request must see that write.
+        use_primary()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {PRIMARY, *get_replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
@@ -0,0 +1,13 @@
+import re
+
+from django.views.static import serve
+
+# Paths that embed a sha256 never change content, so clients may cache them forever.
+HASHED_PATH = re.compile(r'(^|/)[0-9a-f]{64}/')
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if HASHED_PATH.search(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,84 @@
+from django.utils.cache import patch_vary_headers
+
+from . import db_routers
+from .compression import (
+    CODECS, compress_async_chunks, compress_bytes, compress_chunks, get_options, negotiate,
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli/zstd compression; streaming responses are compressed chunk by chunk."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        request._compression = getattr(
+            view_func, 'compression', getattr(view_class, 'compression', None)
+        )
+
+    def process_response(self, request, response):
+        overrides = getattr(request, '_compression', None)
+        if overrides is False or response.has_header('Content-Encoding'):
+            return response
+
+        options = get_options(overrides)
+        content_type = response.get('Content-Type', '')
+        if any(content_type.startswith(skipped) for skipped in options['SKIP_CONTENT_TYPES']):
+            return response
+        if not response.streaming and len(response.content) < options['MIN_SIZE']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), options['PREFERENCE']
+        )
+        if encoding is None:
+            return response
+        level = options['LEVELS'][encoding]
+
+        if response.streaming:
+            codec = CODECS[encoding](level)
+            chunk_size = options['STREAMING_CHUNK_SIZE']
+            if response.is_async:
+                response.streaming_content = compress_async_chunks(
+                    codec, response.streaming_content, chunk_size
+                )
+            else:
+                response.streaming_content = compress_chunks(
+                    codec, response.streaming_content, chunk_size
+                )
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_bytes(encoding, level, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests read from a replica; everything else stays on the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_routers.begin_request(request.method in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            db_routers.end_request(token)
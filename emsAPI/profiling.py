@@ -0,0 +1,208 @@
+"""Opt-in statistical profiling of API views, saved as collapsed stacks."""
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Requests from staff users with this header are always profiled.
+    'HEADER': 'HTTP_X_PROFILE',
+    # Fraction of all requests profiled, regardless of who sent them.
+    'SAMPLE_RATE': 0.0,
+    'INTERVAL': 0.002,
+    'DIRECTORY': None,
+    # Profiled requests running at once per process; others run unprofiled.
+    'MAX_CONCURRENT': 2,
+}
+
+
+def get_option(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def get_directory():
+    return Path(get_option('DIRECTORY') or Path(settings.BASE_DIR) / 'profiles')
+
+
+@lru_cache(maxsize=1)
+def path_prefixes():
+    return sorted({str(settings.BASE_DIR), *filter(None, sys.path)}, key=len, reverse=True)
+
+
+@lru_cache(maxsize=8192)
+def frame_label(code):
+    filename = code.co_filename
+    for prefix in path_prefixes():
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def collapse(frame, root):
+    """Semicolon-joined stack from `root` (exclusive) down to `frame`."""
+    names = []
+    while frame is not None and frame is not root:
+        names.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Samples one thread's stack from a background thread."""
+
+    def __init__(self, thread_id, root, interval):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame, self.root)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def read_stacks(path, totals):
+    for line in path.read_text().splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack and count.isdigit():
+            totals[stack] += int(count)
+    return totals
+
+
+def format_stacks(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+class ProfileStore:
+    """Accumulates samples in one file per (label, worker process)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def try_begin(self):
+        with self._lock:
+            if self.active >= get_option('MAX_CONCURRENT'):
+                return False
+            self.active += 1
+            return True
+
+    def end(self):
+        with self._lock:
+            self.active -= 1
+
+    def record(self, label, stacks):
+        directory = get_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{label}.{os.getpid()}.folded'
+        with self._lock:
+            totals = read_stacks(path, Counter()) if path.exists() else Counter()
+            totals.update(stacks)
+            partial = path.with_suffix('.part')
+            partial.write_text(format_stacks(totals))
+            os.replace(partial, path)
+
+
+store = ProfileStore()
+
+
+def labels():
+    return sorted({path.name.rsplit('.', 2)[0] for path in get_directory().glob('*.folded')})
+
+
+def merged_stacks(label=None):
+    """Collapsed stacks summed over every worker's file (and every label if none is given)."""
+    totals = Counter()
+    pattern = f'{label}.*.folded' if label else '*.folded'
+    for path in get_directory().glob(pattern):
+        read_stacks(path, totals)
+    return totals
+
+
+def clear_profiles(label=None):
+    for path in get_directory().glob(f'{label}.*.folded' if label else '*.folded'):
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMixin:
+    """Sample the stack of staff requests sent with HEADER, and of a SAMPLE_RATE share of all requests."""
+
+    _sampler = None
+    _profile_requested = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if not get_option('ENABLED'):
+            return super().dispatch(request, *args, **kwargs)
+        self._profile_root = sys._getframe()
+        self._profile_requested = get_option('HEADER') in request.META
+        rate = get_option('SAMPLE_RATE')
+        if rate and random.random() < rate:
+            self.start_sampler()
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            sampler, self._sampler = self._sampler, None
+            if sampler is not None:
+                stacks = sampler.stop()
+                store.end()
+        if sampler is not None:
+            action = getattr(self, 'action', None) or request.method.lower()
+            store.record(f'{self.__class__.__name__}.{action}', stacks)
+            if self._profile_requested:
+                response['X-Profile-Samples'] = str(sum(stacks.values()))
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # The header only counts once authentication has shown the user is staff.
+        if self._sampler is None and self._profile_requested and request.user.is_staff:
+            self.start_sampler()
+
+    def start_sampler(self):
+        if store.try_begin():
+            self._sampler = StackSampler(threading.get_ident(), self._profile_root, get_option('INTERVAL'))
+            self._sampler.start()
+
+
+class ProfileView(APIView):
+    """Staff-only: list profiled labels, download merged collapsed stacks, or clear them."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, label=None):
+        if label is None:
+            return Response({'labels': labels()})
+        stacks = merged_stacks(label)
+        if not stacks:
+            return Response({'error': 'No samples recorded for this label'}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(format_stacks(stacks), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{label}.folded"'
+        return response
+
+    def delete(self, request, label=None):
+        clear_profiles(label)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,79 @@
+from datetime import timezone
+
+import cbor2
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_fallback_encoder = JSONEncoder()
+
+
+def _cbor_default(encoder, value):
+    if isinstance(value, Promise):
+        encoder.encode(str(value))
+    else:
+        encoder.encode(_fallback_encoder.default(value))
+
+
+class CBORRenderer(BaseRenderer):
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return cbor2.dumps(
+            data,
+            datetime_as_timestamp=True,
+            timezone=timezone.utc,
+            default=_cbor_default,
+        )
+
+
+class CBORParser(BaseParser):
+    media_type = 'application/cbor'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.load(stream)
+        except (cbor2.CBORDecodeError, EOFError) as exc:
+            raise ParseError(f'CBOR parse error - {exc}')
+
+
+def _msgpack_default(value):
+    if isinstance(value, Promise):
+        return str(value)
+    return _fallback_encoder.default(value)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, datetime=True, default=_msgpack_default)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), timestamp=3)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+
@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
+from .database import database_profile, sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +51,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'emsAPI.middleware.CompressionMiddleware',
+    'emsAPI.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,13 +84,56 @@ WSGI_APPLICATION = 'emsAPI.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# EMS_DB_PROFILE selects one of the profiles in emsAPI/database.py:
+#   development     - plain SQLite, a new connection per request (default)
+#   sqlite-tuned    - SQLite in WAL mode with persistent connections and a busy timeout
+#   postgres-pooled - PostgreSQL through psycopg's connection pool (EMS_PG_* variables)
+DATABASE_PROFILE = os.environ.get('EMS_DB_PROFILE', 'development')
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_profile(DATABASE_PROFILE, BASE_DIR),
 }
 
+# Read replicas: EMS_DB_REPLICAS is a comma-separated list of SQLite files
+# (refresh them locally with `manage.py sync_sqlite_replicas`). Safe requests
+# read from one of them; writes, and a user's reads for REPLICA_STICKY_SECONDS
+# after their own write, go to the primary.
+DATABASE_REPLICAS = []
+for index, replica_name in enumerate(filter(None, os.environ.get('EMS_DB_REPLICAS', '').split(','))):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {
+        **sqlite_database(replica_name.strip(), tuned=DATABASE_PROFILE == 'sqlite-tuned'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# RSVP and Review sharding (events.sharding): EMS_RSVP_SHARDS is a
+# comma-separated list of SQLite files. Each event's RSVPs and reviews are
+# stored on one shard picked by a hash of its id; prepare the files with
+# `manage.py setup_shards`. The list's length and order are part of that
+# mapping, so change them only together with `setup_shards --rebalance`.
+RSVP_SHARDS = []
+for index, shard_name in enumerate(filter(None, os.environ.get('EMS_RSVP_SHARDS', '').split(','))):
+    alias = f'shard_{index + 1}'
+    DATABASES[alias] = sqlite_database(
+        shard_name.strip(), tuned=DATABASE_PROFILE == 'sqlite-tuned', foreign_keys=False
+    )
+    RSVP_SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['events.sharding.ShardRouter', 'emsAPI.db_routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
+
+# The replica pin, like the other cached state, must be visible to every
+# worker: EMS_REDIS_URL switches the default cache from the per-process
+# LocMemCache to Redis (needs the `redis` package).
+if os.environ.get('EMS_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['EMS_REDIS_URL'],
+        },
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,15 +173,135 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Response compression (emsAPI.middleware.CompressionMiddleware)
+# Views can override any of these with a `compression` attribute or the
+# emsAPI.compression.compression() decorator; `False` disables it.
+COMPRESSION = {
+    'MIN_SIZE': 860,
+    'PREFERENCE': ['br', 'zstd', 'gzip'],
+    'LEVELS': {'gzip': 6, 'br': 4, 'zstd': 3},
+    'STREAMING_CHUNK_SIZE': 16 * 1024,
+}
+
+# Offline gazetteer used to geocode Event.location (name,latitude,longitude CSV)
+EVENT_GAZETTEER_PATH = BASE_DIR / 'events' / 'data' / 'gazetteer.csv'
+
+# Deleted events are hidden at once and purged in batches by a background thread.
+EVENT_PURGE_ASYNC = True
+EVENT_PURGE_BATCH_SIZE = 500
+
+# Idempotency-Key support on event/RSVP/review writes: how long responses are
+# replayed, and when an unfinished request's key may be claimed again.
+IDEMPOTENCY = {
+    'TTL': timedelta(hours=24),
+    'LOCK_TIMEOUT': timedelta(seconds=60),
+}
+
+# Live RSVP count stream (/api/events/{id}/live/). With several ASGI workers,
+# set BACKEND to 'events.live.RedisBackend' so writes reach every worker.
+LIVE_EVENTS = {
+    'BACKEND': os.environ.get('EMS_LIVE_BACKEND', 'events.live.LocalBackend'),
+    'REDIS_URL': os.environ.get('EMS_REDIS_URL', 'redis://localhost:6379/0'),
+    'COALESCE_SECONDS': 0.25,
+    'HEARTBEAT_SECONDS': 15,
+}
+
+# Signed door tickets for "Going" RSVPs (events.tickets). PRIVATE_KEY is an
+# Ed25519 PEM from `manage.py generate_ticket_key`; without it a key derived
+# from SECRET_KEY is used. MAX_BATCH caps one bulk check-in upload.
+TICKETS = {
+    'PRIVATE_KEY': os.environ.get('EMS_TICKET_PRIVATE_KEY'),
+    'MAX_BATCH': 500,
+}
+
+# "Events for you" (events.recommendations), rebuilt offline by
+# `manage.py build_recommendations`: TOP_K events per user from RSVPs updated
+# in the last LOOKBACK_DAYS.
+RECOMMENDATIONS = {
+    'TOP_K': 50,
+    'MAYBE_WEIGHT': 0.5,
+    'ORGANIZER_WEIGHT': 0.5,
+    'NEIGHBOURS': 100,
+    'LOOKBACK_DAYS': 365,
+    'BATCH_SIZE': 5000,
+}
+
+# Per-user iCalendar feeds (events.ical). Unchanged feeds answer 304 from the
+# ETag; VEVENTs are cached per event version and documents up to
+# DOCUMENT_MAX_BYTES whole, larger ones are streamed CHUNK_SIZE events at a time.
+CALENDAR = {
+    'UID_DOMAIN': os.environ.get('EMS_CALENDAR_UID_DOMAIN', 'ems.local'),
+    'MAX_AGE': 300,
+    'CHUNK_SIZE': 200,
+    'DOCUMENT_MAX_BYTES': 1_000_000,
+    'DOCUMENT_TIMEOUT': 3600,
+    'EVENTS_TIMEOUT': 86400,
+    'VEVENT_TIMEOUT': 7 * 86400,
+}
+
+# Profile picture variants: square crops per size in each format, rendered by
+# a process pool (ASYNC=False renders them inline during the request).
+PROFILE_PICTURES = {
+    'SIZES': {'small': 64, 'medium': 256, 'large': 512},
+    'FORMATS': ['webp', 'jpeg'],
+    'MAX_PIXELS': 40_000_000,
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+
+# Admin changelists for large tables (emsAPI.changelist): exact counts up to
+# COUNT_LIMIT rows, estimates beyond; bulk actions and exports work in chunks.
+ADMIN_PERFORMANCE = {
+    'ENABLED': True,
+    'COUNT_LIMIT': 10_000,
+    'CHUNK_SIZE': 2_000,
+}
+
+# Counts on paginated event/RSVP/review listings (events.counts): listings
+# without a maintained counter count at most ESTIMATE_LIMIT rows; ?exact_count=true
+# results are reused for CACHE_TIMEOUT seconds.
+PAGINATION_COUNTS = {
+    'ESTIMATE_LIMIT': 1000,
+    'CACHE_TIMEOUT': 300,
+    'COUNTER_TIMEOUT': 3600,
+}
+
+# Statistical profiling of EventViewSet/RSVPViewSet (emsAPI.profiling): staff
+# requests sending `X-Profile: 1`, plus SAMPLE_RATE of all requests, are
+# sampled into collapsed stacks under DIRECTORY.
+PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': float(os.environ.get('EMS_PROFILE_SAMPLE_RATE', '0')),
+    'INTERVAL': 0.002,
+    'DIRECTORY': BASE_DIR / 'profiles',
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework Configuration
+# CBOR is always available (cbor2 is pinned); MessagePack is offered only when
+# the optional `msgpack` package is installed.
+API_RENDERER_CLASSES = [
+    'rest_framework.renderers.JSONRenderer',
+    'rest_framework.renderers.BrowsableAPIRenderer',
+    'emsAPI.renderers.CBORRenderer',
+]
+API_PARSER_CLASSES = [
+    'rest_framework.parsers.JSONParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+    'emsAPI.renderers.CBORParser',
+]
+if find_spec('msgpack') is not None:
+    API_RENDERER_CLASSES.append('emsAPI.renderers.MessagePackRenderer')
+    API_PARSER_CLASSES.append('emsAPI.renderers.MessagePackParser')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ReplicaAwareJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -145,12 +313,50 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': API_RENDERER_CLASSES,
+    'DEFAULT_PARSER_CLASSES': API_PARSER_CLASSES,
+    # Serializers hand datetimes to the renderer untouched: JSON still gets
+    # ISO 8601 strings, binary formats encode them as compact timestamps.
+    'DATETIME_FORMAT': None,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'emsAPI.throttling.AnonBucketThrottle',
+        'emsAPI.throttling.UserBucketThrottle',
+        'emsAPI.throttling.SearchBucketThrottle',
+        'emsAPI.throttling.WriteBucketThrottle',
+    ],
+    # Token buckets: the number is also the burst size.
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'search': '60/min',
+        'write': '120/min',
+        'token': '10/min',
+    },
+}
+
+# Per-process concurrency limit; see emsAPI.throttling.AdmissionControlMixin.
+ADMISSION_CONTROL = {
+    'ENABLED': True,
+    'MAX_CONCURRENCY': int(os.environ.get('EMS_MAX_CONCURRENCY', 32)),
+    'SHARES': {'low': 0.5, 'normal': 0.8, 'high': 1.0},
+    'RETRY_AFTER': 1,
 }
 
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=49),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-    'ROTATE_REFRESH_TOKENS': False,
+    # Every refresh returns a new refresh token and revokes the one presented
+    # (users.revocation); simplejwt's token_blacklist app is not used.
+    'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.RotatingTokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'users.serializers.RevokeTokenSerializer',
+}
+
+# Revoked refresh tokens are checked through a per-process Bloom filter,
+# rebuilt from the RevokedToken table every REBUILD_SECONDS.
+TOKEN_REVOCATION = {
+    'FALSE_POSITIVE_RATE': 0.001,
+    'REBUILD_SECONDS': 300,
 }
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""Query-count and latency budgets for the API regression suites."""
+import difflib
+import json
+import os
+import re
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Allowed latency is budget * (1 + tolerance); raise it on slow or shared machines.
+LATENCY_TOLERANCE = float(os.environ.get('PERF_LATENCY_TOLERANCE', '1.0'))
+LATENCY_RUNS = int(os.environ.get('PERF_LATENCY_RUNS', '5'))
+UPDATE_BASELINES = os.environ.get('UPDATE_QUERY_BASELINES') == '1'
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE_LIST = re.compile(r'\(\?(?:, \?)+\)')
+SAVEPOINT = re.compile(r'SAVEPOINT "[^"]+"')
+
+
+@dataclass
+class Case:
+    """One request against one route, with its budgets."""
+
+    route: str
+    method: str
+    path: str
+    status: int
+    queries: int
+    user: Optional[str] = None
+    data: dict = field(default_factory=dict)
+    format: str = 'json'
+    latency_ms: Optional[float] = None
+    # Tells apart several cases for the same route and method.
+    label: str = ''
+
+    @property
+    def name(self):
+        return f'{self.method} {self.route}' + (f' [{self.label}]' if self.label else '')
+
+
+def normalize_sql(sql):
+    """Replace literals so the same query with different ids compares equal."""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = SAVEPOINT.sub('SAVEPOINT ?', sql)
+    return VALUE_LIST.sub('(?, ...)', sql)
+
+
+def query_report(name, budget, actual, baseline):
+    lines = [f'{name}: {len(actual)} queries, budget {budget}.']
+    if baseline is not None:
+        lines.append(f'Diff against the {len(baseline)} recorded baseline queries:')
+        lines.extend(difflib.unified_diff(baseline, actual, 'baseline', 'actual', lineterm='', n=1))
+    else:
+        lines.append('No baseline recorded; queries issued:')
+        lines.extend(f'  {sql}' for sql in actual)
+    repeated = [(sql, count) for sql, count in Counter(actual).most_common() if count > 1]
+    if repeated:
+        lines.append('Repeated queries (likely N+1):')
+        lines.extend(f'  {count}x {sql}' for sql, count in repeated)
+    return '\n'.join(lines)
+
+
+def route_names(urlconf):
+    """Every named URL pattern reachable from a urlconf module."""
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.add(pattern.name)
+
+    walk(get_resolver(urlconf).url_patterns)
+    return names
+
+
+class BudgetTestMixin:
+    """Mixed into a TestCase: runs `cases()` with a cold cache, each against the untouched fixture."""
+
+    urlconf = None
+    baseline_path = None
+    users = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.recorded = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINES and cls.baseline_path and cls.recorded:
+            baselines = cls.load_baselines()
+            baselines.update(cls.recorded)
+            with open(cls.baseline_path, 'w') as handle:
+                json.dump(dict(sorted(baselines.items())), handle, indent=2)
+                handle.write('\n')
+        super().tearDownClass()
+
+    @classmethod
+    def load_baselines(cls):
+        if not cls.baseline_path or not os.path.exists(cls.baseline_path):
+            return {}
+        with open(cls.baseline_path) as handle:
+            return json.load(handle)
+
+    def cases(self):
+        return []
+
+    def authorization(self, user):
+        return f'Bearer {AccessToken.for_user(self.users[user])}'
+
+    def request(self, case):
+        headers = {}
+        if case.user:
+            headers['HTTP_AUTHORIZATION'] = self.authorization(case.user)
+        if case.method == 'GET':
+            return self.client.get(case.path, case.data, **headers)
+        if case.format == 'multipart':
+            body, content_type = encode_multipart(BOUNDARY, case.data), MULTIPART_CONTENT
+        else:
+            body, content_type = json.dumps(case.data, cls=DjangoJSONEncoder), 'application/json'
+        return self.client.generic(case.method, case.path, body, content_type, **headers)
+
+    def run_case(self, case):
+        cache.clear()
+        savepoint = transaction.savepoint()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.request(case)
+                # Streamed bodies do their queries as they are read.
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        self.assertEqual(
+            response.status_code, case.status,
+            f'{case.name}: expected {case.status}, got {response.status_code}: {body[:300]!r}'
+        )
+        actual = [normalize_sql(query['sql']) for query in captured.captured_queries]
+        if UPDATE_BASELINES:
+            self.recorded[case.name] = actual
+        if len(actual) > case.queries:
+            self.fail(query_report(case.name, case.queries, actual, self.load_baselines().get(case.name)))
+        return response
+
+    def time_case(self, case):
+        def call():
+            savepoint = transaction.savepoint()
+            try:
+                response = self.request(case)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            finally:
+                transaction.savepoint_rollback(savepoint)
+
+        call()
+        timings = []
+        for _ in range(LATENCY_RUNS):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(timings)
+        allowed = case.latency_ms * (1 + LATENCY_TOLERANCE)
+        if median > allowed:
+            self.fail(
+                f'{case.name}: median {median:.1f} ms over {LATENCY_RUNS} runs exceeds the '
+                f'{case.latency_ms:g} ms budget (+{LATENCY_TOLERANCE:.0%} tolerance = {allowed:.1f} ms)'
+            )
+
+    def test_query_budgets(self):
+        for case in self.cases():
+            with self.subTest(case.name):
+                self.run_case(case)
+
+    def test_latency_budgets(self):
+        for case in self.cases():
+            if case.latency_ms is not None:
+                with self.subTest(case.name):
+                    self.time_case(case)
+
+    def test_every_route_has_a_budget(self):
+        if self.urlconf is None:
+            return
+        missing = route_names(self.urlconf) - {case.route for case in self.cases()}
+        self.assertFalse(missing, f'Routes without a query budget: {sorted(missing)}')
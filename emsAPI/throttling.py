@@ -0,0 +1,176 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'120/min' -> (capacity, tokens per second)."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), int(num) / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Cache-backed token bucket per (scope, client); not atomic across workers."""
+
+    scope = None
+    cache_format = 'throttle:bucket:{scope}:{ident}'
+
+    def applies(self, request, view):
+        return True
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_rate(self):
+        # Read on every request (not at import) so rates can be tuned in settings and tests.
+        return parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        rate = self.get_rate()
+        if rate is None or not self.applies(request, view):
+            return True
+        capacity, refill = rate
+        key = self.cache_format.format(scope=self.scope, ident=self.get_ident_key(request))
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.wait_seconds = (1 - tokens) / refill
+        # Expire once the bucket would be full again anyway.
+        cache.set(key, (tokens, now), int(capacity / refill) + 1)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonBucketThrottle(TokenBucketThrottle):
+    scope = 'anon'
+
+    def applies(self, request, view):
+        return not request.user.is_authenticated
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def applies(self, request, view):
+        return request.user.is_authenticated
+
+
+class SearchBucketThrottle(TokenBucketThrottle):
+    """Expensive reads: full-text ?search= queries and deep page numbers."""
+
+    scope = 'search'
+    deep_page = 20
+
+    def applies(self, request, view):
+        if request.method not in SAFE_METHODS:
+            return False
+        if request.query_params.get('search'):
+            return True
+        page = request.query_params.get('page', '')
+        return page.isdigit() and int(page) > self.deep_page
+
+
+class WriteBucketThrottle(TokenBucketThrottle):
+    scope = 'write'
+
+    def applies(self, request, view):
+        return request.method not in SAFE_METHODS
+
+
+class TokenObtainBucketThrottle(TokenBucketThrottle):
+    """Login attempts, keyed by client address since nobody is authenticated yet."""
+
+    scope = 'token'
+
+    def get_ident_key(self, request):
+        return f'ip:{self.get_ident(request)}'
+
+
+ADMISSION_DEFAULTS = {
+    'ENABLED': True,
+    'MAX_CONCURRENCY': 32,
+    # Share of MAX_CONCURRENCY each priority may fill: low-priority reads are
+    # turned away first, leaving headroom for writes.
+    'SHARES': {'low': 0.5, 'normal': 0.8, 'high': 1.0},
+    'RETRY_AFTER': 1,
+}
+
+
+def get_admission_option(name):
+    return getattr(settings, 'ADMISSION_CONTROL', {}).get(name, ADMISSION_DEFAULTS[name])
+
+
+class AdmissionController:
+    """Per-process count of requests in flight, admitted by priority."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def acquire(self, priority):
+        limit = get_admission_option('MAX_CONCURRENCY') * get_admission_option('SHARES')[priority]
+        with self._lock:
+            if self.in_flight >= max(1, int(limit)):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+admission = AdmissionController()
+
+
+class AdmissionControlMixin:
+    """Turn requests away with 429, lowest priority first, once too many are in flight."""
+
+    admission_priorities = {}
+    admission_priority = None
+
+    def get_admission_priority(self, request):
+        action = getattr(self, 'action', None)
+        if action in self.admission_priorities:
+            return self.admission_priorities[action]
+        if self.admission_priority:
+            return self.admission_priority
+        return 'normal' if request.method in SAFE_METHODS else 'high'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not get_admission_option('ENABLED'):
+            return
+        if not admission.acquire(self.get_admission_priority(request)):
+            raise Throttled(
+                wait=get_admission_option('RETRY_AFTER'),
+                detail='The server is busy; please retry shortly.',
+            )
+        self._admitted = True
+
+    def dispatch(self, request, *args, **kwargs):
+        self._admitted = False
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._admitted:
+                admission.release()
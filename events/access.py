@@ -0,0 +1,74 @@
+from django.db import models
+from django.db.models.functions import Coalesce
+
+from .models import Invitation
+
+
+def access_key(event):
+    return event.series_id or event.pk
+
+
+class EventAccessResolver:
+    """Answers "may this user see this event?" for one request, with one Invitation query per batch."""
+
+    def __init__(self, user):
+        self.user = user
+        self._invited = {}
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None and self.user.is_authenticated
+
+    def visibility_filter(self):
+        if not self.is_authenticated:
+            return models.Q(is_public=True)
+        # Occurrences of a recurring series share the series' invitations.
+        invited = Invitation.objects.filter(
+            event=Coalesce(models.OuterRef('series_id'), models.OuterRef('pk')), user=self.user
+        )
+        return (
+            models.Q(is_public=True)
+            | models.Q(organizer=self.user)
+            | models.Q(models.Exists(invited))
+        )
+
+    def prime(self, events):
+        if not self.is_authenticated:
+            return
+        unknown = {
+            access_key(event) for event in events
+            if not event.is_public
+            and event.organizer_id != self.user.pk
+            and access_key(event) not in self._invited
+        }
+        if not unknown:
+            return
+        invited = set(
+            Invitation.objects.filter(user=self.user, event_id__in=unknown)
+            .values_list('event_id', flat=True)
+        )
+        for event_id in unknown:
+            self._invited[event_id] = event_id in invited
+
+    def can_view(self, event):
+        if event.is_public:
+            return True
+        if not self.is_authenticated:
+            return False
+        if event.organizer_id == self.user.pk:
+            return True
+        self.prime([event])
+        return self._invited[access_key(event)]
+
+    def visible(self, events):
+        events = list(events)
+        self.prime(events)
+        return [event for event in events if self.can_view(event)]
+
+
+def get_access_resolver(request):
+    resolver = getattr(request, '_event_access_resolver', None)
+    if resolver is None or resolver.user is not request.user:
+        resolver = EventAccessResolver(request.user)
+        request._event_access_resolver = resolver
+    return resolver
@@ -1,20 +1,144 @@
+from collections import Counter
+
 from django.contrib import admin
-from .models import Event, RSVP, Review
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from emsAPI.changelist import PerformanceAdminMixin, iterate_chunks
+from users.models import UserProfile, normalize_search, prefix_q
+from .archive import soft_delete
+from . import tickets
+from .live import publish_rsvp_change
+from .models import (
+    Event, EventStatsBucket, RSVP, Review, calendar_events_key, record_event_stats, revoke_tickets,
+)
+from .sharding import get_shards
+
+# Admin search matches prefixes of the indexed, case-folded columns (or an id)
+# instead of LIKE-scanning joined tables.
+
+def users_with_prefix(term):
+    return UserProfile.objects.filter(prefix_q('search_username', term)).values('user_id')
+
+def events_with_prefix(term):
+    return Event.all_objects.filter(prefix_q('search_title', term)).values('pk')
+
+def author_or_event_search(term):
+    term = normalize_search(term)
+    return Q(user_id__in=users_with_prefix(term)) | Q(event_id__in=events_with_prefix(term))
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'organizer', 'location', 'start_time', 'is_public', 'created_at']
     list_filter = ['is_public', 'created_at', 'start_time']
-    search_fields = ['title', 'description', 'location', 'organizer__username']
+    list_select_related = ['organizer']
+    search_fields = ['search_title']
+    search_help_text = 'Prefix of the title or organizer username, or an event id.'
+    autocomplete_fields = ['organizer', 'series']
+    readonly_fields = ['search_title', 'recurrence_end', 'deleted_at']
+    csv_fields = ['title', 'organizer__username', 'location', 'start_time', 'end_time', 'is_public']
+    actions = ['export_csv', 'soft_delete_selected']
+
+    def search_filter(self, term):
+        term = normalize_search(term)
+        return prefix_q('search_title', term) | Q(organizer_id__in=users_with_prefix(term))
+
+    @admin.action(description='Delete selected events')
+    def soft_delete_selected(self, request, queryset):
+        deleted = 0
+        for chunk in iterate_chunks(queryset, []):
+            for event in Event.objects.filter(pk__in=[pk for pk, in chunk]):
+                soft_delete(event)
+                deleted += 1
+        self.message_user(request, f'Deleted {deleted} events; their RSVPs and reviews are purged in the background.')
+
+class UnshardedAdminMixin:
+    # Changelists and bulk actions run on the default database only, so with
+    # RSVP_SHARDS set they would silently miss every row on the shards.
+    def has_module_permission(self, request):
+        return not get_shards() and super().has_module_permission(request)
+
+    def has_view_permission(self, request, obj=None):
+        return not get_shards() and super().has_view_permission(request, obj)
+
+    def has_add_permission(self, request):
+        return not get_shards() and super().has_add_permission(request)
+
+    def has_change_permission(self, request, obj=None):
+        return not get_shards() and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not get_shards() and super().has_delete_permission(request, obj)
 
 @admin.register(RSVP)
-class RSVPAdmin(admin.ModelAdmin):
+class RSVPAdmin(UnshardedAdminMixin, PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'event', 'status', 'created_at']
     list_filter = ['status', 'created_at']
-    search_fields = ['user__username', 'event__title']
+    list_select_related = ['user', 'event']
+    search_fields = ['event__search_title']
+    search_help_text = 'Prefix of the username or event title, or an RSVP id.'
+    autocomplete_fields = ['user', 'event']
+    csv_fields = ['event_id', 'event__title', 'user__username', 'status', 'created_at']
+    actions = ['export_csv', 'mark_going', 'mark_maybe', 'mark_not_going']
+
+    def search_filter(self, term):
+        return author_or_event_search(term)
+
+    def change_status(self, request, queryset, status):
+        """Update in pk-ordered chunks, keeping the rollups, live counts, tickets and calendars in step."""
+        counters = EventStatsBucket.STATUS_COUNTERS
+        changed = 0
+        fields = ['event_id', 'status', 'user_id', 'ticket_issued_at']
+        for chunk in iterate_chunks(queryset.exclude(status=status), fields):
+            deltas = {}
+            issued = {}
+            revoked = []
+            now = timezone.now()
+            for pk, event_id, previous, user_id, issued_at in chunk:
+                event_deltas = deltas.setdefault(event_id, Counter())
+                # Rows saved outside the API can carry a status the rollups don't count.
+                if previous in counters:
+                    event_deltas[counters[previous]] -= 1
+                event_deltas[counters[status]] += 1
+                if status == 'Going':
+                    issued.setdefault(tickets.next_issue_time(now, issued_at), []).append(pk)
+                elif previous == 'Going':
+                    revoked.append((event_id, user_id, issued_at))
+            with transaction.atomic():
+                pks = [row[0] for row in chunk]
+                changed += RSVP.objects.filter(pk__in=pks).update(status=status, updated_at=now)
+                for issued_at, group in issued.items():
+                    RSVP.objects.filter(pk__in=group).update(ticket_issued_at=issued_at)
+                revoke_tickets(revoked)
+                for event_id, event_deltas in deltas.items():
+                    record_event_stats(event_id, event_deltas)
+                    publish_rsvp_change(event_id)
+            cache.delete_many([calendar_events_key(row[3]) for row in chunk])
+        self.message_user(request, f'Marked {changed} RSVPs as {status}.')
+
+    @admin.action(description='Mark selected RSVPs as Going')
+    def mark_going(self, request, queryset):
+        self.change_status(request, queryset, 'Going')
+
+    @admin.action(description='Mark selected RSVPs as Maybe')
+    def mark_maybe(self, request, queryset):
+        self.change_status(request, queryset, 'Maybe')
+
+    @admin.action(description='Mark selected RSVPs as Not Going')
+    def mark_not_going(self, request, queryset):
+        self.change_status(request, queryset, 'Not Going')
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(UnshardedAdminMixin, PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'event', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
-    search_fields = ['user__username', 'event__title', 'comment']
\ No newline at end of file
+    list_select_related = ['user', 'event']
+    search_fields = ['event__search_title']
+    search_help_text = 'Prefix of the username or event title, or a review id.'
+    autocomplete_fields = ['user', 'event']
+    csv_fields = ['event_id', 'event__title', 'user__username', 'rating', 'comment', 'created_at']
+
+    def search_filter(self, term):
+        return author_or_event_search(term)
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    RSVP, ArchivedReview, EventStatsBucket, EventStatsDaily, EventStatsHourly, Review, review_histogram_key,
+)
+
+COUNTERS = EventStatsBucket.COUNTERS
+SUMS = {name: Sum(name) for name in COUNTERS}
+MAX_HOURLY_RANGE = timedelta(days=31)
+DEFAULT_RANGE = timedelta(days=30)
+HISTOGRAM_TIMEOUT = 60 * 60
+
+
+def parse_window(params):
+    """Return ((start, end, granularity), None) or (None, error message)."""
+    now = timezone.now()
+    try:
+        end = _parse(params.get('end')) or now
+        start = _parse(params.get('start')) or end - DEFAULT_RANGE
+    except ValueError:
+        return None, 'start and end must be ISO 8601 datetimes'
+    if start >= end:
+        return None, 'start must be before end'
+
+    granularity = params.get('granularity') or ('hour' if end - start <= timedelta(days=2) else 'day')
+    if granularity not in ('hour', 'day'):
+        return None, "granularity must be 'hour' or 'day'"
+    if granularity == 'hour' and end - start > MAX_HOURLY_RANGE:
+        return None, 'hourly series are limited to 31 days; use granularity=day'
+    return (start, end, granularity), None
+
+
+def _parse(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _sum_rows(model, event_ids, start=None, end=None):
+    rows = model.objects.filter(event_id__in=event_ids)
+    if start is not None:
+        rows = rows.filter(bucket__gte=start)
+    if end is not None:
+        rows = rows.filter(bucket__lt=end)
+    return {name: value or 0 for name, value in rows.aggregate(**SUMS).items()}
+
+
+def raw_totals(event_ids):
+    """{event_id: counters} straight from the RSVP and review rows, for events with any."""
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for rsvps in RSVP.objects.filter(event_id__in=event_ids).per_shard():
+        for event_id, status, count in rsvps.values_list('event_id', 'status').annotate(Count('id')).order_by():
+            totals[event_id]['rsvps_created'] += count
+            counter = EventStatsBucket.STATUS_COUNTERS.get(status)
+            if counter is not None:
+                totals[event_id][counter] += count
+    for reviews in Review.objects.filter(event_id__in=event_ids).per_shard():
+        for event_id, rating, count in reviews.values_list('event_id', 'rating').annotate(Count('id')).order_by():
+            totals[event_id]['reviews'] += count
+            totals[event_id]['rating_sum'] += rating * count
+            totals[event_id][f'rating_{rating}'] += count
+    return dict(totals)
+
+
+def all_time_totals(event_ids):
+    """{event_id: counters} from the daily rollup, or from the raw rows for events without any."""
+    rows = (
+        EventStatsDaily.objects.filter(event_id__in=event_ids)
+        .values('event_id')
+        .annotate(**SUMS)
+        .order_by('event_id')
+    )
+    totals = {row.pop('event_id'): {name: value or 0 for name, value in row.items()} for row in rows}
+    missing = [event_id for event_id in event_ids if event_id not in totals]
+    if missing:
+        totals.update(raw_totals(missing))
+    return totals
+
+
+def _combine(totals):
+    combined = dict.fromkeys(COUNTERS, 0)
+    for counters in totals:
+        for name, value in counters.items():
+            combined[name] += value
+    return combined
+
+
+def range_totals(event_ids, start=None, end=None):
+    """Sum the counters over [start, end): whole days from the daily rollup, the edges from the hourly one."""
+    if start is None and end is None:
+        return _combine(all_time_totals(event_ids).values())
+
+    start = EventStatsHourly.truncate(start) if start is not None else None
+    if end is not None and EventStatsHourly.truncate(end) != end:
+        end = EventStatsHourly.truncate(end) + timedelta(hours=1)
+
+    first_day = last_day = None
+    if start is not None:
+        first_day = EventStatsDaily.truncate(start)
+        if first_day < start:
+            first_day += timedelta(days=1)
+    if end is not None:
+        last_day = EventStatsDaily.truncate(end)
+    if first_day is not None and last_day is not None and first_day >= last_day:
+        return _sum_rows(EventStatsHourly, event_ids, start, end)
+
+    totals = _sum_rows(EventStatsDaily, event_ids, first_day, last_day)
+    edges = []
+    if start is not None and start < first_day:
+        edges.append((start, first_day))
+    if end is not None and last_day < end:
+        edges.append((last_day, end))
+    for edge_start, edge_end in edges:
+        for name, value in _sum_rows(EventStatsHourly, event_ids, edge_start, edge_end).items():
+            totals[name] += value
+    return totals
+
+
+def series(event_ids, start, end, granularity):
+    model = EventStatsHourly if granularity == 'hour' else EventStatsDaily
+    rows = (
+        model.objects.filter(event_id__in=event_ids, bucket__gte=model.truncate(start), bucket__lt=end)
+        .values('bucket')
+        .annotate(**{name: Sum(name) for name in ('rsvps_created', 'going', 'maybe', 'not_going', 'reviews')})
+        .order_by('bucket')
+    )
+    return list(rows)
+
+
+def summarize(totals):
+    reviews = totals['reviews']
+    return {
+        'rsvps_created': totals['rsvps_created'],
+        'status_breakdown': {
+            status: totals[counter]
+            for status, counter in EventStatsBucket.STATUS_COUNTERS.items()
+        },
+        'reviews': reviews,
+        'average_rating': round(totals['rating_sum'] / reviews, 2) if reviews else 0,
+        'rating_distribution': {str(rating): totals[f'rating_{rating}'] for rating in range(1, 6)},
+    }
+
+
+def build_analytics(event_ids, window, totals=None):
+    """Analytics over the window; totals are all_time_totals(event_ids) when the caller has them."""
+    start, end, granularity = window
+    if totals is None:
+        totals = all_time_totals(event_ids)
+    return {
+        'range': {'start': start, 'end': end, 'granularity': granularity},
+        # all_time is the current state; in_range holds net changes within the window.
+        'all_time': summarize(_combine(totals.values())),
+        'in_range': summarize(range_totals(event_ids, start, end)),
+        'series': series(event_ids, start, end, granularity),
+    }
+
+
+def review_histogram(event_id):
+    """Rating histogram for an event, from its all-time totals and cached until its next review write."""
+    key = review_histogram_key(event_id)
+    histogram = cache.get(key)
+    if histogram is None:
+        summary = summarize(_combine(all_time_totals([event_id]).values()))
+        histogram = {
+            'count': summary['reviews'],
+            'average_rating': summary['average_rating'],
+            'ratings': summary['rating_distribution'],
+        }
+        cache.set(key, histogram, HISTOGRAM_TIMEOUT)
+    return histogram
+
+
+def archived_review_histogram(event_id):
+    """The same histogram for an archived event, counted from its archived reviews."""
+    counted = dict(
+        ArchivedReview.objects.filter(event_id=event_id)
+        .values_list('rating').annotate(total=Count('id')).order_by()
+    )
+    reviews = sum(counted.values())
+    rating_sum = sum(rating * total for rating, total in counted.items())
+    return {
+        'count': reviews,
+        'average_rating': round(rating_sum / reviews, 2) if reviews else 0,
+        'ratings': {str(rating): counted.get(rating, 0) for rating in range(1, 6)},
+    }
@@ -0,0 +1,151 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Avg, Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from . import counts
+from .models import (
+    ArchivedEvent, ArchivedRSVP, ArchivedReview, CheckIn, Event, Invitation, RSVP, Review, TicketRevocation,
+    bulk_removal,
+)
+
+logger = logging.getLogger(__name__)
+
+# One worker: purges are background housekeeping and should not compete with
+# requests for the SQLite write lock.
+_purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-purge')
+
+
+ARCHIVED_ROWS = [
+    (RSVP, ArchivedRSVP, ('id', 'event_id', 'user_id', 'status', 'created_at', 'updated_at')),
+    (Review, ArchivedReview, ('id', 'event_id', 'user_id', 'rating', 'comment', 'created_at', 'updated_at')),
+]
+
+
+def get_batch_size():
+    return getattr(settings, 'EVENT_PURGE_BATCH_SIZE', 500)
+
+
+def take_batches(queryset, fields, size):
+    """Yield successive pk-ordered batches of rows; the caller deletes each batch before the next."""
+    while True:
+        batch = list(queryset.values_list(*fields).order_by('pk')[:size])
+        if not batch:
+            return
+        yield batch
+
+
+def keyset_batches(queryset, fields, size):
+    """Like take_batches, for rows that stay in place while the caller works: pages by pk."""
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page.values_list(*fields).order_by('pk')[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def delete_in_batches(queryset, batch_size):
+    for batch in take_batches(queryset, ('pk',), batch_size):
+        with transaction.atomic(using=queryset.db), bulk_removal():
+            queryset.filter(pk__in=[row[0] for row in batch]).delete()
+
+
+def soft_delete(event):
+    """Hide the event immediately and purge its rows in the background after commit."""
+    hidden = Event.all_objects.filter(pk=event.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+    if hidden and event.is_public:
+        # update() skips the post_save signal that keeps the counter in step.
+        counts.adjust(counts.PUBLIC_EVENTS, -1)
+    transaction.on_commit(lambda: schedule_purge(event.pk))
+
+
+def schedule_purge(event_id):
+    if not getattr(settings, 'EVENT_PURGE_ASYNC', True):
+        purge_event(event_id)
+        return
+    _purge_executor.submit(_purge_in_background, event_id)
+
+
+def _purge_in_background(event_id):
+    try:
+        purge_event(event_id)
+    except Exception:
+        # purge_deleted_events picks up anything left behind.
+        logger.exception('Purging deleted event %s failed', event_id)
+    finally:
+        connections.close_all()
+
+
+def purge_event(event_id, batch_size=None):
+    """Delete a soft-deleted event's rows in short transactions, then the event itself."""
+    batch_size = batch_size or get_batch_size()
+    # A recurring series takes its materialized occurrences with it.
+    event_ids = [event_id, *Event.all_objects.filter(series_id=event_id).values_list('pk', flat=True)]
+    for model in (RSVP, Review):
+        for queryset in model.objects.filter(event_id__in=event_ids).per_shard():
+            delete_in_batches(queryset, batch_size)
+    for model in (Invitation, CheckIn, TicketRevocation):
+        delete_in_batches(model.objects.using(DEFAULT_DB_ALIAS).filter(event_id__in=event_ids), batch_size)
+    with transaction.atomic(), bulk_removal():
+        deleted, _ = Event.all_objects.filter(pk=event_id, deleted_at__isnull=False).delete()
+    return bool(deleted)
+
+
+def archive_chunk(cutoff, chunk_size, batch_size=None):
+    """Archive up to chunk_size events that ended before cutoff; returns how many, 0 when done."""
+    batch_size = batch_size or get_batch_size()
+    with transaction.atomic(), bulk_removal():
+        # A recurring series waits until its last occurrence has passed and its
+        # materialized occurrences have been archived ahead of it.
+        events = list(
+            Event.objects.filter(end_time__lt=cutoff)
+            .filter(Q(recurrence_rule='') | Q(recurrence_end__lt=cutoff))
+            .exclude(Exists(Event.all_objects.filter(series=OuterRef('pk'))))
+            .order_by('end_time', 'id')[:chunk_size]
+        )
+        if not events:
+            return 0
+        ids = [event.id for event in events]
+        # An event's rows are all on one shard, so per-shard results never overlap.
+        rsvp_counts, ratings = {}, {}
+        for queryset in RSVP.objects.filter(event_id__in=ids).per_shard():
+            rsvp_counts.update(queryset.values_list('event_id').annotate(Count('id')).order_by())
+        for queryset in Review.objects.filter(event_id__in=ids).per_shard():
+            ratings.update(queryset.values_list('event_id').annotate(Avg('rating')).order_by())
+        ArchivedEvent.objects.bulk_create([
+            ArchivedEvent(
+                id=event.id, title=event.title, description=event.description,
+                organizer_id=event.organizer_id, location=event.location,
+                latitude=event.latitude, longitude=event.longitude,
+                start_time=event.start_time, end_time=event.end_time, is_public=event.is_public,
+                created_at=event.created_at, updated_at=event.updated_at,
+                rsvp_count=rsvp_counts.get(event.id, 0), average_rating=ratings.get(event.id) or 0,
+            )
+            for event in events
+        ])
+
+        # Copy in pk order, one batch at a time, so memory stays flat however
+        # many rows an event has. Rows on the primary are deleted as they are
+        # copied; rows on a shard only once the copies have committed.
+        on_shards = []
+        for model, archive_model, fields in ARCHIVED_ROWS:
+            for queryset in model.objects.filter(event_id__in=ids).per_shard():
+                local = queryset.db == DEFAULT_DB_ALIAS
+                batches = take_batches if local else keyset_batches
+                for batch in batches(queryset, fields, batch_size):
+                    archive_model.objects.bulk_create([archive_model(**dict(zip(fields, row))) for row in batch])
+                    if local:
+                        queryset.filter(pk__in=[row[0] for row in batch]).delete()
+                if not local:
+                    on_shards.append(queryset)
+
+        Event.objects.filter(pk__in=ids).delete()
+    for queryset in on_shards:
+        delete_in_batches(queryset, batch_size)
+    return len(events)
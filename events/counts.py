@@ -0,0 +1,123 @@
+"""Cheap totals for paginated listings: exact, maintained, cached or estimated."""
+import hashlib
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import QuerySet
+
+from .recurrence import Timeline
+from .sharding import FanOut, run_on_each
+
+DEFAULTS = {
+    'ESTIMATE_LIMIT': 1000,
+    'CACHE_TIMEOUT': 300,
+    'COUNTER_TIMEOUT': 3600,
+}
+
+PUBLIC_EVENTS = 'events:public'
+
+# Query parameters that page or sort a listing without changing its size.
+NEUTRAL_PARAMS = {'page', 'page_size', 'ordering', 'exact_count', 'format'}
+
+# Set while rows are moved rather than created or deleted (shard rebalancing).
+_frozen = ContextVar('counters_frozen', default=False)
+
+
+def get_option(name):
+    return getattr(settings, 'PAGINATION_COUNTS', {}).get(name, DEFAULTS[name])
+
+
+def counter_key(name):
+    return f'counts:counter:{name}'
+
+
+def user_counter(kind, user_id):
+    return f'{kind}:user:{user_id}'
+
+
+def counter(name, seed):
+    """The maintained count called `name`, seeded with seed() when it is missing."""
+    key = counter_key(name)
+    value = cache.get(key)
+    if value is None:
+        value = seed()
+        cache.add(key, value, get_option('COUNTER_TIMEOUT'))
+    return value
+
+
+def adjust(name, delta):
+    if not delta or _frozen.get():
+        return
+    try:
+        cache.incr(counter_key(name), delta)
+    except ValueError:
+        # Not seeded yet; the next read counts from scratch.
+        pass
+
+
+@contextmanager
+def frozen():
+    token = _frozen.set(True)
+    try:
+        yield
+    finally:
+        _frozen.reset(token)
+
+
+def filter_params(request):
+    return set(request.query_params) - NEUTRAL_PARAMS
+
+
+def listing_key(request, ignored):
+    """Cache key for a listing's count: path, user and every parameter that can narrow it."""
+    params = sorted(
+        (name, request.query_params.getlist(name)) for name in request.query_params if name not in ignored
+    )
+    user_id = request.user.pk if request.user.is_authenticated else None
+    digest = hashlib.blake2b(json.dumps([request.path, user_id, params]).encode(), digest_size=16).hexdigest()
+    return f'counts:listing:{digest}'
+
+
+def exact_count(items):
+    if isinstance(items, (list, tuple)):
+        return len(items)
+    return items.count()
+
+
+def planner_estimate(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def capped_count(queryset, limit):
+    return queryset.order_by()[:limit + 1].count()
+
+
+def estimate_count(items):
+    """(count, approximate) for a QuerySet, FanOut or Timeline without a full count."""
+    limit = get_option('ESTIMATE_LIMIT')
+    if isinstance(items, Timeline):
+        count, approximate = estimate_count(items.rows)
+        return count + len(items.virtual), approximate
+    if isinstance(items, FanOut):
+        counts = run_on_each(lambda queryset: capped_count(queryset, limit), items.querysets)
+        return sum(min(count, limit) for count in counts), any(count > limit for count in counts)
+    if not isinstance(items, QuerySet):
+        return exact_count(items), False
+    counted = capped_count(items, limit)
+    if counted <= limit:
+        return counted, False
+    planned = None if items.query.combinator else planner_estimate(items)
+    return max(limit, planned or 0), True
@@ -0,0 +1,37 @@
+import django_filters
+from django.utils import timezone
+
+from .models import ArchivedEvent, Event
+
+
+class EventFilter(django_filters.FilterSet):
+    WHEN_CHOICES = [
+        ('upcoming', 'Upcoming'),
+        ('ongoing', 'Ongoing'),
+        ('past', 'Past'),
+    ]
+
+    # ?start_time_after=&start_time_before= and ?end_time_after=&end_time_before=
+    start_time = django_filters.IsoDateTimeFromToRangeFilter()
+    end_time = django_filters.IsoDateTimeFromToRangeFilter()
+    # Events that overlap [overlaps_from, overlaps_to) at all.
+    overlaps_from = django_filters.IsoDateTimeFilter(field_name='end_time', lookup_expr='gt')
+    overlaps_to = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='lt')
+    when = django_filters.ChoiceFilter(choices=WHEN_CHOICES, method='filter_when')
+
+    class Meta:
+        model = Event
+        fields = ['is_public', 'organizer']
+
+    def filter_when(self, queryset, name, value):
+        now = timezone.now()
+        if value == 'upcoming':
+            return queryset.filter(start_time__gt=now)
+        if value == 'ongoing':
+            return queryset.filter(start_time__lte=now, end_time__gt=now)
+        return queryset.filter(end_time__lte=now)
+
+
+class ArchivedEventFilter(EventFilter):
+    class Meta(EventFilter.Meta):
+        model = ArchivedEvent
@@ -0,0 +1,119 @@
+import csv
+import math
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+# Upper bound for a geohash range scan: sorts after every base32 character.
+RANGE_END = '~'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, value = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lng_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angle)
+    ratio = math.sin(angle) / max(math.cos(math.radians(latitude)), 1e-12)
+    # Every longitude when the circle reaches a pole.
+    lng_delta = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+    return (
+        max(-90.0, latitude - lat_delta), min(90.0, latitude + lat_delta),
+        longitude - lng_delta, longitude + lng_delta,
+    )
+
+
+def cover_cells(latitude, longitude, radius_km, max_cells=64):
+    """Geohash prefixes whose cells together cover the search circle's bounding box."""
+    south, north, west, east = bounding_box(latitude, longitude, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        columns = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * columns <= max_cells:
+            break
+
+    cells = set()
+    lat = south
+    while True:
+        lng = west
+        while True:
+            wrapped = (lng + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(min(lat, 89.999999), wrapped, precision))
+            if lng >= east:
+                break
+            lng = min(lng + width, east)
+        if lat >= north:
+            break
+        lat = min(lat + height, north)
+    return sorted(cells)
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in km from one origin to each row's (latitude, longitude), computed by the database."""
+    lat1 = math.radians(latitude)
+    lat2 = Radians('latitude')
+    half_dlat = (lat2 - lat1) / 2
+    half_dlng = (Radians('longitude') - math.radians(longitude)) / 2
+    a = Power(Sin(half_dlat), 2) + math.cos(lat1) * Cos(lat2) * Power(Sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def _normalize(name):
+    return ' '.join(name.lower().split())
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    path = getattr(settings, 'EVENT_GAZETTEER_PATH', None)
+    if not path:
+        return {}
+    places = {}
+    with open(path, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            places[_normalize(row['name'])] = (float(row['latitude']), float(row['longitude']))
+    return places
+
+
+def geocode(location):
+    """Look a free-text location up in the offline gazetteer, most specific part first."""
+    if not location:
+        return None
+    places = load_gazetteer()
+    normalized = _normalize(location)
+    if normalized in places:
+        return places[normalized]
+    for part in normalized.split(','):
+        match = places.get(part.strip())
+        if match:
+            return match
+    return None
@@ -0,0 +1,180 @@
+"""Per-user iCalendar feeds of the events a user is going to."""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Event, RSVP, calendar_events_key
+
+DEFAULTS = {
+    'UID_DOMAIN': 'ems.local',
+    'MAX_AGE': 300,
+    'CHUNK_SIZE': 200,
+    'DOCUMENT_MAX_BYTES': 1_000_000,
+    'DOCUMENT_TIMEOUT': 3600,
+    'EVENTS_TIMEOUT': 86400,
+    'VEVENT_TIMEOUT': 7 * 86400,
+}
+# Part of the ETag and cache keys: bump it when the rendering changes.
+FORMAT_VERSION = 1
+LINE_OCTETS = 75
+
+HEADER = (
+    'BEGIN:VCALENDAR\r\n'
+    'VERSION:2.0\r\n'
+    'PRODID:-//emsAPI//Events//EN\r\n'
+    'CALSCALE:GREGORIAN\r\n'
+    'METHOD:PUBLISH\r\n'
+    'X-WR-CALNAME:My events\r\n'
+)
+FOOTER = 'END:VCALENDAR\r\n'
+
+
+def get_option(name):
+    return getattr(settings, 'CALENDAR', {}).get(name, DEFAULTS[name])
+
+
+def escape_text(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line):
+    """The content line with its CRLF, folded so no line exceeds 75 octets."""
+    data = line.encode()
+    if len(data) <= LINE_OCTETS:
+        return line + '\r\n'
+    parts, start, limit = [], 0, LINE_OCTETS
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never split a UTF-8 sequence.
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        # Continuation lines start with a space, which counts towards the limit.
+        start, limit = end, LINE_OCTETS - 1
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(event):
+    """One VEVENT; occurrence rows share their series' UID, told apart by RECURRENCE-ID."""
+    uid = f'event-{event.series_id or event.pk}@{get_option("UID_DOMAIN")}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{format_utc(event.updated_at)}',
+        f'LAST-MODIFIED:{format_utc(event.updated_at)}',
+        f'DTSTART:{format_utc(event.start_time)}',
+        f'DTEND:{format_utc(event.end_time)}',
+        f'SUMMARY:{escape_text(event.title)}',
+    ]
+    if event.series_id:
+        lines.append(f'RECURRENCE-ID:{format_utc(event.occurrence_start)}')
+    if event.description:
+        lines.append(f'DESCRIPTION:{escape_text(event.description)}')
+    if event.location:
+        lines.append(f'LOCATION:{escape_text(event.location)}')
+    if event.latitude is not None and event.longitude is not None:
+        lines.append(f'GEO:{event.latitude:.6f};{event.longitude:.6f}')
+    if event.recurrence_rule:
+        lines.append(f'RRULE:{event.recurrence_rule.upper().removeprefix("RRULE:")}')
+        if event.recurrence_exdates:
+            excluded = ','.join(format_utc(datetime.fromisoformat(key)) for key in sorted(event.recurrence_exdates))
+            lines.append(f'EXDATE:{excluded}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def going_event_ids(user_id):
+    """Sorted ids of the events the user is going to; cached until one of their RSVPs changes."""
+    key = calendar_events_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        # per_shard() binds each query to its database, so a lagging replica
+        # cannot put stale ids into the cache.
+        ids = sorted(
+            event_id
+            for queryset in RSVP.objects.filter(user_id=user_id, status='Going').per_shard()
+            for event_id in queryset.values_list('event_id', flat=True)
+        )
+        cache.set(key, ids, get_option('EVENTS_TIMEOUT'))
+    return ids
+
+
+def feed_stamps(user_id):
+    """[(event_id, updated_at)] of the user's live events, in start order."""
+    ids = going_event_ids(user_id)
+    size = get_option('CHUNK_SIZE') * 10
+    rows = []
+    for start in range(0, len(ids), size):
+        rows.extend(
+            Event.objects.filter(pk__in=ids[start:start + size])
+            .values_list('start_time', 'pk', 'updated_at').order_by()
+        )
+    return [(pk, updated_at) for _, pk, updated_at in sorted(rows)]
+
+
+def feed_etag(stamps):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{FORMAT_VERSION}:{get_option("UID_DOMAIN")}'.encode())
+    for pk, updated_at in stamps:
+        digest.update(f';{pk}:{updated_at.timestamp()}'.encode())
+    return digest.hexdigest()
+
+
+def document_key(etag):
+    return f'calendar:document:{etag}'
+
+
+def cached_document(etag):
+    return cache.get(document_key(etag))
+
+
+def vevent_key(pk, updated_at):
+    return f'calendar:vevent:{FORMAT_VERSION}:{pk}:{updated_at.timestamp()}'
+
+
+def render_chunk(stamps):
+    """The VEVENTs for some (id, updated_at) rows, from the cache where it has them."""
+    keys = {vevent_key(pk, updated_at): pk for pk, updated_at in stamps}
+    rendered = {keys[key]: text for key, text in cache.get_many(list(keys)).items()}
+    missing = [pk for pk, _ in stamps if pk not in rendered]
+    if missing:
+        fresh = {}
+        for event in Event.objects.filter(pk__in=missing):
+            rendered[event.pk] = fresh[vevent_key(event.pk, event.updated_at)] = render_event(event)
+        cache.set_many(fresh, get_option('VEVENT_TIMEOUT'))
+    # Events deleted since the stamps were read are left out.
+    return ''.join(rendered[pk] for pk, _ in stamps if pk in rendered)
+
+
+def stream_feed(stamps, etag):
+    """Yield the document in encoded chunks, caching it whole when it is small enough."""
+    limit = get_option('DOCUMENT_MAX_BYTES')
+    size = get_option('CHUNK_SIZE')
+    parts, total = [], 0
+
+    def emit(text):
+        nonlocal parts, total
+        data = text.encode()
+        if parts is not None:
+            total += len(data)
+            if total <= limit:
+                parts.append(data)
+            else:
+                parts = None
+        return data
+
+    yield emit(HEADER)
+    for start in range(0, len(stamps), size):
+        yield emit(render_chunk(stamps[start:start + size]))
+    yield emit(FOOTER)
+    if parts is not None:
+        cache.set(document_key(etag), b''.join(parts), get_option('DOCUMENT_TIMEOUT'))
@@ -0,0 +1,114 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+DEFAULTS = {
+    # How long a completed response is replayed for.
+    'TTL': timedelta(hours=24),
+    # After this long an unfinished request is presumed dead and may be retried.
+    'LOCK_TIMEOUT': timedelta(seconds=60),
+}
+
+
+def get_option(name):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(request):
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    # Multipart bodies (uploads) are not buffered just to be hashed.
+    if not request.content_type.startswith('multipart/'):
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+class ShortCircuit(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class IdempotentMixin:
+    """Replay the first response to retries sent with the same `Idempotency-Key`."""
+
+    idempotent_actions = ('create', 'update', 'partial_update')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._idempotency_record = None
+        key = request.META.get(HEADER)
+        if not key or self.action not in self.idempotent_actions or not request.user.is_authenticated:
+            return
+        if len(key) > 255:
+            raise ShortCircuit(Response(
+                {'error': 'Idempotency-Key must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            ))
+        self._idempotency_record = self.claim_idempotency_key(request, key)
+
+    def claim_idempotency_key(self, request, key):
+        now = timezone.now()
+        request_fingerprint = fingerprint(request)
+        try:
+            with transaction.atomic():
+                return IdempotencyRecord.objects.create(
+                    user=request.user, key=key, fingerprint=request_fingerprint,
+                    expires_at=now + get_option('TTL'),
+                )
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.get(user=request.user, key=key)
+        stale = record.status_code is None and record.created_at < now - get_option('LOCK_TIMEOUT')
+        if record.expires_at <= now or stale:
+            # Take the key over; the conditional update makes sure only one retry wins.
+            taken = IdempotencyRecord.objects.filter(
+                pk=record.pk, status_code=record.status_code, created_at=record.created_at
+            ).update(
+                fingerprint=request_fingerprint, status_code=None, response_body=None,
+                created_at=now, expires_at=now + get_option('TTL'),
+            )
+            if taken:
+                record.refresh_from_db()
+                return record
+            record.refresh_from_db()
+
+        if record.fingerprint != request_fingerprint:
+            raise ShortCircuit(Response(
+                {'error': 'Idempotency-Key was already used for a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            ))
+        if record.status_code is None:
+            raise ShortCircuit(Response(
+                {'error': 'A request with this Idempotency-Key is still in progress'},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'},
+            ))
+        raise ShortCircuit(Response(
+            record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'}
+        ))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ShortCircuit):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        record = getattr(self, '_idempotency_record', None)
+        if record is not None:
+            self._idempotency_record = None
+            if response.status_code >= 500:
+                # Let the client retry a failure instead of replaying it.
+                IdempotencyRecord.objects.filter(pk=record.pk).delete()
+            else:
+                IdempotencyRecord.objects.filter(pk=record.pk).update(
+                    status_code=response.status_code, response_body=response.data
+                )
+        return super().finalize_response(request, response, *args, **kwargs)
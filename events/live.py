@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from .models import RSVP
+
+DEFAULTS = {
+    'BACKEND': 'events.live.LocalBackend',
+    'COALESCE_SECONDS': 0.25,
+    'HEARTBEAT_SECONDS': 15,
+    'REDIS_URL': 'redis://localhost:6379/0',
+    'REDIS_CHANNEL': 'events:live',
+}
+# Reconnect delay suggested to EventSource clients.
+RETRY_MS = 3000
+
+
+def get_option(name):
+    return getattr(settings, 'LIVE_EVENTS', {}).get(name, DEFAULTS[name])
+
+
+def load_snapshot(event_id):
+    counts = dict(
+        RSVP.objects.for_event(event_id)
+        .values_list('status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    status_counts = {status: counts.get(status, 0) for status, _ in RSVP.STATUS_CHOICES}
+    return {'event': event_id, 'rsvp_count': sum(status_counts.values()), 'status_counts': status_counts}
+
+
+def _load_snapshot_off_request(event_id):
+    # Runs on a worker thread outside any request, so it has to tidy up its own connection.
+    try:
+        return load_snapshot(event_id)
+    finally:
+        close_old_connections()
+
+
+class Topic:
+    __slots__ = ('subscribers', 'snapshot', 'waiter', 'pending')
+
+    def __init__(self, loop):
+        self.subscribers = 0
+        self.snapshot = None
+        self.waiter = loop.create_future()
+        self.pending = False
+
+
+class LiveHub:
+    """In-process fan-out of coalesced RSVP count snapshots to SSE subscribers."""
+
+    def __init__(self):
+        self._loop = None
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                self._loop = loop
+                self._topics = {}
+        return loop
+
+    def notify(self, event_id):
+        """Thread-safe: called from request threads or a backend listener."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._mark_dirty, event_id)
+
+    def _mark_dirty(self, event_id):
+        topic = self._topics.get(event_id)
+        if topic is None or topic.pending:
+            return
+        topic.pending = True
+        self._loop.call_later(
+            get_option('COALESCE_SECONDS'),
+            lambda: asyncio.ensure_future(self._flush(event_id, topic)),
+        )
+
+    async def _flush(self, event_id, topic):
+        topic.pending = False
+        topic.snapshot = await sync_to_async(_load_snapshot_off_request, thread_sensitive=False)(event_id)
+        waiter, topic.waiter = topic.waiter, self._loop.create_future()
+        waiter.set_result(None)
+
+    async def subscribe(self, event_id):
+        """Yield a snapshot whenever it changes, or None as a heartbeat."""
+        loop = self._bind()
+        topic = self._topics.get(event_id)
+        if topic is None:
+            topic = self._topics[event_id] = Topic(loop)
+        topic.subscribers += 1
+        heartbeat = get_option('HEARTBEAT_SECONDS')
+        last_sent = None
+        try:
+            if topic.snapshot is None:
+                topic.snapshot = await sync_to_async(load_snapshot)(event_id)
+            while True:
+                if topic.snapshot != last_sent:
+                    last_sent = topic.snapshot
+                    yield last_sent
+                try:
+                    await asyncio.wait_for(asyncio.shield(topic.waiter), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            topic.subscribers -= 1
+            if not topic.subscribers and self._topics.get(event_id) is topic:
+                del self._topics[event_id]
+
+
+hub = LiveHub()
+
+
+class LocalBackend:
+    """Single-process deployments: writes notify this worker's hub directly."""
+
+    def publish(self, event_id):
+        hub.notify(event_id)
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """Fans notifications out to every worker through Redis pub/sub."""
+
+    def __init__(self):
+        import redis
+
+        self._client = redis.Redis.from_url(get_option('REDIS_URL'))
+        self._channel = get_option('REDIS_CHANNEL')
+        self._listener = None
+
+    def publish(self, event_id):
+        self._client.publish(self._channel, str(event_id))
+
+    def start(self):
+        if self._listener is not None:
+            return
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._channel)
+
+        def listen():
+            for message in pubsub.listen():
+                hub.notify(int(message['data']))
+
+        self._listener = threading.Thread(target=listen, name='live-events-redis', daemon=True)
+        self._listener.start()
+
+
+@lru_cache(maxsize=1)
+def get_backend():
+    return import_string(get_option('BACKEND'))()
+
+
+def publish_rsvp_change(event_id):
+    transaction.on_commit(lambda: get_backend().publish(event_id))
+
+
+def format_sse(snapshot):
+    if snapshot is None:
+        return ': keepalive\n\n'
+    return f'event: rsvp\ndata: {json.dumps(snapshot)}\n\n'
@@ -0,0 +1,81 @@
+import random
+import timeit
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from events.models import Event, RSVP, Review
+from users.models import UserProfile, normalize_search
+
+
+@contextmanager
+def scratch_database(verbosity=0, test_name=None):
+    """Run the body against a throwaway copy of the schema, never the real DB."""
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if test_name is not None:
+        test_settings['NAME'] = test_name
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        test_settings['NAME'] = old_test_name
+
+
+def seed(users=50, events=100, rsvps_per_event=10, reviews_per_event=5, seed_value=42):
+    rng = random.Random(seed_value)
+    now = timezone.now().replace(microsecond=0)
+
+    User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@example.com',
+             first_name='Bench', last_name=str(i))
+        for i in range(users)
+    ])
+    people = list(User.objects.filter(username__startswith='bench').order_by('id'))
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, full_name=f'Bench User {user.pk}', location='Benchville',
+                    bio='Seeded for benchmarks.', search_username=normalize_search(user.username),
+                    search_name=normalize_search(f'Bench User {user.pk}'))
+        for user in people
+    ])
+
+    Event.objects.bulk_create([
+        Event(
+            title=f'Bench event {i}',
+            search_title=f'bench event {i}',
+            description='A seeded event used for benchmarking. ' * 4,
+            organizer=people[i % len(people)],
+            location=rng.choice(['New York', 'London', 'Berlin', 'Pune', 'Tokyo']),
+            start_time=now + timedelta(hours=i),
+            end_time=now + timedelta(hours=i + 2),
+            is_public=i % 5 != 0,
+        )
+        for i in range(events)
+    ])
+    seeded_events = list(Event.objects.order_by('id'))
+
+    rsvps, reviews = [], []
+    for event in seeded_events:
+        attendees = rng.sample(people, min(len(people), max(rsvps_per_event, reviews_per_event)))
+        for user in attendees[:rsvps_per_event]:
+            rsvps.append(RSVP(event=event, user=user,
+                              status=rng.choice(['Going', 'Maybe', 'Not Going'])))
+        for user in attendees[:reviews_per_event]:
+            reviews.append(Review(event=event, user=user, rating=rng.randint(1, 5),
+                                  comment='Seeded review text.'))
+    RSVP.objects.bulk_create(rsvps, batch_size=1000)
+    Review.objects.bulk_create(reviews, batch_size=1000)
+    return people, seeded_events
+
+
+def best_time(func, repeat=5, number=1):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def format_row(*columns, widths=(16, 16, 12, 12)):
+    return ''.join(str(column).ljust(width) for column, width in zip(columns, widths))
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from events.archive import archive_chunk, get_batch_size
+
+
+class Command(BaseCommand):
+    help = (
+        'Move events that ended before a cutoff, with their RSVPs and reviews, into the archive '
+        'tables. Each chunk of events is archived in its own transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='ISO 8601 cutoff for end_time (default: --days ago).')
+        parser.add_argument('--days', type=int, default=180)
+        parser.add_argument('--chunk-size', type=int, default=100, help='Events per transaction.')
+        parser.add_argument('--batch-size', type=int, default=get_batch_size(),
+                            help='RSVP/review rows copied per statement.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            cutoff = parse_datetime(options['before'])
+            if cutoff is None:
+                raise CommandError('--before must be an ISO 8601 datetime')
+            if timezone.is_naive(cutoff):
+                cutoff = timezone.make_aware(cutoff)
+        else:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+
+        archived = 0
+        while True:
+            count = archive_chunk(cutoff, options['chunk_size'], options['batch_size'])
+            if not count:
+                break
+            archived += count
+            self.stdout.write(f'Archived {archived} events...')
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} events that ended before {cutoff:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Invitation, RSVP
+
+
+class Command(BaseCommand):
+    help = 'Invite everyone who already RSVPed to a private event (RSVPs used to imply an invitation).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rsvps = (
+            RSVP.objects.filter(event__is_public=False)
+            .values_list('event_id', 'user_id')
+            .order_by('id')
+        )
+        batch, created = [], 0
+        for event_id, user_id in rsvps.iterator(chunk_size=options['batch_size']):
+            batch.append(Invitation(event_id=event_id, user_id=user_id))
+            if len(batch) >= options['batch_size']:
+                created += len(Invitation.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        created += len(Invitation.objects.bulk_create(batch, ignore_conflicts=True))
+        self.stdout.write(self.style.SUCCESS(f'Processed {created} invitations'))
@@ -0,0 +1,103 @@
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from events.views import EventViewSet
+
+from ._bench import format_row, scratch_database, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Flood /api/events/?search= with reader threads while writer threads RSVP, '
+        'with and without admission control, and compare RSVP latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=24)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--max-concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        # Throttles are per client and would hide the effect being measured.
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with tempfile.TemporaryDirectory() as directory, \
+                scratch_database(test_name=str(Path(directory) / 'bench.sqlite3')), \
+                override_settings(REST_FRAMEWORK=rest_framework):
+            people, events = seed(users=100, events=2000, rsvps_per_event=5, reviews_per_event=2)
+            self.stdout.write(format_row(
+                'admission', 'rsvp p50 ms', 'rsvp p95 ms', 'rsvps/s', 'reads/s', 'shed reads',
+                widths=(12, 14, 14, 10, 10, 12),
+            ))
+            for enabled in (False, True):
+                admission = {
+                    **settings.ADMISSION_CONTROL,
+                    'ENABLED': enabled, 'MAX_CONCURRENCY': options['max_concurrency'],
+                }
+                with override_settings(ADMISSION_CONTROL=admission):
+                    result = self.run_flood(people, events, options)
+                self.stdout.write(format_row(
+                    'on' if enabled else 'off', *result, widths=(12, 14, 14, 10, 10, 12),
+                ))
+
+    def run_flood(self, people, events, options):
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        list_view = EventViewSet.as_view({'get': 'list'})
+        rsvp_view = EventViewSet.as_view({'post': 'rsvp'})
+        deadline = time.perf_counter() + options['seconds']
+        latencies, reads, shed = [], [], []
+        start_line = threading.Barrier(options['readers'] + options['writers'])
+
+        def reader(index):
+            user = people[index % len(people)]
+            start_line.wait()
+            page = 1
+            while time.perf_counter() < deadline:
+                request = factory.get('/api/events/', {'search': 'seeded', 'page': page % 50 + 1})
+                force_authenticate(request, user=user)
+                response = list_view(request)
+                page += 1
+                if response.status_code == 429:
+                    # Well-behaved clients back off as told.
+                    shed.append(1)
+                    time.sleep(float(response['Retry-After']))
+                else:
+                    reads.append(1)
+            connections.close_all()
+
+        def writer(index):
+            user = people[-(index + 1)]
+            start_line.wait()
+            count = 0
+            while time.perf_counter() < deadline:
+                event = events[(index * 7919 + count) % len(events)]
+                request = factory.post(f'/api/events/{event.pk}/rsvp/', {'status': 'Going'}, format='json')
+                force_authenticate(request, user=user)
+                began = time.perf_counter()
+                rsvp_view(request, pk=event.pk)
+                latencies.append(time.perf_counter() - began)
+                count += 1
+            connections.close_all()
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        cuts = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else [0] * 19
+        return (
+            f'{cuts[9] * 1000:.1f}', f'{cuts[18] * 1000:.1f}',
+            f'{len(latencies) / options["seconds"]:.0f}',
+            f'{len(reads) / options["seconds"]:.0f}', len(shed),
+        )
@@ -0,0 +1,79 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Avg, Count
+from django.db.models.functions import TruncDay
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from events.analytics import build_analytics
+from events.models import Event, RSVP, Review
+
+from ._bench import best_time, format_row, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Compare rollup-backed analytics with scanning raw RSVP/Review rows for one large event.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rsvps', type=int, default=100_000)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            event = self.seed(options['rsvps'], options['days'])
+            end = timezone.now()
+            window = (end - timedelta(days=options['days']), end, 'day')
+
+            def raw_scan():
+                rsvps = RSVP.objects.filter(event=event, created_at__gte=window[0], created_at__lt=end)
+                list(rsvps.annotate(day=TruncDay('created_at')).values('day').annotate(n=Count('id')).order_by('day'))
+                list(RSVP.objects.filter(event=event).values('status').annotate(n=Count('id')).order_by())
+                list(Review.objects.filter(event=event).values('rating').annotate(n=Count('id')).order_by())
+                Review.objects.filter(event=event).aggregate(Avg('rating'))
+
+            def rollups():
+                build_analytics([event.id], window)
+
+            self.stdout.write(format_row('strategy', 'queries', 'ms'))
+            for label, func in (('raw scan', raw_scan), ('rollups', rollups)):
+                with CaptureQueriesContext(connection) as queries:
+                    func()
+                elapsed = best_time(func, repeat=options['repeat'])
+                self.stdout.write(format_row(label, len(queries), f'{elapsed * 1000:.2f}'))
+
+    def seed(self, rsvp_count, days):
+        rng = random.Random(3)
+        now = timezone.now()
+        User.objects.bulk_create(
+            [User(username=f'attendee{i}') for i in range(rsvp_count)], batch_size=5000
+        )
+        users = list(User.objects.values_list('id', flat=True))
+        organizer = User.objects.get(id=users[0])
+        event = Event.objects.create(
+            title='Big event', description='', organizer=organizer, location='Pune',
+            start_time=now + timedelta(days=1), end_time=now + timedelta(days=2),
+        )
+
+        created_at = RSVP._meta.get_field('created_at')
+        created_at.auto_now_add = False
+        try:
+            RSVP.objects.bulk_create([
+                RSVP(event=event, user_id=user_id,
+                     status=rng.choice(['Going', 'Going', 'Maybe', 'Not Going']),
+                     created_at=now - timedelta(minutes=rng.randrange(days * 24 * 60)))
+                for user_id in users
+            ], batch_size=5000)
+        finally:
+            created_at.auto_now_add = True
+        Review.objects.bulk_create([
+            Review(event=event, user_id=user_id, rating=rng.randint(1, 5))
+            for user_id in users[:rsvp_count // 20]
+        ], batch_size=5000)
+        call_command('rebuild_event_rollups', event=[event.id], stdout=self.stdout)
+        return event
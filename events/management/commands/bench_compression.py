@@ -0,0 +1,83 @@
+import csv
+import gzip
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from emsAPI.compression import CODECS, brotli, compress_bytes, compress_chunks, zstandard
+from events.models import Event, RSVP
+from events.serializers import EventSerializer
+
+from ._bench import best_time, format_row, scratch_database, seed
+
+LEVELS = {
+    'gzip': [1, 6, 9],
+    'br': [1, 4, 8, 11],
+    'zstd': [1, 3, 9, 19],
+}
+
+DECOMPRESSORS = {'gzip': gzip.decompress}
+if brotli is not None:
+    DECOMPRESSORS['br'] = brotli.decompress
+if zstandard is not None:
+    DECOMPRESSORS['zstd'] = lambda payload: zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+
+
+class Command(BaseCommand):
+    help = 'Measure size and CPU cost of response compression at several levels.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--export-rows', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed(users=200, events=options['page_size'], rsvps_per_event=options['export_rows'] // options['page_size'])
+            page = JSONRenderer().render(
+                EventSerializer(Event.objects.all()[:options['page_size']], many=True).data
+            )
+            rows = list(RSVP.objects.values_list('id', 'event_id', 'user__username', 'status', 'created_at'))
+
+        self.stdout.write(f'events page: {len(page)} bytes of JSON')
+        self.report(page, options['repeat'])
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        export = buffer.getvalue().encode()
+        self.stdout.write(f'\nCSV export: {len(rows)} rows, {len(export)} bytes')
+        self.report(export, options['repeat'])
+
+        self.stdout.write('\nstreamed CSV export (16 KiB flushes vs. one buffered body)')
+        self.stdout.write(format_row('codec', 'streamed', 'buffered', 'stream ms'))
+        lines = [export[i:i + 512] for i in range(0, len(export), 512)]
+        for encoding, levels in LEVELS.items():
+            if encoding not in CODECS:
+                continue
+            level = levels[1]
+            start = time.perf_counter()
+            streamed = b''.join(compress_chunks(CODECS[encoding](level), lines, 16 * 1024))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(format_row(
+                f'{encoding}-{level}', len(streamed),
+                len(compress_bytes(encoding, level, export)), f'{elapsed * 1000:.2f}',
+            ))
+
+    def report(self, payload, repeat):
+        self.stdout.write(format_row('codec', 'bytes', 'compress ms', 'decompress ms'))
+        for encoding, levels in LEVELS.items():
+            if encoding not in CODECS:
+                self.stdout.write(f'{encoding}: not installed, skipped')
+                continue
+            for level in levels:
+                compressed = compress_bytes(encoding, level, payload)
+                encode = best_time(lambda: compress_bytes(encoding, level, payload), repeat=repeat)
+                decode = best_time(lambda: DECOMPRESSORS[encoding](compressed), repeat=repeat)
+                self.stdout.write(format_row(
+                    f'{encoding}-{level}',
+                    f'{len(compressed)} ({len(compressed) / len(payload):.0%})',
+                    f'{encode * 1000:.2f}',
+                    f'{decode * 1000:.2f}',
+                ))
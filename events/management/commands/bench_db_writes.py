@@ -0,0 +1,90 @@
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from emsAPI.database import register_database, sqlite_database
+from events.models import Event, RSVP, Review
+
+from ._bench import format_row
+
+
+class Command(BaseCommand):
+    help = 'Concurrent RSVP/Review writers against the default and tuned SQLite profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Writes per thread.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(format_row('profile', 'model', 'writes/s', 'locked errors'))
+        with tempfile.TemporaryDirectory() as directory:
+            for profile, tuned in [('development', False), ('sqlite-tuned', True)]:
+                alias = f'bench_{profile.replace("-", "_")}'
+                config = sqlite_database(str(Path(directory) / f'{alias}.sqlite3'), tuned=tuned)
+                register_database(alias, config)
+                call_command('migrate', database=alias, run_syncdb=True, verbosity=0)
+                users, events = self.seed(alias, options['threads'])
+                for model in (RSVP, Review):
+                    rate, errors = self.run_writers(alias, model, users, events, options)
+                    self.stdout.write(format_row(profile, model.__name__, f'{rate:.0f}', errors))
+                connections[alias].close()
+
+    def seed(self, alias, threads):
+        now = timezone.now()
+        users = User.objects.db_manager(alias).bulk_create(
+            [User(username=f'writer{i}') for i in range(threads)]
+        )
+        events = [
+            Event.objects.db_manager(alias).create(
+                title=f'Bench {i}', description='', organizer=users[0], location='Bench',
+                start_time=now, end_time=now + timedelta(hours=1),
+            )
+            for i in range(400)
+        ]
+        return users, events
+
+    def run_writers(self, alias, model, users, events, options):
+        errors = []
+        barrier = threading.Barrier(options['threads'])
+
+        def writer(user):
+            rng = random.Random(user.pk)
+            barrier.wait()
+            for index in range(options['writes']):
+                event = events[index % len(events)]
+                try:
+                    with transaction.atomic(using=alias):
+                        if model is RSVP:
+                            RSVP.objects.using(alias).update_or_create(
+                                event=event, user=user,
+                                defaults={'status': rng.choice(['Going', 'Maybe', 'Not Going'])},
+                            )
+                        else:
+                            Review.objects.using(alias).update_or_create(
+                                event=event, user=user,
+                                defaults={'rating': rng.randint(1, 5), 'comment': 'bench'},
+                            )
+                except OperationalError:
+                    errors.append(1)
+                # Mimic the end of a request: with CONN_MAX_AGE=0 this reconnects.
+                connections[alias].close_if_unusable_or_obsolete()
+            connections[alias].close()
+
+        threads = [threading.Thread(target=writer, args=(user,)) for user in users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        completed = len(users) * options['writes'] - len(errors)
+        return completed / elapsed, len(errors)
@@ -0,0 +1,52 @@
+import json
+
+import cbor2
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from emsAPI.renderers import CBORRenderer, MessagePackRenderer, msgpack
+from events.models import Event, RSVP, Review
+from events.serializers import EventSerializer, RSVPSerializer, ReviewSerializer
+
+from ._bench import best_time, format_row, scratch_database, seed
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON, CBOR and MessagePack payload size and encode/decode time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        with scratch_database():
+            seed(users=100, events=page_size, rsvps_per_event=10, reviews_per_event=5)
+            pages = {
+                'events': EventSerializer(Event.objects.all()[:page_size], many=True).data,
+                'rsvps': RSVPSerializer(RSVP.objects.all()[:page_size], many=True).data,
+                'reviews': ReviewSerializer(Review.objects.all()[:page_size], many=True).data,
+            }
+
+        formats = [('json', JSONRenderer(), json.loads), ('cbor', CBORRenderer(), cbor2.loads)]
+        if msgpack is not None:
+            formats.append((
+                'msgpack', MessagePackRenderer(),
+                lambda payload: msgpack.unpackb(payload, timestamp=3),
+            ))
+
+        for name, data in pages.items():
+            self.stdout.write(f'\n{name} page ({len(data)} items)')
+            self.stdout.write(format_row('format', 'bytes', 'encode ms', 'decode ms'))
+            baseline = None
+            for label, renderer, decode in formats:
+                payload = renderer.render(data)
+                baseline = baseline or len(payload)
+                encode = best_time(lambda: renderer.render(data), repeat=options['repeat'])
+                decoded = best_time(lambda: decode(payload), repeat=options['repeat'])
+                self.stdout.write(format_row(
+                    label,
+                    f'{len(payload)} ({len(payload) / baseline:.0%})',
+                    f'{encode * 1000:.2f}',
+                    f'{decoded * 1000:.2f}',
+                ))
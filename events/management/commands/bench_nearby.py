@@ -0,0 +1,73 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.geo import distance_expression, encode_geohash
+from events.models import Event
+
+from ._bench import format_row, scratch_database
+
+CITIES = [(40.7128, -74.0060), (51.5074, -0.1278), (18.5204, 73.8567), (35.6762, 139.6503), (52.5200, 13.4050)]
+
+
+class Command(BaseCommand):
+    help = 'Compare the geohash-pruned nearby query with a full-table distance scan, in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            start = time.perf_counter()
+            self.seed(rng, options['events'])
+            self.stdout.write(f'seeded {options["events"]} events in {time.perf_counter() - start:.1f}s')
+
+            self.stdout.write(format_row('radius km', 'matches', 'pruned ms', 'full scan ms'))
+            scanned = min(3, options['queries'])
+            for radius in (1, 5, 25, 100):
+                queries = [(lat + rng.gauss(0, 1), lng + rng.gauss(0, 1))
+                           for lat, lng in rng.choices(CITIES, k=options['queries'])]
+                pruned_time = scan_time = 0.0
+                matches = 0
+                for number, (lat, lng) in enumerate(queries):
+                    start = time.perf_counter()
+                    pruned = list(Event.objects.within(lat, lng, radius).values_list('pk', flat=True))
+                    pruned_time += time.perf_counter() - start
+                    matches += len(pruned)
+
+                    if number < scanned:
+                        start = time.perf_counter()
+                        full = list(
+                            Event.objects.annotate(distance=distance_expression(lat, lng))
+                            .filter(distance__lte=radius).order_by('distance', 'id').values_list('pk', flat=True)
+                        )
+                        scan_time += time.perf_counter() - start
+                        assert full == pruned
+                self.stdout.write(format_row(
+                    radius,
+                    matches // len(queries),
+                    f'{pruned_time / len(queries) * 1000:.2f}',
+                    f'{scan_time / scanned * 1000:.1f}',
+                ))
+
+    def seed(self, rng, count, batch_size=10_000):
+        organizer = User.objects.create(username='bench-organizer')
+        now = timezone.now()
+        for offset in range(0, count, batch_size):
+            batch = []
+            for _ in range(min(batch_size, count - offset)):
+                lat, lng = rng.choice(CITIES)
+                lat, lng = lat + rng.gauss(0, 1.5), lng + rng.gauss(0, 1.5)
+                # bulk_create skips save(), which fills geohash in.
+                batch.append(Event(
+                    title='Nearby', description='', organizer=organizer, location='Bench',
+                    latitude=lat, longitude=lng, geohash=encode_geohash(lat, lng),
+                    start_time=now, end_time=now + timedelta(hours=1),
+                ))
+            Event.objects.bulk_create(batch)
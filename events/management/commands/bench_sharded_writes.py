@@ -0,0 +1,116 @@
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections, transaction
+from django.db.models.signals import post_save, pre_save
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from emsAPI.database import register_database, sqlite_database
+from events.models import Event, RSVP, bulk_removal, record_rsvp_stats, remember_previous_status
+from events.sharding import reserve_id_range
+
+from ._bench import format_row, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Concurrent RSVP writers against 0 (primary only), 1, 2, 4... SQLite shards, in scratch files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='0,1,2,4', help='Comma-separated shard counts to compare.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Writes per thread.')
+        parser.add_argument('--events', type=int, default=400)
+        parser.add_argument('--profile', choices=['development', 'sqlite-tuned'], default='sqlite-tuned')
+
+    def handle(self, *args, **options):
+        tuned = options['profile'] == 'sqlite-tuned'
+        counts = [int(count) for count in options['shards'].split(',')]
+        with tempfile.TemporaryDirectory() as directory:
+            primary = str(Path(directory) / 'primary.sqlite3')
+            default = connections['default']
+            if default.vendor == 'sqlite':
+                # The same profile on the primary as on the shards, so the rows compare fairly.
+                default.settings_dict.update(
+                    {key: value for key, value in sqlite_database(primary, tuned=tuned).items() if key != 'NAME'}
+                )
+            with scratch_database(test_name=primary):
+                users, events = self.seed(options['threads'], options['events'])
+                self.stdout.write(format_row('shards', 'rollups', 'writes/s', 'locked errors'))
+                for count in counts:
+                    aliases = [f'bench_shard_{count}_{index + 1}' for index in range(count)]
+                    for alias in aliases:
+                        path = str(Path(directory) / f'{alias}.sqlite3')
+                        register_database(alias, sqlite_database(path, tuned=tuned, foreign_keys=False))
+                    with override_settings(RSVP_SHARDS=aliases):
+                        for alias in aliases:
+                            call_command('migrate', database=alias, run_syncdb=True, verbosity=0)
+                            # Reconnect with foreign_keys=OFF, which migrate switched back on.
+                            connections[alias].close()
+                            reserve_id_range(alias)
+                        for rollups in (False, True):
+                            rate, errors = self.run_writers(users, events, rollups, options)
+                            label = count or 'primary'
+                            self.stdout.write(format_row(label, 'on' if rollups else 'off', f'{rate:.0f}', errors))
+                    for alias in aliases:
+                        connections[alias].close()
+
+    def seed(self, threads, count):
+        now = timezone.now()
+        users = User.objects.bulk_create([User(username=f'writer{i}') for i in range(threads)])
+        Event.objects.bulk_create([
+            Event(title=f'Bench {i}', description='', organizer=users[0], location='Bench',
+                  start_time=now, end_time=now + timedelta(hours=1))
+            for i in range(count)
+        ])
+        return users, list(Event.objects.values_list('pk', flat=True))
+
+    def run_writers(self, users, events, rollups, options):
+        """Every thread upserts RSVPs across all events; rollups=False measures the shards alone."""
+        if not rollups:
+            post_save.disconnect(record_rsvp_stats, sender=RSVP)
+            pre_save.disconnect(remember_previous_status, sender=RSVP)
+        errors = []
+        barrier = threading.Barrier(options['threads'])
+
+        def writer(user):
+            rng = random.Random(user.pk)
+            barrier.wait()
+            for index in range(options['writes']):
+                event_id = events[(index * 7 + user.pk) % len(events)]
+                rsvps = RSVP.objects.for_event(event_id)
+                try:
+                    with transaction.atomic(using=rsvps.db):
+                        rsvps.update_or_create(
+                            event_id=event_id, user=user,
+                            defaults={'status': rng.choice(['Going', 'Maybe', 'Not Going'])},
+                        )
+                except OperationalError:
+                    errors.append(1)
+                # Mimic the end of a request: with CONN_MAX_AGE=0 this reconnects.
+                close_old_connections()
+            connections.close_all()
+
+        try:
+            threads = [threading.Thread(target=writer, args=(user,)) for user in users]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            if not rollups:
+                post_save.connect(record_rsvp_stats, sender=RSVP)
+                pre_save.connect(remember_previous_status, sender=RSVP)
+        with bulk_removal():
+            for rsvps in RSVP.objects.all().per_shard():
+                rsvps.delete()
+        return (len(users) * options['writes'] - len(errors)) / elapsed, len(errors)
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import RecommendedEvent
+from events.recommendations import compute, get_option
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the "events for you" feed: top-K upcoming events per user from RSVP '
+        'co-attendance and organizer affinity, stored in RecommendedEvent.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None, help='RSVPs per export batch.')
+        parser.add_argument('--write-batch', type=int, default=500, help='Users replaced per transaction.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        now = timezone.now()
+        top_k = options['top_k'] or get_option('TOP_K')
+        users, rows, pending = 0, 0, []
+        for user_id, ranked in compute(now, top_k, options['batch_size']):
+            pending.append((user_id, ranked))
+            if len(pending) >= options['write_batch']:
+                rows += self.write(pending, now)
+                users += len(pending)
+                pending = []
+        rows += self.write(pending, now)
+        users += len(pending)
+        # Users who no longer have any signal keep nothing from an older run.
+        RecommendedEvent.objects.filter(computed_at__lt=now).delete()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {rows} recommendations for {users - 1} users (+ popular list) in {elapsed:.1f}s'
+        ))
+
+    def write(self, batch, now):
+        """Swap each user's rows in one transaction, so the feed never reads a half-written list."""
+        if not batch:
+            return 0
+        user_ids = [user_id for user_id, _ in batch]
+        with transaction.atomic():
+            stale = RecommendedEvent.objects.filter(user_id__in=[pk for pk in user_ids if pk is not None])
+            if None in user_ids:
+                stale = stale | RecommendedEvent.objects.filter(user__isnull=True)
+            stale.delete()
+            created = RecommendedEvent.objects.bulk_create([
+                RecommendedEvent(user_id=user_id, event_id=event_id, rank=rank, score=score, computed_at=now)
+                for user_id, ranked in batch
+                for rank, (event_id, score) in enumerate(ranked, start=1)
+            ])
+        return len(created)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from emsAPI.profiling import clear_profiles, format_stacks, labels, merged_stacks
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge the collapsed stacks recorded by profiled requests into one '
+        'flamegraph.pl/speedscope input file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('label', nargs='?', help='View and action, e.g. EventViewSet.list (default: all)')
+        parser.add_argument('--output', '-o', help='Write here instead of stdout')
+        parser.add_argument('--list', action='store_true', help='List labels with recorded samples')
+        parser.add_argument('--clear', action='store_true', help='Delete the recorded samples')
+
+    def handle(self, *args, **options):
+        label = options['label']
+        if options['list']:
+            for name in labels():
+                self.stdout.write(name)
+            return
+        if options['clear']:
+            clear_profiles(label)
+            self.stdout.write(self.style.SUCCESS('Cleared recorded samples'))
+            return
+        stacks = merged_stacks(label)
+        if not stacks:
+            raise CommandError('No samples recorded' + (f' for {label}' if label else ''))
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(format_stacks(stacks))
+            self.stderr.write(f'Wrote {len(stacks)} stacks ({sum(stacks.values())} samples) to {options["output"]}')
+        else:
+            self.stdout.write(format_stacks(stacks), ending='')
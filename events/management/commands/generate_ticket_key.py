@@ -0,0 +1,14 @@
+import base64
+
+from Crypto.PublicKey import ECC
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Print a new Ed25519 private key (PEM) for TICKETS["PRIVATE_KEY"] and its public key for scanners.'
+
+    def handle(self, *args, **options):
+        key = ECC.generate(curve='Ed25519')
+        self.stdout.write(key.export_key(format='PEM'))
+        public = base64.b64encode(key.public_key().export_key(format='raw')).decode()
+        self.stderr.write(f'Public key (base64): {public}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Geocode events without coordinates from the offline gazetteer and fill in their geohash.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch, located = [], 0
+        pending = Event.objects.filter(geohash='').only('id', 'location', 'latitude', 'longitude')
+        for event in pending.iterator(chunk_size=options['batch_size']):
+            event.locate()
+            if event.geohash:
+                batch.append(event)
+            if len(batch) >= options['batch_size']:
+                located += self.flush(batch)
+        located += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {located} events'))
+
+    def flush(self, batch):
+        Event.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+        count = len(batch)
+        batch.clear()
+        return count
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from emsAPI.changelist import iterate_chunks
+from events.models import RSVP
+
+
+class Command(BaseCommand):
+    help = 'Issue door tickets for "Going" RSVPs that have none (rows bulk-loaded or created before tickets existed).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        issued = 0
+        now = timezone.now().replace(microsecond=0)
+        for queryset in RSVP.objects.filter(status='Going', ticket_issued_at__isnull=True).per_shard():
+            for chunk in iterate_chunks(queryset, [], size=options['batch_size']):
+                issued += queryset.filter(pk__in=[pk for pk, in chunk]).update(ticket_issued_at=now)
+        self.stdout.write(self.style.SUCCESS(f'Issued {issued} tickets'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Delete expired Idempotency-Key records in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        pruned = 0
+        while True:
+            ids = list(
+                IdempotencyRecord.objects.filter(expires_at__lte=now)
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            pruned += IdempotencyRecord.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} expired idempotency keys'))
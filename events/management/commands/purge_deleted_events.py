@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from events.archive import get_batch_size, purge_event
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted events (and their RSVPs, reviews and invitations) in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=get_batch_size())
+
+    def handle(self, *args, **options):
+        pending = list(
+            Event.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('id', flat=True)
+        )
+        purged = sum(purge_event(event_id, options['batch_size']) for event_id in pending)
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} deleted events'))
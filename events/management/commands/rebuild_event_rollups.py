@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+from events.models import (
+    EventStatsBucket, EventStatsDaily, EventStatsHourly, RSVP, Review, review_histogram_key,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the hourly/daily analytics rollups from raw RSVP and Review rows. '
+        'History is approximated: each RSVP counts towards its current status as of its last update.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='events',
+                            help='Limit the rebuild to these event ids (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        scope = {'event_id__in': options['events']} if options['events'] else {}
+        hourly = defaultdict(lambda: dict.fromkeys(EventStatsBucket.COUNTERS, 0))
+
+        # With sharding each shard is aggregated in turn; an event's rows never span shards.
+        for rsvps in RSVP.objects.filter(**scope).per_shard():
+            created = (
+                rsvps.values('event_id', hour=TruncHour('created_at'))
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            for row in created:
+                hourly[row['event_id'], row['hour']]['rsvps_created'] += row['count']
+
+            statuses = (
+                rsvps.values('event_id', 'status', hour=TruncHour('updated_at'))
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            for row in statuses:
+                counter = EventStatsBucket.STATUS_COUNTERS.get(row['status'])
+                if counter is None:
+                    continue
+                hourly[row['event_id'], row['hour']][counter] += row['count']
+
+        for reviews in Review.objects.filter(**scope).per_shard():
+            ratings = (
+                reviews.values('event_id', 'rating', hour=TruncHour('created_at'))
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            for row in ratings:
+                counters = hourly[row['event_id'], row['hour']]
+                counters['reviews'] += row['count']
+                counters['rating_sum'] += row['rating'] * row['count']
+                counters[f"rating_{row['rating']}"] += row['count']
+
+        daily = defaultdict(lambda: dict.fromkeys(EventStatsBucket.COUNTERS, 0))
+        for (event_id, hour), counters in hourly.items():
+            day = daily[event_id, EventStatsDaily.truncate(hour)]
+            for name, value in counters.items():
+                day[name] += value
+
+        with transaction.atomic():
+            for model, buckets in ((EventStatsHourly, hourly), (EventStatsDaily, daily)):
+                model.objects.filter(**scope).delete()
+                model.objects.bulk_create(
+                    [model(event_id=event_id, bucket=bucket, **counters)
+                     for (event_id, bucket), counters in buckets.items()],
+                    batch_size=options['batch_size'],
+                )
+        cache.delete_many([review_histogram_key(event_id) for event_id, _ in daily])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(hourly)} hourly and {len(daily)} daily rollup rows'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+from users.models import normalize_search
+
+
+class Command(BaseCommand):
+    help = 'Recompute the normalized title column used by the admin event search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch, updated = [], 0
+        for event in Event.all_objects.only('id', 'title').iterator(chunk_size=options['batch_size']):
+            event.search_title = normalize_search(event.title)
+            batch.append(event)
+            if len(batch) >= options['batch_size']:
+                updated += self.flush(batch)
+        updated += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {updated} events'))
+
+    def flush(self, batch):
+        Event.all_objects.bulk_update(batch, ['search_title'])
+        count = len(batch)
+        batch.clear()
+        return count
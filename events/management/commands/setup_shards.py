@@ -0,0 +1,80 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from events import counts
+from events.models import RSVP, Review, bulk_removal
+from events.sharding import get_shards, reserve_id_range, shard_for_event
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the RSVP and Review tables on every shard and reserve their id ranges. '
+        'With --rebalance, also move rows that are not on their event\'s shard, including '
+        'rows still on the primary.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebalance', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            raise CommandError('No shards configured; set EMS_RSVP_SHARDS.')
+        for alias in shards:
+            call_command('migrate', database=alias, run_syncdb=True, verbosity=0)
+            # Schema changes turn SQLite foreign key checks back on; reconnect
+            # so the shard's foreign_keys=OFF applies again.
+            connections[alias].close()
+            reserve_id_range(alias)
+            self.stdout.write(self.style.SUCCESS(f'Prepared {alias}'))
+        if options['rebalance']:
+            for model in (RSVP, Review):
+                for source in (DEFAULT_DB_ALIAS, *shards):
+                    moved = self.rebalance(model, source, options['batch_size'])
+                    if moved:
+                        self.stdout.write(f'Moved {moved} {model._meta.verbose_name_plural} off {source}')
+
+    def rebalance(self, model, source, batch_size):
+        """Move misplaced rows in pk-ordered batches; safe to rerun after an interruption."""
+        with counts.frozen():
+            return self.move_rows(model, source, batch_size)
+
+    def move_rows(self, model, source, batch_size):
+        moved, last = 0, 0
+        while True:
+            rows = list(model.objects.using(source).filter(pk__gt=last).order_by('pk')[:batch_size])
+            if not rows:
+                return moved
+            last = rows[-1].pk
+            targets = {}
+            for row in rows:
+                target = shard_for_event(row.event_id)
+                if target != source:
+                    targets.setdefault(target, []).append(row)
+            for target, batch in targets.items():
+                # Rows copied by an interrupted run are found by (event, user) and skipped.
+                existing = set(
+                    model.objects.using(target)
+                    .filter(event_id__in={row.event_id for row in batch}, user_id__in={row.user_id for row in batch})
+                    .values_list('event_id', 'user_id')
+                )
+                copies = [
+                    model(**{
+                        field.attname: getattr(row, field.attname)
+                        for field in model._meta.concrete_fields if not field.primary_key
+                    })
+                    for row in batch if (row.event_id, row.user_id) not in existing
+                ]
+                with transaction.atomic(using=target):
+                    model.objects.using(target).bulk_create(copies)
+                    # bulk_create stamps auto_now fields; put the original times back.
+                    originals = {(row.event_id, row.user_id): row for row in batch}
+                    for copy in copies:
+                        original = originals[copy.event_id, copy.user_id]
+                        copy.created_at, copy.updated_at = original.created_at, original.updated_at
+                    model.objects.using(target).bulk_update(copies, ['created_at', 'updated_at'])
+                with transaction.atomic(using=source), bulk_removal():
+                    model.objects.using(source).filter(pk__in=[row.pk for row in batch]).delete()
+                moved += len(batch)
@@ -1,29 +1,270 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, models, router, transaction
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+import secrets
+from contextlib import contextmanager
+from contextvars import ContextVar
+from rest_framework.utils.encoders import JSONEncoder
+from emsAPI.db_routers import pin_user
+from users.models import normalize_search
+from . import counts, tickets
+from .geo import RANGE_END, cover_cells, distance_expression, encode_geohash, geocode
+from .recurrence import is_occurrence, last_end, occurrence_key, occurrences_between, parse_rule
+from .sharding import FanOut, get_shards, shard_for_event
+
+# Set while purging or archiving: the removed rows' rollups go away with their event.
+_bulk_removal = ContextVar('bulk_removal', default=False)
+
+def new_calendar_token():
+    return secrets.token_urlsafe(32)
+
+class EventQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Annotate rsvp_total and rating_average with one correlated subquery each."""
+        if get_shards():
+            totals = EventStatsDaily.objects.filter(event=models.OuterRef('pk')).order_by().values('event')
+            rsvps = totals.annotate(total=models.Sum(F('going') + F('maybe') + F('not_going'))).values('total')
+            ratings = totals.annotate(
+                average=Cast(models.Sum('rating_sum'), models.FloatField()) / NullIf(models.Sum('reviews'), 0)
+            ).values('average')
+        else:
+            rsvps = (
+                RSVP.objects.filter(event=models.OuterRef('pk')).order_by()
+                .values('event').annotate(total=models.Count('pk')).values('total')
+            )
+            ratings = (
+                Review.objects.filter(event=models.OuterRef('pk')).order_by()
+                .values('event').annotate(average=models.Avg('rating')).values('average')
+            )
+        return self.annotate(
+            rsvp_total=Coalesce(models.Subquery(rsvps), 0),
+            rating_average=models.Subquery(ratings, output_field=models.FloatField()),
+        )
+
+    def within(self, latitude, longitude, radius_km):
+        """Events within radius_km, nearest first, annotated with their `distance` in km."""
+        # The geohash index narrows the search to a few cells; exact distances
+        # are only computed for the candidates inside them.
+        cells = models.Q()
+        for cell in cover_cells(latitude, longitude, radius_km):
+            cells |= models.Q(geohash__gte=cell, geohash__lt=cell + RANGE_END)
+        return (
+            self.filter(cells)
+            .annotate(distance=distance_expression(latitude, longitude))
+            .filter(distance__lte=radius_km)
+            .order_by('distance', 'id')
+        )
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 class Event(models.Model):
     title = models.CharField(max_length=255)
+    # Case-folded title for indexed prefix search in the admin.
+    search_title = models.CharField(max_length=255, blank=True, default='', db_index=True)
     description = models.TextField()
     organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='organized_events')
     location = models.CharField(max_length=255)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # A recurring series expands its occurrences lazily (events.recurrence);
+    # only occurrences that changed or have RSVPs/reviews exist as rows, linked
+    # back through `series`.
+    recurrence_rule = models.CharField(max_length=255, blank=True, default='')
+    recurrence_end = models.DateTimeField(blank=True, null=True)
+    recurrence_exdates = models.JSONField(blank=True, default=list)
+    series = models.ForeignKey(
+        'self', on_delete=models.CASCADE, blank=True, null=True, related_name='occurrences'
+    )
+    occurrence_start = models.DateTimeField(blank=True, null=True)
+    # Soft-deleted events are hidden by `objects` until a background purge removes them.
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = EventManager()
+    all_objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time', 'id'], name='event_start_time_id_idx'),
+            models.Index(fields=['end_time'], name='event_end_time_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'occurrence_start'], name='event_series_occurrence_uniq'
+            ),
+        ]
 
     def clean(self):
         if self.end_time <= self.start_time:
             raise ValidationError("End time must be after start time")
+        if self.recurrence_rule and self.series_id:
+            raise ValidationError("An occurrence cannot have its own recurrence rule")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so the public-events counter can follow visibility changes.
+        loaded = {'is_public', 'deleted_at'} <= instance.__dict__.keys()
+        instance._loaded_listed = instance.is_listed() if loaded else None
+        return instance
+
+    def is_listed(self):
+        """Whether the event counts towards the public listing."""
+        return self.is_public and self.deleted_at is None
+
+    @property
+    def is_recurring(self):
+        return bool(self.recurrence_rule)
+
+    @property
+    def rule(self):
+        return parse_rule(self.recurrence_rule) if self.recurrence_rule else None
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def occurrence_starts(self, window_start, window_end):
+        """Virtual occurrence starts overlapping the window, without cancelled ones."""
+        excluded = set(self.recurrence_exdates)
+        return [
+            start for start in occurrences_between(
+                self.rule, self.start_time, self.duration, window_start, window_end
+            )
+            if occurrence_key(start) not in excluded
+        ]
+
+    def materialize(self, start):
+        """Return the row for one occurrence, creating it from the series on first use."""
+        if (
+            not self.is_recurring
+            or occurrence_key(start) in self.recurrence_exdates
+            or not is_occurrence(self.rule, self.start_time, start)
+        ):
+            raise ValidationError("Not an occurrence of this series")
+        if start == self.start_time:
+            return self
+        occurrence, _ = Event.objects.get_or_create(
+            series=self, occurrence_start=start,
+            defaults={
+                'title': self.title, 'description': self.description,
+                'organizer_id': self.organizer_id, 'location': self.location,
+                'latitude': self.latitude, 'longitude': self.longitude,
+                'start_time': start, 'end_time': start + self.duration,
+                'is_public': self.is_public,
+            },
+        )
+        return occurrence
+
+    def cancel_occurrence(self, start):
+        if not self.is_recurring or not is_occurrence(self.rule, self.start_time, start):
+            raise ValidationError("Not an occurrence of this series")
+        if start == self.start_time:
+            raise ValidationError("The first occurrence is the series itself; delete the event instead")
+        key = occurrence_key(start)
+        if key not in self.recurrence_exdates:
+            self.recurrence_exdates = [*self.recurrence_exdates, key]
+            # updated_at moves too: calendar feeds (events.ical) key on it.
+            self.updated_at = timezone.now()
+            Event.objects.filter(pk=self.pk).update(
+                recurrence_exdates=self.recurrence_exdates, updated_at=self.updated_at
+            )
+        return self.occurrences.filter(occurrence_start=start).first()
+
+    def locate(self):
+        if self.latitude is None or self.longitude is None:
+            self.latitude, self.longitude = geocode(self.location) or (None, None)
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.locate()
+        self.search_title = normalize_search(self.title)
+        self.recurrence_end = (
+            last_end(self.rule, self.start_time, self.duration) if self.recurrence_rule else None
+        )
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
+class Invitation(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='invitations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='invitations')
+    invited_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='sent_invitations'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['event', 'user']
+        indexes = [
+            models.Index(fields=['user', 'event'], name='invitation_user_event_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.event.title}"
+
+class ShardedQuerySet(models.QuerySet):
+    """RSVP and Review queries that know which database holds an event's rows (events.sharding)."""
+
+    def for_event(self, event_id):
+        return self.using(shard_for_event(event_id)).filter(event_id=event_id)
+
+    def per_shard(self):
+        """This query bound to each database that holds rows: every shard, or just the primary."""
+        return [self.using(alias) for alias in get_shards() or [DEFAULT_DB_ALIAS]]
+
+    def across_shards(self):
+        """This query over every shard, merged in its ordering; unchanged when not sharded."""
+        shards = get_shards()
+        return FanOut([self.using(alias) for alias in shards]) if shards else self
+
+    def visible(self):
+        """Rows whose event has not been soft-deleted."""
+        if not get_shards():
+            return self.filter(event__deleted_at__isnull=True)
+        # Events are on another database; deleted ones are few and soon purged.
+        deleted = Event.all_objects.filter(deleted_at__isnull=False).values_list('pk', flat=True)
+        return self.exclude(event_id__in=list(deleted))
+
+    def with_related(self, *lookups):
+        """select_related() on one database, prefetch_related() once rows are on shards."""
+        return self.prefetch_related(*lookups) if get_shards() else self.select_related(*lookups)
+
+    def _on_event_shard(self, kwargs):
+        if self._db is not None or not get_shards():
+            return self
+        event = kwargs.get('event')
+        return self.using(shard_for_event(event.pk if event is not None else kwargs.get('event_id')))
+
+    def create(self, **kwargs):
+        return super(ShardedQuerySet, self._on_event_shard(kwargs)).create(**kwargs)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        return super(ShardedQuerySet, self._on_event_shard(kwargs)).get_or_create(defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, create_defaults=None, **kwargs):
+        return super(ShardedQuerySet, self._on_event_shard(kwargs)).update_or_create(
+            defaults, create_defaults, **kwargs
+        )
+
 class RSVP(models.Model):
     STATUS_CHOICES = [
         ('Going', 'Going'),
@@ -31,15 +272,34 @@ class RSVP(models.Model):
         ('Not Going', 'Not Going'),
     ]
     
+    # Shard databases cannot enforce these (events.sharding); the primary does.
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='rsvps')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rsvps')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Going')
+    # Issue time of the latest door ticket (events.tickets); kept after the
+    # RSVP stops being "Going" so a later ticket is always issued after it.
+    ticket_issued_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ['event', 'user']
 
+    @property
+    def ticket(self):
+        if self.status != 'Going' or self.ticket_issued_at is None:
+            return None
+        return tickets.issue(self.event_id, self.user_id, self.ticket_issued_at)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so the analytics rollups can record status transitions.
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def __str__(self):
         return f"{self.user.username} - {self.event.title} - {self.status}"
 
@@ -59,8 +319,19 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ['event', 'user']
+        indexes = [
+            models.Index(fields=['event', 'rating', 'created_at'], name='review_event_rating_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = instance.__dict__.get('rating')
+        return instance
 
     def clean(self):
         if self.rating < 1 or self.rating > 5:
@@ -71,4 +342,380 @@ class Review(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.user.username} - {self.event.title} - {self.rating} Stars"
\ No newline at end of file
+        return f"{self.user.username} - {self.event.title} - {self.rating} Stars"
+
+class CheckIn(models.Model):
+    """An attendee admitted at the door, uploaded by a scanner after the fact."""
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='checkins')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='checkins')
+    scanned_at = models.DateTimeField()
+    scanner = models.CharField(max_length=64, blank=True, default='')
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['event', 'user']
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.event_id}"
+
+class TicketRevocation(models.Model):
+    """Tickets for this event and user issued at or before `issued_until` are void."""
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='ticket_revocations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ticket_revocations')
+    issued_until = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['event', 'user']
+        indexes = [
+            models.Index(fields=['event', 'revoked_at'], name='revocation_event_time_idx'),
+        ]
+
+class RecommendedEvent(models.Model):
+    """A precomputed "events for you" entry (build_recommendations); user=None rows are the popular fallback."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, blank=True, null=True, related_name='recommended_events'
+    )
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='recommendations')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'], name='recommended_user_rank_uniq'),
+        ]
+
+class CalendarFeed(models.Model):
+    """The secret token in a user's iCalendar feed URL (events.ical)."""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True, default=new_calendar_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def rotate(self):
+        self.token = new_calendar_token()
+        self.save(update_fields=['token'])
+
+class EventStatsBucket(models.Model):
+    """Net changes to an event's RSVP and review counters within one time bucket."""
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+')
+    bucket = models.DateTimeField()
+    rsvps_created = models.IntegerField(default=0)
+    going = models.IntegerField(default=0)
+    maybe = models.IntegerField(default=0)
+    not_going = models.IntegerField(default=0)
+    reviews = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+
+    COUNTERS = [
+        'rsvps_created', 'going', 'maybe', 'not_going', 'reviews', 'rating_sum',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    ]
+    STATUS_COUNTERS = {'Going': 'going', 'Maybe': 'maybe', 'Not Going': 'not_going'}
+
+    class Meta:
+        abstract = True
+        unique_together = ['event', 'bucket']
+
+    # Fields zeroed to find a moment's bucket; set by each concrete table.
+    truncated_fields = ()
+
+    @classmethod
+    def truncate(cls, moment):
+        return moment.replace(**dict.fromkeys(cls.truncated_fields, 0))
+
+    @classmethod
+    def bump(cls, event_id, moment, deltas):
+        bucket = cls.truncate(moment)
+        connection = connections[router.db_for_write(cls)]
+        if connection.vendor in ('sqlite', 'postgresql'):
+            # One statement whether or not the bucket exists yet.
+            cls.upsert(connection, event_id, bucket, deltas)
+            return
+        rows = cls.objects.filter(event_id=event_id, bucket=bucket)
+        changes = {name: F(name) + delta for name, delta in deltas.items()}
+        if rows.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(event_id=event_id, bucket=bucket, **deltas)
+        except IntegrityError:
+            rows.update(**changes)
+
+    @classmethod
+    def upsert(cls, connection, event_id, bucket, deltas):
+        quote = connection.ops.quote_name
+        table = quote(cls._meta.db_table)
+        columns = [cls._meta.get_field('event').column, 'bucket', *cls.COUNTERS]
+        values = [
+            event_id, cls._meta.get_field('bucket').get_db_prep_save(bucket, connection),
+            *(deltas.get(name, 0) for name in cls.COUNTERS),
+        ]
+        changes = ', '.join(f'{quote(name)} = {table}.{quote(name)} + excluded.{quote(name)}' for name in deltas)
+        sql = (
+            f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))}) '
+            f'ON CONFLICT ({quote(columns[0])}, {quote("bucket")}) DO UPDATE SET {changes}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values)
+
+class EventStatsHourly(EventStatsBucket):
+    truncated_fields = ('minute', 'second', 'microsecond')
+
+    class Meta(EventStatsBucket.Meta):
+        pass
+
+class EventStatsDaily(EventStatsBucket):
+    truncated_fields = ('hour', 'minute', 'second', 'microsecond')
+
+    class Meta(EventStatsBucket.Meta):
+        pass
+
+class ArchivedEvent(models.Model):
+    """An event moved out of the hot table by `archive_events`; keeps its original id."""
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_events')
+    location = models.CharField(max_length=255)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    is_public = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # Archived events never change, so their summary numbers are stored once.
+    rsvp_count = models.IntegerField(default=0)
+    average_rating = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time', 'id'], name='archived_event_start_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class ArchivedRSVP(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='rsvps')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_rsvps')
+    status = models.CharField(max_length=20, choices=RSVP.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+class ArchivedReview(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='reviews')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_reviews')
+    rating = models.IntegerField(choices=Review.RATING_CHOICES)
+    comment = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+class IdempotencyRecord(models.Model):
+    """The outcome of a write sent with an Idempotency-Key; without a status_code it is still running."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+
+def calendar_events_key(user_id):
+    return f'calendar:going:{user_id}'
+
+def review_histogram_key(event_id):
+    return f'events:review-histogram:{event_id}'
+
+@contextmanager
+def bulk_removal():
+    token = _bulk_removal.set(True)
+    try:
+        yield
+    finally:
+        _bulk_removal.reset(token)
+
+def deleting_event(origin):
+    # Rows removed because their event is being deleted need no rollup updates;
+    # the rollups are deleted along with the event.
+    return (
+        _bulk_removal.get()
+        or isinstance(origin, Event)
+        or getattr(origin, 'model', None) is Event
+    )
+
+def record_event_stats(event_id, deltas, moment=None):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    moment = moment or timezone.now()
+    for model in (EventStatsHourly, EventStatsDaily):
+        model.bump(event_id, moment, deltas)
+
+@receiver([post_save, post_delete], sender=Event)
+def pin_organizer_to_primary(sender, instance, **kwargs):
+    pin_user(instance.organizer_id)
+
+@receiver(post_save, sender=Event)
+def count_public_event(sender, instance, created, **kwargs):
+    previous = False if created else getattr(instance, '_loaded_listed', None)
+    listed = instance.is_listed()
+    if previous is not None and previous != listed:
+        counts.adjust(counts.PUBLIC_EVENTS, 1 if listed else -1)
+    instance._loaded_listed = listed
+
+@receiver(post_delete, sender=Event)
+def uncount_public_event(sender, instance, **kwargs):
+    if instance.is_listed():
+        counts.adjust(counts.PUBLIC_EVENTS, -1)
+
+@receiver(post_save, sender=RSVP)
+@receiver(post_save, sender=Review)
+def count_user_row(sender, instance, created, **kwargs):
+    if created:
+        counts.adjust(counts.user_counter(sender._meta.model_name, instance.user_id), 1)
+
+@receiver(post_delete, sender=RSVP)
+@receiver(post_delete, sender=Review)
+def uncount_user_row(sender, instance, **kwargs):
+    counts.adjust(counts.user_counter(sender._meta.model_name, instance.user_id), -1)
+
+@receiver([post_save, post_delete], sender=RSVP)
+@receiver([post_save, post_delete], sender=Review)
+def pin_author_to_primary(sender, instance, **kwargs):
+    pin_user(instance.user_id)
+
+@receiver([post_save, post_delete], sender=RSVP)
+def forget_calendar_events(sender, instance, **kwargs):
+    # The user's calendar feed re-reads its event ids on the next request.
+    cache.delete(calendar_events_key(instance.user_id))
+
+@receiver(pre_save, sender=RSVP)
+def remember_previous_status(sender, instance, using=None, **kwargs):
+    if instance._state.adding or hasattr(instance, '_loaded_status'):
+        return
+    instance._loaded_status = (
+        RSVP.objects.using(using).filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+@receiver(pre_save, sender=RSVP)
+def issue_ticket(sender, instance, **kwargs):
+    previous = None if instance._state.adding else instance._loaded_status
+    if instance.status == 'Going' and previous != 'Going':
+        instance.ticket_issued_at = tickets.next_issue_time(timezone.now(), instance.ticket_issued_at)
+    instance._revoke_ticket = previous == 'Going' and instance.status != 'Going'
+
+@receiver(post_save, sender=RSVP)
+def revoke_ticket_on_change(sender, instance, **kwargs):
+    if instance._revoke_ticket:
+        revoke_ticket(instance)
+
+@receiver(post_delete, sender=RSVP)
+def revoke_ticket_on_delete(sender, instance, origin=None, **kwargs):
+    # Cascades from a deleted user or event take the revocations with them.
+    if instance.status == 'Going' and not deleting_event(origin) and getattr(origin, 'model', type(origin)) is RSVP:
+        revoke_ticket(instance)
+
+def revoke_ticket(rsvp):
+    revoke_tickets([(rsvp.event_id, rsvp.user_id, rsvp.ticket_issued_at)])
+
+def revoke_tickets(rows):
+    """Void the tickets of (event_id, user_id, issued_until) rows with one upsert."""
+    TicketRevocation.objects.bulk_create(
+        [
+            TicketRevocation(event_id=event_id, user_id=user_id, issued_until=issued_until)
+            for event_id, user_id, issued_until in rows if issued_until is not None
+        ],
+        update_conflicts=True, unique_fields=['event', 'user'], update_fields=['issued_until', 'revoked_at'],
+    )
+
+@receiver(post_save, sender=RSVP)
+def record_rsvp_stats(sender, instance, created, **kwargs):
+    counters = EventStatsBucket.STATUS_COUNTERS
+    deltas = {'rsvps_created': 1} if created else {}
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    if previous != instance.status:
+        if previous in counters:
+            deltas[counters[previous]] = -1
+        # Rows saved outside the API may carry a status the rollups do not count.
+        if instance.status in counters:
+            deltas[counters[instance.status]] = deltas.get(counters[instance.status], 0) + 1
+    record_event_stats(instance.event_id, deltas)
+    instance._loaded_status = instance.status
+
+@receiver(post_delete, sender=RSVP)
+def record_rsvp_removal(sender, instance, origin=None, **kwargs):
+    counter = EventStatsBucket.STATUS_COUNTERS.get(instance.status)
+    if deleting_event(origin) or counter is None:
+        return
+    record_event_stats(instance.event_id, {counter: -1})
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, using=None, **kwargs):
+    if instance._state.adding or hasattr(instance, '_loaded_rating'):
+        return
+    instance._loaded_rating = (
+        Review.objects.using(using).filter(pk=instance.pk).values_list('rating', flat=True).first()
+    )
+
+@receiver(post_save, sender=Review)
+def record_review_stats(sender, instance, created, **kwargs):
+    rating = int(instance.rating)
+    if created:
+        deltas = {'reviews': 1, 'rating_sum': rating, f'rating_{rating}': 1}
+    else:
+        previous = getattr(instance, '_loaded_rating', None)
+        deltas = {}
+        if previous is not None and previous != rating:
+            deltas = {'rating_sum': rating - previous, f'rating_{previous}': -1, f'rating_{rating}': 1}
+    record_event_stats(instance.event_id, deltas)
+    cache.delete(review_histogram_key(instance.event_id))
+    instance._loaded_rating = rating
+
+@receiver(post_delete, sender=Review)
+def record_review_removal(sender, instance, origin=None, **kwargs):
+    if deleting_event(origin):
+        return
+    rating = int(instance.rating)
+    record_event_stats(
+        instance.event_id, {'reviews': -1, 'rating_sum': -rating, f'rating_{rating}': -1}
+    )
+    cache.delete(review_histogram_key(instance.event_id))
+
+@receiver(pre_delete, sender=Event)
+@receiver(pre_delete, sender=User)
+def delete_sharded_rows(sender, instance, **kwargs):
+    """Carry the ORM cascade over to the shards, which it cannot reach by itself."""
+    # Purges and archiving clear the shards themselves.
+    if not get_shards() or _bulk_removal.get():
+        return
+    if sender is Event:
+        with bulk_removal():
+            for model in (RSVP, Review):
+                model.objects.for_event(instance.pk).delete()
+        return
+    for model in (RSVP, Review):
+        for queryset in model.objects.filter(user=instance).per_shard():
+            queryset.delete()
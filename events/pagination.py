@@ -0,0 +1,109 @@
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from . import counts
+
+
+class UpcomingEventPagination(CursorPagination):
+    # Keyset pagination over the (start_time, id) index: each page seeks
+    # straight to its position, however many past events the table holds.
+    ordering = ('start_time', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class LookaheadPage(Page):
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class LookaheadPaginator(Paginator):
+    """A paginator that is given its count and only trusts it when it is exact."""
+
+    def __init__(self, object_list, per_page, count, approximate):
+        super().__init__(object_list, per_page)
+        self.count = count
+        self.approximate = approximate
+
+    def validate_number(self, number):
+        if not self.approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if not self.approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return LookaheadPage(rows[:self.per_page], number, self, has_more=len(rows) > self.per_page)
+
+
+class ApproximateCountPagination(PageNumberPagination):
+    """Page numbers with a `count` that is usually estimated; see events.counts."""
+
+    exact_count_query_param = 'exact_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.count, self.approximate = self.resolve_count(queryset, request, view)
+        paginator = LookaheadPaginator(queryset, page_size, self.count, self.approximate)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        if (self.page.has_next() or self.page.has_previous()) and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def resolve_count(self, items, request, view):
+        ignored = counts.NEUTRAL_PARAMS | {self.page_query_param, self.page_size_query_param, self.exact_count_query_param}
+        key = counts.listing_key(request, ignored)
+        if request.query_params.get(self.exact_count_query_param, '').lower() in ('1', 'true', 'yes'):
+            count = counts.exact_count(items)
+            cache.set(key, count, counts.get_option('CACHE_TIMEOUT'))
+            return count, False
+
+        maintained = getattr(view, 'approximate_count', None)
+        count = maintained(items) if maintained else None
+        if count is None:
+            count = cache.get(key)
+        if count is not None:
+            return count, True
+        return counts.estimate_count(items)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'approximate': self.approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['approximate'] = {'type': 'boolean', 'example': True}
+        schema['required'].append('approximate')
+        return schema
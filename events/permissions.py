@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .access import get_access_resolver
+
 class IsOrganizerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
@@ -7,15 +9,16 @@ class IsOrganizerOrReadOnly(permissions.BasePermission):
         
         return obj.organizer == request.user
 
+class IsOrganizer(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return obj.organizer == request.user
+
 class IsPrivateEventAccessible(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if obj.is_public:
-            return True
-        
-        return obj.organizer == request.user or obj.rsvps.filter(user=request.user).exists()
+        return get_access_resolver(request).can_view(obj)
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.user == request.user
\ No newline at end of file
+        return obj.user == request.user
@@ -0,0 +1,160 @@
+"""Offline "events for you" recommendations from the RSVP co-attendance graph."""
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from emsAPI.changelist import iterate_chunks
+
+from .models import Event, Invitation, RSVP
+
+DEFAULTS = {
+    'TOP_K': 50,
+    'MAYBE_WEIGHT': 0.5,
+    'ORGANIZER_WEIGHT': 0.5,
+    'NEIGHBOURS': 100,
+    'LOOKBACK_DAYS': 365,
+    'BATCH_SIZE': 5000,
+}
+
+
+def get_option(name):
+    return getattr(settings, 'RECOMMENDATIONS', {}).get(name, DEFAULTS[name])
+
+
+def export_rsvps(since, batch_size):
+    """Yield batches of (user_id, event_id, weight) from every shard."""
+    weights = {'Going': 1.0, 'Maybe': get_option('MAYBE_WEIGHT')}
+    rsvps = RSVP.objects.filter(status__in=list(weights), updated_at__gte=since)
+    for queryset in rsvps.per_shard():
+        for chunk in iterate_chunks(queryset, ['user_id', 'event_id', 'status'], size=batch_size):
+            yield [(user_id, event_id, weights[status]) for _, user_id, event_id, status in chunk]
+
+
+class CoAttendance:
+    """The sparse matrices behind the scores, built from exported RSVP batches."""
+
+    def __init__(self, candidates):
+        # candidates: {event_id: organizer_id} for upcoming, live events.
+        self.candidates = candidates
+        self.rows = defaultdict(dict)  # A: user -> {event: weight}
+        self.co = defaultdict(lambda: defaultdict(float))  # C: event -> {candidate: weight}
+        self.popularity = defaultdict(float)  # P: candidate -> weight
+        self.organizer_of = {}
+        self.by_organizer = defaultdict(list)
+        for candidate, organizer in candidates.items():
+            self.by_organizer[organizer].append(candidate)
+
+    def add(self, batch):
+        for user_id, event_id, weight in batch:
+            self.rows[user_id][event_id] = weight
+
+    def finish(self, organizers):
+        """Compute C and P once every batch is in; organizers maps event id -> organizer id."""
+        self.organizer_of = organizers
+        for events in self.rows.values():
+            upcoming = [(event_id, weight) for event_id, weight in events.items() if event_id in self.candidates]
+            for candidate, weight in upcoming:
+                self.popularity[candidate] += weight
+            if not upcoming:
+                continue
+            for event_id, weight in events.items():
+                row = self.co[event_id]
+                for candidate, candidate_weight in upcoming:
+                    if candidate != event_id:
+                        row[candidate] += weight * candidate_weight
+        # Normalize once, and keep each event's strongest neighbours only: that
+        # bounds the work per user and drops one-off co-attendance noise.
+        limit = get_option('NEIGHBOURS')
+        for event_id, row in self.co.items():
+            normalized = {candidate: value / math.sqrt(self.popularity[candidate]) for candidate, value in row.items()}
+            if len(normalized) > limit:
+                normalized = dict(heapq.nlargest(limit, normalized.items(), key=lambda item: item[1]))
+            self.co[event_id] = normalized
+
+    def scores(self, user_id):
+        events = self.rows.get(user_id, {})
+        scores = defaultdict(float)
+        affinity = defaultdict(float)
+        for event_id, weight in events.items():
+            for candidate, co_weight in self.co.get(event_id, {}).items():
+                scores[candidate] += weight * co_weight
+            organizer = self.organizer_of.get(event_id)
+            if organizer is not None:
+                affinity[organizer] += weight
+        boost = get_option('ORGANIZER_WEIGHT')
+        for organizer, weight in affinity.items():
+            for candidate in self.by_organizer.get(organizer, ()):
+                scores[candidate] += boost * weight
+        return scores
+
+
+def candidate_events(now):
+    """{event_id: (organizer_id, is_public, invitation key)} for events that have not ended."""
+    rows = Event.objects.using(DEFAULT_DB_ALIAS).filter(end_time__gt=now).values_list(
+        'pk', 'organizer_id', 'is_public', Coalesce('series_id', 'pk'),
+    )
+    return {pk: (organizer, public, key) for pk, organizer, public, key in rows.iterator()}
+
+
+def private_access(candidates):
+    """{invitation key: set of invited user ids} for the private candidates."""
+    keys = {key for _, public, key in candidates.values() if not public}
+    invited = defaultdict(set)
+    rows = Invitation.objects.using(DEFAULT_DB_ALIAS).filter(event_id__in=keys).values_list('event_id', 'user_id')
+    for event_id, user_id in rows.iterator():
+        invited[event_id].add(user_id)
+    return invited
+
+
+def compute(now=None, top_k=None, batch_size=None):
+    """Yield (user_id, [(event_id, score), ...]) for every user with a signal, best first."""
+    now = now or timezone.now()
+    top_k = top_k or get_option('TOP_K')
+    batch_size = batch_size or get_option('BATCH_SIZE')
+    events = candidate_events(now)
+    graph = CoAttendance({pk: organizer for pk, (organizer, _, _) in events.items()})
+    since = now - timedelta(days=get_option('LOOKBACK_DAYS'))
+    for batch in export_rsvps(since, batch_size):
+        graph.add(batch)
+
+    past = sorted({event_id for attended in graph.rows.values() for event_id in attended} - set(events))
+    organizers = dict(graph.candidates)
+    for start in range(0, len(past), batch_size):
+        organizers.update(
+            Event.all_objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk__in=past[start:start + batch_size]).values_list('pk', 'organizer_id')
+        )
+    graph.finish(organizers)
+    invited = private_access(events)
+
+    popular = [(pk, weight) for pk, weight in graph.popularity.items() if events[pk][1]]
+    yield None, heapq.nlargest(top_k, popular, key=lambda item: item[1])
+
+    for user_id, attended in graph.rows.items():
+        ranked = (
+            (event_id, score) for event_id, score in graph.scores(user_id).items()
+            if event_id not in attended
+            and events[event_id][0] != user_id
+            and (events[event_id][1] or user_id in invited.get(events[event_id][2], ()))
+        )
+        yield user_id, heapq.nlargest(top_k, ranked, key=lambda item: item[1])
+
+
+def visible_recommendations(user, visibility):
+    """Stored recommendations (user=None: the popular list) still visible and not over, in rank order."""
+    if user is None:
+        # rank is never null, so this matches joined rows with no user rather than events without rows.
+        rows = {'recommendations__user__isnull': True, 'recommendations__rank__isnull': False}
+    else:
+        rows = {'recommendations__user': user}
+    return (
+        Event.objects.filter(**rows, end_time__gt=timezone.now())
+        .filter(visibility)
+        .order_by('recommendations__rank')
+    )
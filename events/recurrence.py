@@ -0,0 +1,197 @@
+import calendar
+import heapq
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+# RRULE subset (RFC 5545): FREQ=DAILY|WEEKLY|MONTHLY with INTERVAL, COUNT or
+# UNTIL, and BYDAY for weekly rules. Occurrences keep the first event's time of
+# day and are computed in UTC.
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+MAX_COUNT = 10000
+
+
+class Rule:
+    __slots__ = ('freq', 'interval', 'count', 'until', 'byday')
+
+    def __init__(self, freq, interval=1, count=None, until=None, byday=()):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = byday
+
+
+def parse_rule(text):
+    """Parse an RRULE string, raising ValueError with a readable message."""
+    parts = {}
+    for item in text.upper().removeprefix('RRULE:').split(';'):
+        if not item:
+            continue
+        name, sep, value = item.partition('=')
+        if not sep or not value:
+            raise ValueError(f'Malformed rule part: {item!r}')
+        parts[name] = value
+
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f'FREQ must be one of {", ".join(FREQUENCIES)}')
+    try:
+        interval = int(parts.pop('INTERVAL', 1))
+        count = int(parts['COUNT']) if 'COUNT' in parts else None
+    except ValueError:
+        raise ValueError('INTERVAL and COUNT must be integers')
+    parts.pop('COUNT', None)
+    if interval < 1 or (count is not None and not 1 <= count <= MAX_COUNT):
+        raise ValueError(f'INTERVAL must be positive and COUNT between 1 and {MAX_COUNT}')
+
+    until = parts.pop('UNTIL', None)
+    if until is not None:
+        if count is not None:
+            raise ValueError('COUNT and UNTIL cannot be combined')
+        until = _parse_until(until)
+
+    byday = ()
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise ValueError('BYDAY is only supported with FREQ=WEEKLY')
+        days = parts.pop('BYDAY').split(',')
+        if any(day not in WEEKDAYS for day in days):
+            raise ValueError(f'BYDAY values must be among {",".join(WEEKDAYS)}')
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+
+    if parts:
+        raise ValueError(f'Unsupported rule parts: {", ".join(sorted(parts))}')
+    return Rule(freq, interval, count, until, byday)
+
+
+def _parse_until(value):
+    for pattern in ('%Y%m%dT%H%M%SZ', '%Y%m%d'):
+        try:
+            parsed = datetime.strptime(value, pattern)
+        except ValueError:
+            continue
+        if pattern == '%Y%m%d':
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.replace(tzinfo=dt_timezone.utc)
+    raise ValueError('UNTIL must look like 20250131 or 20250131T000000Z')
+
+
+def _add_months(moment, months):
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    if moment.day > calendar.monthrange(year, month)[1]:
+        return None  # RFC 5545: invalid dates such as Feb 30 are skipped.
+    return moment.replace(year=year, month=month)
+
+
+def _period(rule):
+    if rule.freq == 'DAILY':
+        return timedelta(days=rule.interval)
+    if rule.freq == 'WEEKLY':
+        return timedelta(weeks=rule.interval)
+    return None
+
+
+def iter_starts(rule, dtstart, not_before=None):
+    """Occurrence start times in order, skipping ahead to about not_before when possible."""
+    dtstart = dtstart.astimezone(dt_timezone.utc)
+    period = _period(rule)
+    per_period = len(rule.byday) if rule.byday else 1
+    index = skipped = 0
+    if period is not None and not_before is not None and not_before > dtstart:
+        # Fixed-length periods: jump straight to the period containing not_before
+        # and keep the COUNT bookkeeping consistent. Weekly BYDAY slots may fall
+        # before dtstart in its first week, so that one is never skipped.
+        index = max(0, (not_before - dtstart) // period - 1)
+        skipped = index * per_period
+        if rule.byday and index:
+            skipped -= sum(1 for day in rule.byday if day < dtstart.weekday())
+
+    emitted = skipped
+    while True:
+        if rule.freq == 'MONTHLY':
+            candidates = [_add_months(dtstart, index * rule.interval)]
+        elif rule.byday:
+            week_start = dtstart + index * period - timedelta(days=dtstart.weekday())
+            candidates = [week_start + timedelta(days=day) for day in rule.byday]
+        else:
+            candidates = [dtstart + index * period]
+        for start in candidates:
+            if start is None or start < dtstart:
+                continue
+            if rule.until is not None and start > rule.until:
+                return
+            if rule.count is not None and emitted >= rule.count:
+                return
+            emitted += 1
+            yield start
+        index += 1
+        if rule.freq == 'MONTHLY' and index * rule.interval > 12 * 1000:
+            return
+
+
+def occurrences_between(rule, dtstart, duration, window_start, window_end):
+    """Starts of occurrences overlapping [window_start, window_end)."""
+    starts = []
+    for start in iter_starts(rule, dtstart, not_before=window_start - duration):
+        if start >= window_end:
+            break
+        if start + duration > window_start:
+            starts.append(start)
+    return starts
+
+
+def last_end(rule, dtstart, duration):
+    """An upper bound on when the final occurrence ends, or None for open-ended rules."""
+    if rule.until is not None:
+        return rule.until + duration
+    if rule.count is None:
+        return None
+    if rule.freq != 'MONTHLY' and not rule.byday:
+        return dtstart.astimezone(dt_timezone.utc) + (rule.count - 1) * _period(rule) + duration
+    last = dtstart
+    for last in iter_starts(rule, dtstart):
+        pass
+    return last + duration
+
+
+def occurrence_key(moment):
+    """Stable string form of an occurrence start, as stored in Event.recurrence_exdates."""
+    return moment.astimezone(dt_timezone.utc).isoformat()
+
+
+def is_occurrence(rule, dtstart, moment):
+    for start in iter_starts(rule, dtstart, not_before=moment):
+        if start >= moment:
+            return start == moment
+    return False
+
+
+class Timeline:
+    """Real events and virtual occurrences merged by start time, as sliceable (start, kind, id) items."""
+
+    REAL, VIRTUAL = 0, 1
+
+    def __init__(self, rows, virtual):
+        self.rows = rows
+        self.virtual = virtual
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.rows.count() + len(self.virtual)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop if index.stop is not None else self.count()
+        merged = heapq.merge(
+            ((moment, self.REAL, pk) for moment, pk in self.rows[:stop]),
+            ((moment, self.VIRTUAL, pk) for moment, pk in self.virtual[:stop]),
+        )
+        return list(islice(merged, start, stop))
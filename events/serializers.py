@@ -1,6 +1,9 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Event, RSVP, Review
+from .models import ArchivedEvent, ArchivedReview, ArchivedRSVP, Event, Invitation, RSVP, Review
 from users.serializers import UserSerializer
+from . import tickets
+from .recurrence import parse_rule
 
 class EventSerializer(serializers.ModelSerializer):
     organizer = UserSerializer(read_only=True)
@@ -11,35 +14,92 @@ class EventSerializer(serializers.ModelSerializer):
         model = Event
         fields = [
             'id', 'title', 'description', 'organizer', 'location',
-            'start_time', 'end_time', 'is_public', 'created_at',
-            'updated_at', 'rsvp_count', 'average_rating'
+            'latitude', 'longitude', 'start_time', 'end_time', 'is_public', 'created_at',
+            'updated_at', 'rsvp_count', 'average_rating',
+            'recurrence_rule', 'recurrence_end', 'series', 'occurrence_start',
         ]
-        read_only_fields = ['organizer', 'created_at', 'updated_at']
+        read_only_fields = [
+            'organizer', 'created_at', 'updated_at', 'recurrence_end', 'series', 'occurrence_start',
+        ]
+        extra_kwargs = {
+            'latitude': {'min_value': -90, 'max_value': 90},
+            'longitude': {'min_value': -180, 'max_value': 180},
+        }
 
+    # Querysets from Event.objects.with_stats() carry both values already; the
+    # fallbacks cost a query each and are only for one-off instances.
     def get_rsvp_count(self, obj):
+        if hasattr(obj, 'rsvp_total'):
+            return obj.rsvp_total
         return obj.rsvps.count()
 
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
+        if hasattr(obj, 'rating_average'):
+            return obj.rating_average or 0
+        average = obj.reviews.aggregate(average=models.Avg('rating'))['average']
+        return average or 0
+
+    def validate_recurrence_rule(self, value):
+        if not value:
+            return ''
+        try:
+            parse_rule(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        if self.instance is not None and self.instance.series_id:
+            raise serializers.ValidationError("An occurrence cannot have its own recurrence rule")
+        return value.upper().removeprefix('RRULE:')
 
     def validate(self, data):
+        if ('latitude' in data) != ('longitude' in data):
+            raise serializers.ValidationError("Latitude and longitude must be given together")
         if data.get('end_time') and data.get('start_time'):
             if data['end_time'] <= data['start_time']:
                 raise serializers.ValidationError("End time must be after start time")
         return data
 
+    def update(self, instance, validated_data):
+        # A new location without explicit coordinates is geocoded again on save.
+        if 'location' in validated_data and 'latitude' not in validated_data:
+            instance.latitude = instance.longitude = None
+        return super().update(instance, validated_data)
+
+class NearbyEventSerializer(EventSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta(EventSerializer.Meta):
+        fields = EventSerializer.Meta.fields + ['distance_km']
+
+class ArchivedEventSerializer(serializers.ModelSerializer):
+    organizer = UserSerializer(read_only=True)
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = ArchivedEvent
+        fields = [
+            'id', 'title', 'description', 'organizer', 'location',
+            'latitude', 'longitude', 'start_time', 'end_time', 'is_public', 'created_at',
+            'updated_at', 'rsvp_count', 'average_rating', 'archived', 'archived_at',
+        ]
+        read_only_fields = fields
+
 class RSVPSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     event = EventSerializer(read_only=True)
+    ticket = serializers.SerializerMethodField()
     
     class Meta:
         model = RSVP
-        fields = ['id', 'event', 'user', 'status', 'created_at', 'updated_at']
+        fields = ['id', 'event', 'user', 'status', 'ticket', 'created_at', 'updated_at']
         read_only_fields = ['user', 'event', 'created_at', 'updated_at']
 
+    def get_ticket(self, obj):
+        # Only the attendee gets their door ticket.
+        request = self.context.get('request')
+        if request is None or request.user.pk != obj.user_id:
+            return None
+        return obj.ticket
+
 class ReviewSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
@@ -51,4 +111,56 @@ class ReviewSerializer(serializers.ModelSerializer):
     def validate_rating(self, value):
         if value < 1 or value > 5:
             raise serializers.ValidationError("Rating must be between 1 and 5")
-        return value
\ No newline at end of file
+        return value
+
+class ArchivedRSVPSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+    event = ArchivedEventSerializer(read_only=True)
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = ArchivedRSVP
+        fields = ['id', 'event', 'user', 'status', 'created_at', 'updated_at', 'archived']
+        read_only_fields = fields
+
+class ArchivedReviewSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = ArchivedReview
+        fields = ['id', 'event', 'user', 'rating', 'comment', 'created_at', 'updated_at', 'archived']
+        read_only_fields = fields
+
+class InvitationSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Invitation
+        fields = ['id', 'event', 'user', 'invited_by', 'created_at']
+        read_only_fields = fields
+
+class BulkInvitationSerializer(serializers.Serializer):
+    users = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    usernames = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    def validate(self, data):
+        if not data['users'] and not data['usernames']:
+            raise serializers.ValidationError("Provide user ids in 'users' or names in 'usernames'")
+        if len(data['users']) + len(data['usernames']) > 1000:
+            raise serializers.ValidationError("At most 1000 users per request")
+        return data
+
+class CheckInUploadSerializer(serializers.Serializer):
+    ticket = serializers.CharField(max_length=200)
+    scanned_at = serializers.DateTimeField()
+    scanner = serializers.CharField(max_length=64, required=False, default='')
+
+class BulkCheckInSerializer(serializers.Serializer):
+    checkins = CheckInUploadSerializer(many=True, allow_empty=False)
+
+    def validate_checkins(self, value):
+        limit = tickets.get_option('MAX_BATCH')
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} check-ins per request")
+        return value
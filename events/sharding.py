@@ -0,0 +1,223 @@
+"""Optional sharding of RSVP and Review rows by event across the RSVP_SHARDS databases."""
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key
+from itertools import islice
+from threading import Lock
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Max, prefetch_related_objects
+
+from emsAPI.db_routers import PRIMARY, ReplicaRouter
+
+SHARDED_MODELS = ('events.rsvp', 'events.review')
+ID_SHIFT = 40
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_shards():
+    return list(getattr(settings, 'RSVP_SHARDS', []))
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def shard_for_event(event_id):
+    """Alias of the shard holding an event's rows, or None when sharding is off."""
+    shards = get_shards()
+    if not shards or event_id is None:
+        return None
+    digest = hashlib.blake2b(str(int(event_id)).encode(), digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+def shard_for_pk(pk):
+    """Alias of the shard whose id range contains pk, or None."""
+    shards = get_shards()
+    number = int(pk) >> ID_SHIFT
+    return shards[number - 1] if 1 <= number <= len(shards) else None
+
+
+def reserve_id_range(alias):
+    """Make the next RSVP and Review ids on this shard start at its range."""
+    connection = connections[alias]
+    base = (get_shards().index(alias) + 1) << ID_SHIFT
+    with connection.cursor() as cursor:
+        for label in SHARDED_MODELS:
+            model = apps.get_model(label)
+            table = model._meta.db_table
+            last = model.objects.using(alias).aggregate(last=Max('pk'))['last']
+            start = max(base, last or 0)
+            if connection.vendor == 'sqlite':
+                cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [table])
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [table, start])
+            else:
+                raise NotImplementedError(f'Cannot reserve an id range on {connection.vendor}')
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(len(get_shards()), 2), thread_name_prefix='shard-query')
+        return _pool
+
+
+def _run_off_request(func, queryset):
+    # Pool threads keep their own connections; tidy up like the end of a request.
+    try:
+        return func(queryset)
+    finally:
+        close_old_connections()
+
+
+def run_on_each(func, querysets):
+    """func(queryset) for every queryset, in parallel when they are on more than one database."""
+    if len({queryset.db for queryset in querysets}) == 1:
+        return [func(queryset) for queryset in querysets]
+    pool = get_pool()
+    return list(pool.map(lambda queryset: _run_off_request(func, queryset), querysets))
+
+
+class FanOut:
+    """The same query on every shard, read back as one ordered sequence."""
+
+    ordered = True
+
+    def __init__(self, querysets, ordering=None, prefetch=None):
+        first = querysets[0]
+        self.model = first.model
+        self.ordering = list(ordering or first.query.order_by or ['pk'])
+        self.prefetch = list(first._prefetch_related_lookups if prefetch is None else prefetch)
+        self.querysets = [queryset.prefetch_related(None).order_by(*self.ordering) for queryset in querysets]
+
+    def _clone(self, change=None, **overrides):
+        querysets = [change(queryset) for queryset in self.querysets] if change else self.querysets
+        options = {'ordering': self.ordering, 'prefetch': self.prefetch, **overrides}
+        return FanOut(querysets, **options)
+
+    def all(self):
+        return self._clone()
+
+    def filter(self, *args, **kwargs):
+        return self._clone(lambda queryset: queryset.filter(*args, **kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return self._clone(lambda queryset: queryset.exclude(*args, **kwargs))
+
+    def order_by(self, *fields):
+        return self._clone(ordering=fields)
+
+    def prefetch_related(self, *lookups):
+        return self._clone(prefetch=[] if lookups == (None,) else [*self.prefetch, *lookups])
+
+    def sort_key(self):
+        columns = []
+        for name in self.ordering:
+            if not isinstance(name, str):
+                raise ValueError('Sharded results can only be ordered by field names')
+            field = name.lstrip('-')
+            field = self.model._meta.pk if field == 'pk' else self.model._meta.get_field(field)
+            if field.is_relation and not field.many_to_one:
+                raise ValueError(f'Cannot merge shards ordered by {name}')
+            columns.append((field.attname, -1 if name.startswith('-') else 1))
+
+        def compare(left, right):
+            for attname, direction in columns:
+                a, b = getattr(left, attname), getattr(right, attname)
+                if a != b:
+                    return direction if a > b else -direction
+            return 0
+
+        return cmp_to_key(compare)
+
+    def count(self):
+        return sum(run_on_each(lambda queryset: queryset.count(), self.querysets))
+
+    def exists(self):
+        return any(run_on_each(lambda queryset: queryset.exists(), self.querysets))
+
+    def get(self, *args, **kwargs):
+        querysets = self.querysets
+        pk = kwargs.get('pk', kwargs.get('id'))
+        if pk is not None:
+            # The id says which shard to ask.
+            alias = shard_for_pk(pk)
+            querysets = [queryset for queryset in querysets if queryset.db == alias]
+        found = []
+        if querysets:
+            for rows in run_on_each(lambda queryset: list(queryset.filter(*args, **kwargs)[:2]), querysets):
+                found.extend(rows)
+        if not found:
+            raise self.model.DoesNotExist(f'{self.model._meta.object_name} matching query does not exist.')
+        if len(found) > 1:
+            raise self.model.MultipleObjectsReturned(f'get() returned more than one {self.model._meta.object_name}')
+        prefetch_related_objects(found, *self.prefetch)
+        return found[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            rows = self[key:key + 1]
+            if not rows:
+                raise IndexError('FanOut index out of range')
+            return rows[0]
+        if key.step is not None or (key.start or 0) < 0 or (key.stop is not None and key.stop < 0):
+            raise ValueError('FanOut supports only non-negative slices without a step')
+        start, stop = key.start or 0, key.stop
+        per_shard = run_on_each(
+            lambda queryset: list(queryset if stop is None else queryset[:stop]), self.querysets
+        )
+        rows = list(islice(heapq.merge(*per_shard, key=self.sort_key()), start, stop))
+        prefetch_related_objects(rows, *self.prefetch)
+        return rows
+
+    def __iter__(self):
+        return iter(self[0:])
+
+
+class ShardRouter:
+    """Send RSVP and Review rows with an instance hint to their event's shard."""
+
+    def _route(self, model, hints):
+        instance = hints.get('instance')
+        if instance is None or not get_shards():
+            return None
+        if is_sharded(model):
+            if is_sharded(type(instance)):
+                return instance._state.db or shard_for_event(instance.event_id)
+            if instance._meta.label_lower == 'events.event':
+                return shard_for_event(instance.pk)
+            return None
+        if instance._state.db in get_shards():
+            # An event or user reached from a sharded row lives on the primary.
+            return PRIMARY
+        return None
+
+    def db_for_read(self, model, **hints):
+        alias = self._route(model, hints)
+        if alias == PRIMARY:
+            return ReplicaRouter().db_for_read(model) or PRIMARY
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        shards = get_shards()
+        if obj1._state.db in shards or obj2._state.db in shards:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_shards():
+            return f'{app_label}.{model_name}' in SHARDED_MODELS
+        return None
+
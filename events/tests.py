@@ -1,3 +1,1689 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import json
+import math
+import os
+import random
+from io import StringIO
+import tempfile
+import zlib
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from pathlib import Path
 
-# Create your tests here.
+import cbor2
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from emsAPI.compression import negotiate
+from emsAPI import db_routers, profiling
+from emsAPI.database import register_database, sqlite_database
+from emsAPI.testing import BudgetTestMixin, Case
+from emsAPI.throttling import admission
+from .access import EventAccessResolver
+from .analytics import parse_window, range_totals, series
+from .archive import archive_chunk, soft_delete
+from .geo import EARTH_RADIUS_KM, cover_cells, distance_expression, encode_geohash
+from .management.commands._bench import seed
+from . import tickets
+from .live import RETRY_MS, load_snapshot, publish_rsvp_change
+from .recurrence import Timeline, is_occurrence, iter_starts, last_end, occurrences_between, parse_rule
+from .models import (
+    ArchivedEvent, CalendarFeed, CheckIn, Event, EventStatsDaily, EventStatsHourly, IdempotencyRecord, Invitation, RSVP, Review,
+    TicketRevocation, record_event_stats, review_histogram_key,
+)
+from .sharding import reserve_id_range, shard_for_event, shard_for_pk
+from .views import RSVPViewSet
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    EVENT_PURGE_ASYNC=False,
+    PROFILING={'ENABLED': False},
+)
+class EventRouteBudgetTests(BudgetTestMixin, TestCase):
+    """Query and latency budgets for every route in events/urls.py."""
+
+    urlconf = 'events.urls'
+    baseline_path = Path(__file__).with_name('query_baselines.json')
+
+    @classmethod
+    def setUpTestData(cls):
+        people, events = seed(users=20, events=40, rsvps_per_event=8, reviews_per_event=4)
+        organizer = people[1]
+        member = User.objects.create_user('member', password='pw', first_name='Mem', last_name='Ber')
+        cls.users = {'organizer': organizer, 'member': member}
+
+        cls.event = next(event for event in events if event.organizer_id == organizer.pk and event.is_public)
+        cls.private = next(event for event in events if not event.is_public and event.organizer_id != member.pk)
+        Invitation.objects.create(event=cls.private, user=member, invited_by=cls.private.organizer)
+        for event in events[10:30:2]:
+            RSVP.objects.get_or_create(event=event, user=member, defaults={'status': 'Going'})
+        for event in events[10:20]:
+            Review.objects.get_or_create(event=event, user=member, defaults={'rating': 4})
+        cls.unattended = events[31]
+        RSVP.objects.filter(event=cls.unattended, user=member).delete()
+        Review.objects.filter(event=cls.unattended, user=member).delete()
+        cls.rsvp = RSVP.objects.filter(user=member).first()
+        call_command('build_recommendations', stdout=StringIO())
+        attending, _ = RSVP.objects.get_or_create(event=cls.event, user=member, defaults={'status': 'Going'})
+        cls.ticket = attending.ticket
+        cls.review = Review.objects.filter(user=member).first()
+        cls.calendar = CalendarFeed.objects.create(user=member)
+
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.series = Event.objects.create(
+            title='Weekly meetup', description='Recurring', organizer=organizer, location='Pune',
+            start_time=start, end_time=start + timedelta(hours=2), recurrence_rule='FREQ=WEEKLY;COUNT=10',
+        )
+        cls.located = Event.objects.create(
+            title='Riverside talk', description='Geocoded', organizer=organizer, location='London',
+            latitude=51.5074, longitude=-0.1278, start_time=start, end_time=start + timedelta(hours=1),
+        )
+
+    def cases(self):
+        event, series = f'/api/events/{self.event.pk}', f'/api/events/{self.series.pk}'
+        window_start = timezone.now()
+        window = {
+            'overlaps_from': window_start.isoformat(),
+            'overlaps_to': (window_start + timedelta(days=60)).isoformat(),
+        }
+        occurrence = lambda week: (self.series.start_time + timedelta(weeks=week)).isoformat()
+        new_event = {
+            'title': 'Budget event', 'description': 'Created by the budget suite', 'location': 'Berlin',
+            'start_time': (window_start + timedelta(days=3)).isoformat(),
+            'end_time': (window_start + timedelta(days=3, hours=2)).isoformat(),
+        }
+        return [
+            Case('api-root', 'GET', '/api/', 200, 1, user='member'),
+            Case('event-list', 'GET', '/api/events/', 200, 2, label='anonymous', latency_ms=60),
+            # Seeds the public-events counter, then counts the private events the member can see.
+            Case('event-list', 'GET', '/api/events/', 200, 4, user='member', label='member', latency_ms=60),
+            Case('event-list', 'GET', '/api/events/', 200, 3, user='member', label='exact_count',
+                 data={'exact_count': 'true'}),
+            Case('event-list', 'GET', '/api/events/', 200, 3, user='member', label='search',
+                 data={'search': 'bench', 'ordering': 'start_time'}),
+            Case('event-list', 'GET', '/api/events/', 200, 6, user='member', label='expand',
+                 data={'expand': 'true', **window}, latency_ms=60),
+            Case('event-list', 'GET', '/api/events/', 200, 4, user='member', label='include_archived',
+                 data={'include_archived': 'true'}),
+            Case('event-list', 'POST', '/api/events/', 201, 5, user='member', data=new_event),
+            Case('event-detail', 'GET', f'{event}/', 200, 1, label='anonymous', latency_ms=20),
+            Case('event-detail', 'GET', f'/api/events/{self.private.pk}/', 200, 3, user='member', label='invited'),
+            Case('event-detail', 'PATCH', f'{event}/', 200, 3, user='organizer', data={'title': 'Renamed'}),
+            Case('event-detail', 'DELETE', f'{event}/', 204, 3, user='organizer'),
+            Case('event-upcoming', 'GET', '/api/events/upcoming/', 200, 2, user='member', latency_ms=60),
+            Case('event-nearby', 'GET', '/api/events/nearby/', 200, 3, user='member',
+                 data={'lat': 51.5, 'lng': -0.12, 'radius': 25}, latency_ms=40),
+            Case('event-occurrences', 'GET', f'{series}/occurrences/', 200, 5, user='member'),
+            Case('event-occurrences', 'PATCH', f'{series}/occurrences/', 200, 11, user='organizer',
+                 data={'occurrence_start': occurrence(2), 'title': 'Special edition'}),
+            Case('event-occurrences', 'DELETE', f'{series}/occurrences/', 204, 4, user='organizer',
+                 data={'occurrence_start': occurrence(3)}),
+            Case('event-invitations', 'GET', f'{event}/invitations/', 200, 3, user='organizer'),
+            Case('event-invitations', 'POST', f'{event}/invitations/', 201, 5, user='organizer',
+                 data={'usernames': ['bench2', 'bench3']}),
+            Case('event-invitations', 'DELETE', f'{event}/invitations/', 200, 4, user='organizer',
+                 data={'usernames': ['bench2']}),
+            Case('event-recommended', 'GET', '/api/events/recommended/', 200, 2, user='member', latency_ms=40),
+            Case('event-recommended', 'GET', '/api/events/recommended/', 200, 3, user='organizer', label='popular'),
+            Case('event-analytics', 'GET', f'{event}/analytics/', 200, 7, user='organizer'),
+            Case('event-checkins-bulk', 'POST', f'{event}/checkins/bulk/', 200, 5, user='organizer', data={
+                'checkins': [
+                    {'ticket': self.ticket, 'scanned_at': window_start.isoformat(), 'scanner': 'door-1'},
+                    {'ticket': 'NOT-A-TICKET', 'scanned_at': window_start.isoformat()},
+                ],
+            }),
+            Case('event-ticket-revocations', 'GET', f'{event}/tickets/revocations/', 200, 3, user='organizer'),
+            Case('event-rsvp', 'POST', f'/api/events/{self.unattended.pk}/rsvp/', 200, 9, user='member',
+                 data={'status': 'Maybe'}),
+            Case('event-reviews', 'GET', f'{event}/reviews/', 200, 5, user='member', latency_ms=30),
+            Case('organizer-analytics', 'GET', '/api/organizers/me/analytics/', 200, 9, user='organizer'),
+            Case('event-live', 'GET', f'{event}/live/', 501, 0),
+            Case('calendar', 'GET', '/api/calendar/', 200, 2, user='member'),
+            Case('calendar', 'POST', '/api/calendar/', 200, 3, user='member'),
+            Case('calendar-feed', 'GET', f'/api/calendar/{self.calendar.token}.ics', 200, 4, latency_ms=40),
+            Case('calendar-feed', 'GET', '/api/calendar/unknown.ics', 404, 1, label='unknown'),
+            Case('rsvp-list', 'GET', '/api/rsvps/', 200, 4, user='member', latency_ms=40),
+            Case('rsvp-list', 'GET', '/api/rsvps/', 200, 4, user='member', label='exact_count',
+                 data={'exact_count': 'true'}),
+            Case('rsvp-list', 'POST', '/api/rsvps/', 201, 7, user='member',
+                 data={'event': self.unattended.pk, 'status': 'Going'}),
+            Case('rsvp-detail', 'GET', f'/api/rsvps/{self.rsvp.pk}/', 200, 3, user='member'),
+            # Leaving "Going" (or deleting) revokes the door ticket: one upsert.
+            Case('rsvp-detail', 'PATCH', f'/api/rsvps/{self.rsvp.pk}/', 200, 7, user='member',
+                 data={'status': 'Not Going'}),
+            Case('rsvp-detail', 'DELETE', f'/api/rsvps/{self.rsvp.pk}/', 204, 7, user='member'),
+            Case('review-list', 'GET', '/api/reviews/', 200, 3, user='member', latency_ms=30),
+            Case('review-list', 'POST', '/api/reviews/', 201, 6, user='member',
+                 data={'event': self.unattended.pk, 'rating': 5, 'comment': 'Great'}),
+            Case('review-detail', 'GET', f'/api/reviews/{self.review.pk}/', 200, 2, user='member'),
+            Case('review-detail', 'PATCH', f'/api/reviews/{self.review.pk}/', 200, 5, user='member',
+                 data={'rating': 2}),
+            Case('review-detail', 'DELETE', f'/api/reviews/{self.review.pk}/', 204, 5, user='member'),
+        ]
+
+    def test_listed_stats_match_database(self):
+        # The budgets above rely on annotated counts; they must still be right.
+        response = self.client.get('/api/events/')
+        for item in response.json()['results']:
+            event = Event.objects.get(pk=item['id'])
+            ratings = [review.rating for review in event.reviews.all()]
+            self.assertEqual(item['rsvp_count'], event.rsvps.count())
+            self.assertAlmostEqual(item['average_rating'], sum(ratings) / len(ratings) if ratings else 0)
+
+        before = self.unattended.rsvps.count()
+        response = self.client.post(
+            f'/api/events/{self.unattended.pk}/rsvp/', {'status': 'Going'},
+            HTTP_AUTHORIZATION=self.authorization('member'),
+        )
+        self.assertEqual(response.json()['event']['rsvp_count'], before + 1)
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    EVENT_PURGE_ASYNC=False,
+    PROFILING={'ENABLED': False},
+)
+class BinaryFormatTests(TestCase):
+    """CBOR and MessagePack bodies, negotiated by Content-Type and Accept."""
+
+    FORMATS = {'application/cbor': (cbor2.dumps, cbor2.loads)}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('host')
+
+    def test_round_trip(self):
+        start = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+        for media_type, (dumps, loads) in self.FORMATS.items():
+            with self.subTest(media_type=media_type):
+                body = dumps({
+                    'title': 'Binary', 'description': 'é', 'location': 'Pune',
+                    'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=2)).isoformat(),
+                })
+                response = self.client.post(
+                    '/api/events/', body, content_type=media_type, HTTP_ACCEPT=media_type,
+                    HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.organizer)}',
+                )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response['Content-Type'], media_type)
+                created = loads(response.content)
+                # Datetimes are native timestamps, not strings.
+                self.assertEqual(created['start_time'], start)
+                self.assertEqual(created['description'], 'é')
+
+                as_json = self.client.get(f'/api/events/{created["id"]}/').json()
+                self.assertEqual(as_json['start_time'], start.isoformat().replace('+00:00', 'Z'))
+                self.assertEqual(loads(self.client.get(
+                    f'/api/events/{created["id"]}/', HTTP_ACCEPT=media_type
+                ).content)['title'], as_json['title'])
+
+    def test_malformed_body_is_a_parse_error(self):
+        for media_type in self.FORMATS:
+            with self.subTest(media_type=media_type):
+                response = self.client.post(
+                    '/api/events/', b'\xc1\xff', content_type=media_type,
+                    HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.organizer)}',
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+class MessagePackFormatTests(BinaryFormatTests):
+    """The same round trips in MessagePack, which is optional."""
+
+    @classmethod
+    def setUpClass(cls):
+        import msgpack
+        cls.FORMATS = {'application/msgpack': (msgpack.packb, lambda body: msgpack.unpackb(body, timestamp=3))}
+        super().setUpClass()
+
+
+class CompressionTests(TestCase):
+    """Accept-Encoding negotiation and the compressed bodies."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(users=4, events=30, rsvps_per_event=0, reviews_per_event=0)
+
+    @mock.patch.dict('emsAPI.compression.CODECS', {'br': None, 'zstd': None})
+    def test_negotiation(self):
+        preference = ['br', 'zstd', 'gzip']
+        self.assertEqual(negotiate('gzip, br', preference), 'br')
+        self.assertEqual(negotiate('gzip;q=1, br;q=0.5', preference), 'gzip')
+        self.assertEqual(negotiate('*', preference), 'br')
+        self.assertEqual(negotiate('*;q=0.5, br;q=0', preference), 'zstd')
+        self.assertIsNone(negotiate('identity', preference))
+        self.assertIsNone(negotiate('gzip;q=0', preference))
+        self.assertIsNone(negotiate('', preference))
+
+    def assert_listing_compresses(self, encoding, decode):
+        plain = self.client.get('/api/events/')
+        self.assertGreater(len(plain.content), 860)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        response = self.client.get('/api/events/', HTTP_ACCEPT_ENCODING=encoding)
+        self.assertEqual(response['Content-Encoding'], encoding)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(decode(response.content)), plain.json())
+
+    def test_gzip_listing_matches_the_plain_one(self):
+        self.assert_listing_compresses('gzip', lambda body: zlib.decompress(body, 31))
+
+    @skipUnless(find_spec('brotli'), 'brotli is not installed')
+    def test_brotli_listing_matches_the_plain_one(self):
+        import brotli
+        self.assert_listing_compresses('br', brotli.decompress)
+
+    @skipUnless(find_spec('zstandard'), 'zstandard is not installed')
+    def test_zstd_listing_matches_the_plain_one(self):
+        import zstandard
+        self.assert_listing_compresses('zstd', lambda body: zstandard.ZstdDecompressor().decompressobj().decompress(body))
+
+    def test_small_responses_are_left_alone(self):
+        plain = self.client.get('/api/events/999999/')
+        self.assertLess(len(plain.content), 860)
+        response = self.client.get('/api/events/999999/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, plain.content)
+
+    @override_settings(CALENDAR={'DOCUMENT_MAX_BYTES': 0})
+    def test_streaming_responses_are_compressed_in_chunks(self):
+        user = User.objects.first()
+        for event in Event.objects.all()[:20]:
+            RSVP.objects.create(event=event, user=user, status='Going')
+        path = f'/api/calendar/{CalendarFeed.objects.create(user=user).token}.ics'
+        plain = self.client.get(path)
+        self.assertTrue(plain.streaming)
+        response = self.client.get(path, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertTrue(response['ETag'].startswith('W/'))
+        body = zlib.decompress(b''.join(response.streaming_content), 31)
+        self.assertEqual(body, b''.join(plain.streaming_content))
+
+
+class NearbyTests(TestCase):
+    """The geohash cover and the nearby search built on it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('host')
+        start = timezone.now() + timedelta(days=1)
+        # Pune, then points about 2, 5 and 30 km north of it.
+        cls.events = [
+            Event.objects.create(
+                title=f'Near {index}', description='', organizer=cls.organizer, location='Pune',
+                latitude=18.5204 + offset, longitude=73.8567,
+                start_time=start, end_time=start + timedelta(hours=1),
+            )
+            for index, offset in enumerate((0, 0.018, 0.045, 0.27))
+        ]
+
+    def offset_point(self, rng, latitude, longitude, radius):
+        distance = radius * math.sqrt(rng.random()) / EARTH_RADIUS_KM
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat1, lng1 = math.radians(latitude), math.radians(longitude)
+        lat2 = math.asin(
+            math.sin(lat1) * math.cos(distance) + math.cos(lat1) * math.sin(distance) * math.cos(bearing)
+        )
+        lng2 = lng1 + math.atan2(
+            math.sin(bearing) * math.sin(distance) * math.cos(lat1),
+            math.cos(distance) - math.sin(lat1) * math.sin(lat2),
+        )
+        return math.degrees(lat2), (math.degrees(lng2) + 540) % 360 - 180
+
+    def test_cover_contains_every_point_in_the_circle(self):
+        rng = random.Random(3)
+        # Ordinary places, the antimeridian and near the pole.
+        for latitude, longitude in ((18.52, 73.86), (-33.87, 151.21), (0.0, 179.99), (64.0, -179.9), (89.5, 10.0)):
+            for radius in (0.5, 10, 120):
+                cells = cover_cells(latitude, longitude, radius)
+                self.assertLessEqual(len(cells), 64)
+                for _ in range(200):
+                    point = self.offset_point(rng, latitude, longitude, radius)
+                    geohash = encode_geohash(*point)
+                    self.assertTrue(
+                        any(geohash.startswith(cell) for cell in cells),
+                        f'{point} within {radius} km of {(latitude, longitude)} is not covered',
+                    )
+
+    def test_distances(self):
+        pune, mumbai = (18.5204, 73.8567), (19.0760, 72.8777)
+        event = self.events[0]
+        self.assertAlmostEqual(Event.objects.annotate(distance=distance_expression(*pune)).get(pk=event.pk).distance, 0)
+        self.assertAlmostEqual(
+            Event.objects.annotate(distance=distance_expression(*mumbai)).get(pk=event.pk).distance, 119.9, delta=0.5
+        )
+
+    def test_nearby_filters_and_orders_by_distance(self):
+        response = self.client.get('/api/events/nearby/', {'lat': 18.5204, 'lng': 73.8567, 'radius': 10})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([item['id'] for item in results], [event.pk for event in self.events[:3]])
+        distances = [item['distance_km'] for item in results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertAlmostEqual(distances[2], 5.0, delta=0.1)
+
+        wide = self.client.get('/api/events/nearby/', {'lat': 18.5204, 'lng': 73.8567, 'radius': 50}).json()
+        self.assertEqual(len(wide['results']), 4)
+
+    def test_nearby_validates_its_parameters(self):
+        for params in ({'lat': 18.5}, {'lat': 'x', 'lng': 1}, {'lat': 91, 'lng': 0}, {'lat': 0, 'lng': 0, 'radius': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/events/nearby/', params).status_code, 400)
+
+
+class EventAccessTests(TestCase):
+    """Who can see private events: organizers and invited users, series invitations included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        cls.guest = User.objects.create_user('guest')
+        cls.stranger = User.objects.create_user('stranger')
+        start = timezone.now() + timedelta(days=1)
+        fields = {'description': '', 'organizer': cls.host, 'location': 'Pune', 'is_public': False}
+        cls.public = Event.objects.create(
+            title='Public', start_time=start, end_time=start + timedelta(hours=1), **{**fields, 'is_public': True}
+        )
+        cls.private = [
+            Event.objects.create(title=f'Private {index}', start_time=start, end_time=start + timedelta(hours=1), **fields)
+            for index in range(3)
+        ]
+        cls.series = Event.objects.create(
+            title='Series', start_time=start, end_time=start + timedelta(hours=1),
+            recurrence_rule='FREQ=WEEKLY;COUNT=3', **fields
+        )
+        cls.occurrence = Event.objects.create(
+            title='Series', start_time=start + timedelta(days=7), end_time=start + timedelta(days=7, hours=1),
+            series=cls.series, occurrence_start=start + timedelta(days=7), **fields
+        )
+        for event in (cls.private[0], cls.series):
+            Invitation.objects.create(event=event, user=cls.guest, invited_by=cls.host)
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def test_resolver(self):
+        resolver = EventAccessResolver(self.guest)
+        with self.assertNumQueries(1):
+            visible = resolver.visible([self.public, *self.private, self.series, self.occurrence])
+        self.assertEqual(visible, [self.public, self.private[0], self.series, self.occurrence])
+        # Memoized for the rest of the request.
+        with self.assertNumQueries(0):
+            self.assertFalse(resolver.can_view(self.private[1]))
+
+        self.assertTrue(EventAccessResolver(self.host).can_view(self.private[2]))
+        anonymous = EventAccessResolver(None)
+        self.assertTrue(anonymous.can_view(self.public))
+        self.assertFalse(anonymous.can_view(self.private[0]))
+
+    def test_listing_matches_the_resolver(self):
+        for user in (self.host, self.guest, self.stranger):
+            with self.subTest(user=user.username):
+                listed = {item['id'] for item in self.client.get('/api/events/', **self.auth(user)).json()['results']}
+                events = Event.objects.all()
+                self.assertEqual(listed, {event.pk for event in EventAccessResolver(user).visible(events)})
+        anonymous = {item['id'] for item in self.client.get('/api/events/').json()['results']}
+        self.assertEqual(anonymous, {self.public.pk})
+
+    def test_invitations_grant_and_revoke_access(self):
+        event = self.private[1]
+        path = f'/api/events/{event.pk}/'
+        self.assertEqual(self.client.get(path, **self.auth(self.stranger)).status_code, 403)
+
+        response = self.client.post(
+            f'{path}invitations/', {'usernames': ['stranger'], 'users': [self.guest.pk, self.host.pk]},
+            content_type='application/json', **self.auth(self.host),
+        )
+        self.assertEqual(response.status_code, 201)
+        # The organizer is never invited to their own event.
+        self.assertEqual(response.json(), {'invited': 2, 'already_invited': 0})
+        response = self.client.post(
+            f'{path}invitations/', {'users': [self.guest.pk]}, content_type='application/json', **self.auth(self.host),
+        )
+        self.assertEqual(response.json(), {'invited': 0, 'already_invited': 1})
+        self.assertEqual(self.client.get(path, **self.auth(self.stranger)).status_code, 200)
+        listed = self.client.get(f'{path}invitations/', **self.auth(self.host)).json()['results']
+        self.assertEqual({item['user']['username'] for item in listed}, {'guest', 'stranger'})
+
+        # Only the organizer manages invitations.
+        response = self.client.post(
+            f'{path}invitations/', {'users': [self.stranger.pk]}, content_type='application/json',
+            **self.auth(self.guest),
+        )
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.delete(
+            f'{path}invitations/', {'usernames': ['stranger']}, content_type='application/json', **self.auth(self.host),
+        )
+        self.assertEqual(response.json(), {'removed': 1})
+        self.assertEqual(self.client.get(path, **self.auth(self.stranger)).status_code, 403)
+
+
+
+class EventFilterTests(TestCase):
+    """Time-range filters on the listing and keyset paging of upcoming events."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        now = timezone.now().replace(microsecond=0)
+        cls.now = now
+
+        def create(title, start, hours):
+            return Event.objects.create(
+                title=title, description='', organizer=cls.host, location='Pune',
+                start_time=start, end_time=start + timedelta(hours=hours),
+            )
+
+        cls.past = create('Past', now - timedelta(days=2), 2)
+        cls.ongoing = create('Ongoing', now - timedelta(hours=1), 3)
+        cls.soon = create('Soon', now + timedelta(days=1), 2)
+        cls.later = create('Later', now + timedelta(days=10), 2)
+
+    def listed(self, **params):
+        response = self.client.get('/api/events/', {'ordering': 'start_time', **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_start_and_end_time_ranges(self):
+        self.assertEqual(self.listed(start_time_after=self.now.isoformat()), [self.soon.pk, self.later.pk])
+        self.assertEqual(
+            self.listed(start_time_after=self.now.isoformat(), start_time_before=(self.now + timedelta(days=2)).isoformat()),
+            [self.soon.pk],
+        )
+        self.assertEqual(self.listed(end_time_before=self.now.isoformat()), [self.past.pk])
+
+    def test_overlapping_window(self):
+        # Ongoing started before the window and Soon ends after it; both overlap it.
+        window = {'overlaps_from': self.now.isoformat(), 'overlaps_to': (self.now + timedelta(days=1, hours=1)).isoformat()}
+        self.assertEqual(self.listed(**window), [self.ongoing.pk, self.soon.pk])
+        # The bounds are exclusive: an event ending exactly at overlaps_from is left out.
+        self.assertEqual(self.listed(overlaps_from=self.past.end_time.isoformat(), overlaps_to=self.now.isoformat()),
+                         [self.ongoing.pk])
+
+    def test_when_shortcuts(self):
+        self.assertEqual(self.listed(when='upcoming'), [self.soon.pk, self.later.pk])
+        self.assertEqual(self.listed(when='ongoing'), [self.ongoing.pk])
+        self.assertEqual(self.listed(when='past'), [self.past.pk])
+
+    def test_invalid_input_is_rejected(self):
+        for params in ({'start_time_after': 'yesterday'}, {'overlaps_to': '2024-13-01'}, {'when': 'someday'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/events/', params).status_code, 400)
+        self.assertEqual(self.client.get('/api/events/upcoming/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_cursor_pages_through_equal_start_times(self):
+        start = self.now + timedelta(days=3)
+        Event.objects.bulk_create([
+            Event(title=f'Tied {index}', description='', organizer=self.host, location='Pune',
+                  start_time=start, end_time=start + timedelta(hours=1))
+            for index in range(7)
+        ])
+        expected = list(
+            Event.objects.filter(start_time__gte=self.now).order_by('start_time', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(len(expected), 9)
+
+        seen, url, params = [], '/api/events/upcoming/', {'page_size': 3}
+        while url:
+            page = self.client.get(url, params).json()
+            self.assertLessEqual(len(page['results']), 3)
+            seen.extend(item['id'] for item in page['results'])
+            url, params = page['next'], None
+        self.assertEqual(seen, expected)
+
+        # Paging back from the last page returns the rows before it, in order.
+        last = self.client.get('/api/events/upcoming/', {'page_size': 3}).json()
+        for _ in range(2):
+            last = self.client.get(last['next']).json()
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([item['id'] for item in previous['results']], expected[3:6])
+
+
+class EventReviewTests(TestCase):
+    """Filtering, ordering and the cached histogram of an event's reviews."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        start = timezone.now() - timedelta(days=1)
+        cls.event = Event.objects.create(
+            title='Reviewed', description='', organizer=cls.host, location='Pune',
+            start_time=start, end_time=start + timedelta(hours=2),
+        )
+        cls.reviews = [
+            Review.objects.create(event=cls.event, user=User.objects.create_user(f'critic{index}'), rating=rating)
+            for index, rating in enumerate((5, 3, 4, 5))
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.host)}'}
+        self.path = f'/api/events/{self.event.pk}/reviews/'
+
+    def reviewed(self, **params):
+        response = self.client.get(self.path, params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_filters(self):
+        five, three, four, five_again = (review.pk for review in self.reviews)
+        self.assertEqual(self.reviewed(), [five_again, four, three, five])
+        self.assertEqual(self.reviewed(rating=5), [five_again, five])
+        self.assertEqual(self.reviewed(min_rating=4), [five_again, four, five])
+        self.assertEqual(self.reviewed(rating=3, min_rating=4), [])
+
+    def test_orderings(self):
+        five, three, four, five_again = (review.pk for review in self.reviews)
+        self.assertEqual(self.reviewed(ordering='rating'), [three, four, five, five_again])
+        self.assertEqual(self.reviewed(ordering='-rating'), [five_again, five, four, three])
+        self.assertEqual(self.reviewed(ordering='created_at'), [five, three, four, five_again])
+
+    def test_bad_parameters(self):
+        for params in ({'ordering': 'comment'}, {'rating': 'five'}, {'min_rating': '4.5'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.path, params, **self.auth)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_histogram_follows_review_writes(self):
+        histogram = self.client.get(self.path, **self.auth).json()['histogram']
+        self.assertEqual(histogram, {
+            'count': 4, 'average_rating': 4.25, 'ratings': {'1': 0, '2': 0, '3': 1, '4': 1, '5': 2},
+        })
+        self.assertEqual(cache.get(review_histogram_key(self.event.pk)), histogram)
+
+        critic = User.objects.create_user('latecomer')
+        response = self.client.post(
+            '/api/reviews/', {'event': self.event.pk, 'rating': 1},
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(critic)}',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(cache.get(review_histogram_key(self.event.pk)))
+        histogram = self.client.get(self.path, **self.auth).json()['histogram']
+        self.assertEqual(histogram['count'], 5)
+        self.assertEqual(histogram['average_rating'], 3.6)
+        self.assertEqual(histogram['ratings']['1'], 1)
+
+class RecurrenceTests(TestCase):
+    """RRULE expansion, window skipping, and paging through the merged timeline."""
+
+    # A Wednesday.
+    START = datetime(2026, 1, 7, 18, 0, tzinfo=dt_timezone.utc)
+
+    def test_parse_rule(self):
+        rule = parse_rule('rrule:freq=weekly;byday=fr,mo;interval=2;count=5')
+        self.assertEqual((rule.freq, rule.interval, rule.count, rule.byday), ('WEEKLY', 2, 5, (0, 4)))
+        self.assertEqual(parse_rule('FREQ=DAILY;UNTIL=20260131').until, datetime(2026, 1, 31, 23, 59, 59, tzinfo=dt_timezone.utc))
+        for text in (
+            'FREQ=YEARLY', 'FREQ=DAILY;COUNT=0', 'FREQ=DAILY;INTERVAL=x', 'FREQ=DAILY;COUNT=2;UNTIL=20260101',
+            'FREQ=MONTHLY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=XX', 'FREQ=DAILY;BYHOUR=9', 'FREQ=DAILY;COUNT',
+        ):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_rule(text)
+
+    def test_expansion(self):
+        starts = list(iter_starts(parse_rule('FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=5'), self.START))
+        self.assertEqual([start.strftime('%a %d') for start in starts], ['Wed 07', 'Fri 09', 'Mon 12', 'Wed 14', 'Fri 16'])
+        # Months without a 31st are skipped, not clamped.
+        starts = list(iter_starts(parse_rule('FREQ=MONTHLY;COUNT=4'), self.START.replace(day=31)))
+        self.assertEqual([start.month for start in starts], [1, 3, 5, 7])
+        starts = list(iter_starts(parse_rule('FREQ=DAILY;INTERVAL=3;UNTIL=20260116'), self.START))
+        self.assertEqual([start.day for start in starts], [7, 10, 13, 16])
+
+    def test_window_skipping_matches_full_expansion(self):
+        duration = timedelta(hours=3)
+        rules = [
+            'FREQ=DAILY;INTERVAL=3;COUNT=40', 'FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=25', 'FREQ=WEEKLY;BYDAY=MO,TU;COUNT=9',
+            'FREQ=WEEKLY;INTERVAL=2;UNTIL=20260601', 'FREQ=MONTHLY;COUNT=12', 'FREQ=DAILY',
+        ]
+        for text in rules:
+            rule = parse_rule(text)
+            full = list(islice(iter_starts(rule, self.START), 500))
+            for offset_days in (-3, 0, 1, 5, 13, 40, 100):
+                window_start = self.START + timedelta(days=offset_days, hours=2)
+                window_end = window_start + timedelta(days=20)
+                with self.subTest(rule=text, offset_days=offset_days):
+                    expected = [start for start in full if start < window_end and start + duration > window_start]
+                    self.assertEqual(occurrences_between(rule, self.START, duration, window_start, window_end), expected)
+            if rule.count is not None or rule.until is not None:
+                # Exact for COUNT; an upper bound for UNTIL.
+                if rule.count is not None:
+                    self.assertEqual(last_end(rule, self.START, duration), full[-1] + duration)
+                else:
+                    self.assertGreaterEqual(last_end(rule, self.START, duration), full[-1] + duration)
+                self.assertTrue(is_occurrence(rule, self.START, full[-1]))
+                self.assertFalse(is_occurrence(rule, self.START, full[-1] + timedelta(minutes=1)))
+
+    def test_timeline_slices_fetch_only_up_to_the_page(self):
+        organizer = User.objects.create_user('host')
+        for day in (1, 3, 5, 7):
+            start = self.START + timedelta(days=day)
+            Event.objects.create(
+                title=f'Day {day}', description='', organizer=organizer, location='Pune',
+                start_time=start, end_time=start + timedelta(hours=1),
+            )
+        rows = Event.objects.order_by('start_time', 'id').values_list('start_time', 'id')
+        virtual = [(self.START + timedelta(days=day), 99) for day in (2, 3, 8)]
+        timeline = Timeline(rows, virtual)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(timeline), 7)
+        with self.assertNumQueries(1):
+            page = timeline[2:5]
+        self.assertEqual([(moment - self.START).days for moment, _, _ in page], [3, 3, 5])
+        # At the same moment a real row sorts before a computed occurrence.
+        self.assertEqual([kind for _, kind, _ in page], [Timeline.REAL, Timeline.VIRTUAL, Timeline.REAL])
+        self.assertEqual([(moment - self.START).days for moment, _, _ in timeline[5:]], [7, 8])
+
+    def test_expanded_listing_pages_through_occurrences(self):
+        organizer = User.objects.create_user('host')
+        series = Event.objects.create(
+            title='Weekly', description='', organizer=organizer, location='Pune', start_time=self.START,
+            end_time=self.START + timedelta(hours=2), recurrence_rule='FREQ=WEEKLY;COUNT=6',
+        )
+        Event.objects.create(
+            title='One-off', description='', organizer=organizer, location='Pune',
+            start_time=self.START + timedelta(days=10), end_time=self.START + timedelta(days=10, hours=1),
+        )
+        params = {
+            'expand': 'true', 'overlaps_from': self.START.isoformat(),
+            'overlaps_to': (self.START + timedelta(days=60)).isoformat(),
+        }
+        response = self.client.get('/api/events/', params)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 7)
+        self.assertEqual(results[0]['id'], series.pk)
+        self.assertEqual(results[2]['title'], 'One-off')
+        virtual = [item for item in results if item.get('is_virtual')]
+        self.assertEqual(len(virtual), 5)
+        self.assertTrue(all(item['id'] is None and item['series'] == series.pk for item in virtual))
+        starts = [item['start_time'] for item in results]
+        self.assertEqual(starts, sorted(starts))
+
+
+class ApproximateCountTests(TestCase):
+    """Listing counts from counters and estimates, and exact counts on request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        people, cls.events = seed(users=6, events=30, rsvps_per_event=2, reviews_per_event=0)
+        cls.organizer = people[1]
+
+    def setUp(self):
+        cache.clear()
+
+    def public_count(self):
+        return Event.objects.filter(is_public=True).count()
+
+    def test_public_counter_follows_writes(self):
+        response = self.client.get('/api/events/').json()
+        self.assertEqual((response['count'], response['approximate']), (self.public_count(), True))
+
+        start = timezone.now() + timedelta(days=2)
+        Event.objects.create(
+            title='Counted', description='', organizer=self.organizer, location='Oslo',
+            start_time=start, end_time=start + timedelta(hours=1),
+        )
+        hidden = Event.objects.filter(is_public=True).first()
+        hidden.is_public = False
+        hidden.save()
+        soft_delete(Event.objects.filter(is_public=True).first())
+        # The counter was adjusted in place: only the page itself is queried.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/events/').json()
+        self.assertEqual(response['count'], self.public_count())
+
+        response = self.client.get('/api/events/', {'exact_count': 'true'}).json()
+        self.assertEqual((response['count'], response['approximate']), (self.public_count(), False))
+
+    @override_settings(PAGINATION_COUNTS={'ESTIMATE_LIMIT': 5})
+    def test_low_estimate_does_not_hide_pages(self):
+        params = {'search': 'bench'}
+        matching = Event.objects.filter(is_public=True, title__icontains='bench').count()
+        self.assertGreater(matching, 10)
+        response = self.client.get('/api/events/', params).json()
+        self.assertEqual((response['count'], response['approximate']), (5, True))
+        self.assertIsNotNone(response['next'])
+
+        seen = 0
+        for page in range(1, 10):
+            response = self.client.get('/api/events/', {**params, 'page': page})
+            if response.status_code == 404:
+                break
+            seen += len(response.json()['results'])
+        self.assertEqual(seen, matching)
+
+        # An exact count is remembered for the same listing.
+        self.client.get('/api/events/', {**params, 'exact_count': 'true'})
+        response = self.client.get('/api/events/', {**params, 'page': 2}).json()
+        self.assertEqual((response['count'], response['approximate']), (matching, True))
+
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    PROFILING={'ENABLED': False},
+)
+class DoorTicketTests(TestCase):
+    """Signed tickets for "Going" RSVPs, their revocation, and bulk check-in uploads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        people, events = seed(users=4, events=2, rsvps_per_event=0, reviews_per_event=0)
+        cls.attendee, cls.event, cls.other = people[0], events[1], events[0]
+        cls.organizer = cls.event.organizer
+
+    def rsvp(self, status):
+        response = self.client.post(
+            f'/api/events/{self.event.pk}/rsvp/', {'status': status},
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.attendee)}',
+        )
+        return response.json()['ticket']
+
+    def upload(self, *tickets_):
+        scans = [{'ticket': ticket, 'scanned_at': timezone.now().isoformat(), 'scanner': 'door-1'} for ticket in tickets_]
+        return self.client.post(
+            f'/api/events/{self.event.pk}/checkins/bulk/', {'checkins': scans}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.organizer)}',
+        )
+
+    def revocations(self):
+        return self.client.get(
+            f'/api/events/{self.event.pk}/tickets/revocations/',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.organizer)}',
+        ).json()
+
+    def test_ticket_verifies_offline(self):
+        ticket = self.rsvp('Going')
+        self.assertEqual(len(ticket), 136)
+        public_key = base64.b64decode(self.revocations()['public_key'])
+        event_id, user_id, issued_at = tickets.verify(ticket, public_key)
+        self.assertEqual((event_id, user_id), (self.event.pk, self.attendee.pk))
+
+        raw = tickets.decode(ticket)
+        tampered = tickets.encode(raw[:-1] + bytes([raw[-1] ^ 1]))
+        with self.assertRaises(tickets.InvalidTicket):
+            tickets.verify(tampered, public_key)
+        self.assertIsNone(self.rsvp('Maybe'))
+
+    def test_leaving_going_revokes_only_the_old_ticket(self):
+        old = self.rsvp('Going')
+        self.rsvp('Not Going')
+        [revocation] = self.revocations()['revocations']
+        self.assertEqual(revocation['user'], self.attendee.pk)
+        new = self.rsvp('Going')
+        self.assertNotEqual(old, new)
+
+        response = self.upload(old, new).json()
+        self.assertEqual(response['checked_in'], 1)
+        self.assertEqual(response['rejected'], [{'index': 0, 'error': 'Ticket has been revoked'}])
+
+    def test_bulk_upload_reports_duplicates_and_bad_tickets(self):
+        ticket = self.rsvp('Going')
+        stranger = tickets.issue(self.other.pk, self.attendee.pk, timezone.now())
+        response = self.upload(ticket, ticket, stranger, 'garbage').json()
+        self.assertEqual(response['checked_in'], 1)
+        self.assertEqual([item['index'] for item in response['duplicates']], [1])
+        self.assertEqual([item['index'] for item in response['rejected']], [2, 3])
+
+        response = self.upload(ticket).json()
+        self.assertEqual((response['checked_in'], len(response['duplicates'])), (0, 1))
+        self.assertEqual(CheckIn.objects.filter(event=self.event).count(), 1)
+
+        member = self.client.post(
+            f'/api/events/{self.event.pk}/checkins/bulk/', {'checkins': []}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.attendee)}',
+        )
+        self.assertEqual(member.status_code, 403)
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    PROFILING={'ENABLED': False},
+)
+class RecommendationTests(TestCase):
+    """The co-attendance feed: what it recommends, and what it must not show."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=name) for name in ('host', 'ann', 'bob', 'cat', 'dan')])
+        cls.host, cls.ann, cls.bob, cls.cat, cls.dan = User.objects.order_by('pk')
+        start = timezone.now() + timedelta(days=1)
+        cls.events = {
+            name: Event.objects.create(
+                title=name, description='', organizer=cls.host, location='Pune', is_public=name != 'private',
+                start_time=start, end_time=start + timedelta(hours=2),
+            )
+            for name in ('meetup', 'talk', 'workshop', 'private')
+        }
+        attending = {
+            cls.ann: ['meetup'],
+            cls.bob: ['meetup', 'talk'],
+            cls.cat: ['meetup', 'workshop', 'private'],
+        }
+        for user, names in attending.items():
+            for name in names:
+                RSVP.objects.create(event=cls.events[name], user=user, status='Going')
+
+    def feed(self, user):
+        response = self.client.get('/api/events/recommended/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        data = response.json()
+        return data['personalized'], [item['title'] for item in data['results']]
+
+    def build(self):
+        call_command('build_recommendations', stdout=StringIO())
+
+    def test_co_attended_events_without_private_ones(self):
+        self.build()
+        personalized, titles = self.feed(self.ann)
+        self.assertTrue(personalized)
+        self.assertEqual(sorted(titles), ['talk', 'workshop'])
+
+        Invitation.objects.create(event=self.events['private'], user=self.ann, invited_by=self.host)
+        self.build()
+        self.assertIn('private', self.feed(self.ann)[1])
+
+    def test_visibility_is_checked_when_serving(self):
+        self.build()
+        Event.objects.filter(pk=self.events['talk'].pk).update(is_public=False)
+        self.assertEqual(self.feed(self.ann)[1], ['workshop'])
+
+    def test_users_without_rsvps_get_the_popular_list(self):
+        self.build()
+        personalized, titles = self.feed(self.dan)
+        self.assertFalse(personalized)
+        self.assertEqual(titles[0], 'meetup')
+        self.assertNotIn('private', titles)
+
+
+class CalendarFeedTests(TestCase):
+    """The iCalendar feed: conditional requests and regeneration after changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        cls.user = User.objects.create_user('ann')
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.talk = Event.objects.create(
+            title='Talk; with, escapes', description='Line one\nline two ' + 'é' * 60, organizer=cls.host,
+            location='Pune', latitude=18.52, longitude=73.85, start_time=start, end_time=start + timedelta(hours=1),
+        )
+        cls.series = Event.objects.create(
+            title='Weekly', description='', organizer=cls.host, location='Pune', start_time=start,
+            end_time=start + timedelta(hours=1), recurrence_rule='FREQ=WEEKLY;COUNT=4',
+        )
+        cls.other = Event.objects.create(
+            title='Other', description='', organizer=cls.host, location='Pune',
+            start_time=start + timedelta(hours=3), end_time=start + timedelta(hours=4),
+        )
+        for event in (cls.talk, cls.series):
+            RSVP.objects.create(event=event, user=cls.user, status='Going')
+        RSVP.objects.create(event=cls.other, user=cls.user, status='Maybe')
+        cls.url = f'/api/calendar/{CalendarFeed.objects.create(user=cls.user).token}.ics'
+
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode()
+
+    def test_document_is_valid_icalendar(self):
+        response, body = self.fetch()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertNotIn('Other', body)
+        self.assertIn('SUMMARY:Talk\\; with\\, escapes', body)
+        self.assertIn('RRULE:FREQ=WEEKLY;COUNT=4', body)
+        self.assertIn('GEO:18.520000;73.850000', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+        self.assertNotIn('\n', body.replace('\r\n', ''))
+
+    def test_unchanged_feed_is_not_modified(self):
+        response, body = self.fetch()
+        with self.assertNumQueries(2):
+            cached, cached_body = self.fetch(HTTP_IF_NONE_MATCH=f'W/{response["ETag"]}')
+        self.assertEqual(cached.status_code, 304)
+        with self.assertNumQueries(2):
+            again, again_body = self.fetch()
+        self.assertEqual(again_body, body)
+
+    def test_rsvp_change_regenerates_the_feed(self):
+        response, _ = self.fetch()
+        rsvp = RSVP.objects.get(event=self.other, user=self.user)
+        rsvp.status = 'Going'
+        rsvp.save()
+        changed, body = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertIn('SUMMARY:Other', body)
+
+    def test_event_changes_regenerate_the_feed(self):
+        response, _ = self.fetch()
+        self.talk.title = 'Renamed'
+        self.talk.save()
+        self.series.cancel_occurrence(self.series.start_time + timedelta(weeks=1))
+        changed, body = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('SUMMARY:Renamed', body)
+        self.assertIn('EXDATE:', body)
+
+    def test_rotating_the_token_retires_the_old_url(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        url = self.client.post('/api/calendar/', **headers).json()['url']
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertTrue(url.endswith('.ics'))
+        self.assertEqual(self.client.get(url.removeprefix('http://testserver')).status_code, 200)
+
+
+@override_settings(ADMISSION_CONTROL={'ENABLED': False}, PROFILING={'ENABLED': False})
+class AnalyticsTests(TestCase):
+    """Hourly/daily rollups and the analytics built from them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        cls.guest = User.objects.create_user('guest')
+        start = timezone.now() + timedelta(days=1)
+        cls.event = Event.objects.create(
+            title='Meetup', description='', organizer=cls.host, location='Pune',
+            start_time=start, end_time=start + timedelta(hours=2),
+        )
+
+    def test_invalid_rsvp_status_is_rejected(self):
+        response = self.client.post(
+            f'/api/events/{self.event.pk}/rsvp/', {'status': 'Bogus'},
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.guest)}',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid status', response.json()['error'])
+        self.assertFalse(RSVP.objects.filter(event=self.event).exists())
+
+    def test_range_totals_match_the_hourly_rows(self):
+        base = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        moments = [base + timedelta(hours=hours, minutes=17) for hours in range(0, 24 * 5, 5)]
+        for moment in moments:
+            record_event_stats(self.event.pk, {'rsvps_created': 1, 'going': 1}, moment)
+
+        def expected(start, end):
+            # Bounds widen to whole hours.
+            start = start.replace(minute=0)
+            end = end if end.minute == 0 else end.replace(minute=0) + timedelta(hours=1)
+            return sum(start <= moment < end for moment in moments)
+
+        # Whole days come from the daily rollup, each ragged edge from the hourly one.
+        windows = [
+            (base + timedelta(hours=2, minutes=30), base + timedelta(days=3, hours=4, minutes=10), 3),
+            (base + timedelta(days=1, hours=1), base + timedelta(days=1, hours=5), 1),
+            (base + timedelta(hours=20), base + timedelta(days=1, hours=6), 1),
+            (base, base + timedelta(days=5), 1),
+        ]
+        for start, end, queries in windows:
+            with self.subTest(start=start, end=end):
+                with self.assertNumQueries(queries):
+                    totals = range_totals([self.event.pk], start, end)
+                self.assertEqual(totals['rsvps_created'], expected(start, end))
+                self.assertEqual(totals['going'], expected(start, end))
+        self.assertEqual(range_totals([self.event.pk])['rsvps_created'], len(moments))
+
+        daily = series([self.event.pk], base, base + timedelta(days=5), 'day')
+        self.assertEqual([row['rsvps_created'] for row in daily], [5, 5, 5, 5, 4])
+        hourly = series([self.event.pk], base, base + timedelta(hours=12), 'hour')
+        self.assertEqual([row['bucket'].hour for row in hourly], [0, 5, 10])
+
+    def test_window_parsing(self):
+        (start, end, granularity), error = parse_window({'start': '2026-03-01T00:00:00Z', 'end': '2026-03-02T00:00:00Z'})
+        self.assertIsNone(error)
+        self.assertEqual((end - start, granularity), (timedelta(days=1), 'hour'))
+        self.assertEqual(parse_window({'start': '2026-01-01T00:00:00Z', 'end': '2026-03-01T00:00:00Z'})[0][2], 'day')
+        for params in (
+            {'start': 'yesterday'},
+            {'start': '2026-03-02T00:00:00Z', 'end': '2026-03-01T00:00:00Z'},
+            {'start': '2026-01-01T00:00:00Z', 'end': '2026-03-01T00:00:00Z', 'granularity': 'hour'},
+            {'granularity': 'week'},
+        ):
+            with self.subTest(params=params):
+                self.assertIsNone(parse_window(params)[0])
+
+    def test_events_without_rollups_fall_back_to_raw_rows(self):
+        # As if these rows were written before the rollups existed.
+        RSVP.objects.bulk_create([RSVP(event=self.event, user=self.guest, status='Maybe')])
+        Review.objects.bulk_create([Review(event=self.event, user=self.guest, rating=4)])
+        self.assertFalse(EventStatsDaily.objects.filter(event=self.event).exists())
+        cache.clear()
+
+        host = f'Bearer {AccessToken.for_user(self.host)}'
+        fallback = self.client.get(f'/api/events/{self.event.pk}/analytics/', HTTP_AUTHORIZATION=host).json()
+        self.assertEqual(fallback['all_time']['status_breakdown']['Maybe'], 1)
+        self.assertEqual(fallback['all_time']['average_rating'], 4)
+        data = self.client.get('/api/organizers/me/analytics/', HTTP_AUTHORIZATION=host).json()
+        self.assertEqual(data['events'][0]['reviews'], 1)
+        histogram = self.client.get(f'/api/events/{self.event.pk}/reviews/', HTTP_AUTHORIZATION=host).json()['histogram']
+        self.assertEqual((histogram['count'], histogram['ratings']['4']), (1, 1))
+
+        # Once rebuilt, the rollups answer the same.
+        call_command('rebuild_event_rollups', stdout=StringIO())
+        self.assertTrue(EventStatsDaily.objects.filter(event=self.event).exists())
+        rebuilt = self.client.get(f'/api/events/{self.event.pk}/analytics/', HTTP_AUTHORIZATION=host).json()
+        self.assertEqual(rebuilt['all_time'], fallback['all_time'])
+
+    def test_bumps_to_one_bucket_add_up(self):
+        moment = datetime(2026, 3, 1, 10, 5, tzinfo=dt_timezone.utc)
+        record_event_stats(self.event.pk, {'going': 1, 'rsvps_created': 1}, moment)
+        record_event_stats(self.event.pk, {'going': 2, 'maybe': -1}, moment + timedelta(minutes=30))
+        record_event_stats(self.event.pk, {'going': 1}, moment + timedelta(hours=1))
+        rows = EventStatsDaily.objects.filter(event=self.event)
+        self.assertEqual(rows.count(), 1)
+        self.assertEqual(rows.values('going', 'maybe', 'rsvps_created').get(), {'going': 4, 'maybe': -1, 'rsvps_created': 1})
+        hourly = EventStatsHourly.objects.filter(event=self.event).order_by('bucket').values_list('going', flat=True)
+        self.assertEqual(list(hourly), [3, 1])
+
+    def test_rsvp_response_counts_the_new_rsvp(self):
+        response = self.client.post(
+            '/api/rsvps/', {'event': self.event.pk, 'status': 'Going'},
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.guest)}',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['event']['rsvp_count'], 1)
+
+    def test_rollups_skip_unknown_statuses(self):
+        # Rows written around the API are stored, just not counted.
+        rsvp = RSVP.objects.create(event=self.event, user=self.guest, status='Bogus')
+        rsvp.status = 'Going'
+        rsvp.save()
+        rsvp.delete()
+        totals = EventStatsDaily.objects.filter(event=self.event).aggregate(Sum('going'), Sum('rsvps_created'))
+        self.assertEqual(totals, {'going__sum': 0, 'rsvps_created__sum': 1})
+
+
+class ArchiveTests(TestCase):
+    """Archived events and the RSVPs and reviews moved with them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        cls.guest = User.objects.create_user('guest')
+        now = timezone.now()
+        cls.old = Event.objects.create(
+            title='Old', description='', organizer=cls.host, location='Pune',
+            start_time=now - timedelta(days=400, hours=2), end_time=now - timedelta(days=400),
+        )
+        cls.current = Event.objects.create(
+            title='Current', description='', organizer=cls.host, location='Pune',
+            start_time=now + timedelta(days=1), end_time=now + timedelta(days=1, hours=2),
+        )
+        for event, rating in ((cls.old, 2), (cls.current, 5)):
+            RSVP.objects.create(event=event, user=cls.guest, status='Going')
+            Review.objects.create(event=event, user=cls.guest, rating=rating)
+        archive_chunk(now - timedelta(days=180), chunk_size=10)
+
+    def get(self, path, **params):
+        return self.client.get(path, params, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.guest)}')
+
+    def test_archive_moves_event_with_its_rows(self):
+        self.assertFalse(Event.objects.filter(pk=self.old.pk).exists())
+        archived = ArchivedEvent.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.rsvp_count, archived.average_rating), (1, 2))
+        self.assertEqual(archived.rsvps.count(), 1)
+        self.assertEqual(archived.reviews.count(), 1)
+        self.assertEqual(archive_chunk(timezone.now() - timedelta(days=180), chunk_size=10), 0)
+
+    def test_own_listings_include_archived_rows_on_request(self):
+        for path in ('/api/rsvps/', '/api/reviews/'):
+            live = self.get(path).json()['results']
+            self.assertEqual([item['event']['id'] if path == '/api/rsvps/' else item['event'] for item in live],
+                             [self.current.pk])
+            both = self.get(path, include_archived='true').json()['results']
+            self.assertEqual(len(both), 2)
+            self.assertNotIn('archived', both[0])
+            self.assertTrue(both[1]['archived'])
+
+        rsvp = self.get('/api/rsvps/', include_archived='true').json()['results'][1]
+        self.assertEqual((rsvp['event']['id'], rsvp['event']['title']), (self.old.pk, 'Old'))
+
+    def test_event_reviews_of_an_archived_event(self):
+        path = f'/api/events/{self.old.pk}/reviews/'
+        self.assertEqual(self.get(path).status_code, 404)
+        data = self.get(path, include_archived='true').json()
+        self.assertEqual([item['rating'] for item in data['results']], [2])
+        self.assertEqual(data['histogram']['count'], 1)
+        self.assertEqual(data['histogram']['ratings']['2'], 1)
+        self.assertEqual(self.get(path, include_archived='true', min_rating=3).json()['results'], [])
+
+
+@override_settings(EVENT_PURGE_ASYNC=False, EVENT_PURGE_BATCH_SIZE=2)
+class SoftDeleteTests(TestCase):
+    """Deleted events disappear at once; their rows are purged in batches after commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        people, cls.events = seed(users=6, events=4, rsvps_per_event=5, reviews_per_event=3)
+        cls.event = cls.events[0]
+        for person in people[:3]:
+            Invitation.objects.get_or_create(event=cls.event, user=person, defaults={'invited_by': cls.event.organizer})
+        call_command('rebuild_event_rollups', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.authorization = f'Bearer {AccessToken.for_user(self.event.organizer)}'
+
+    def rows(self, event_id):
+        return [
+            model.objects.filter(event_id=event_id).count()
+            for model in (RSVP, Review, Invitation, EventStatsDaily)
+        ]
+
+    def test_delete_hides_then_purges(self):
+        self.assertTrue(all(self.rows(self.event.pk)))
+        path = f'/api/events/{self.event.pk}/'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.client.delete(path, HTTP_AUTHORIZATION=self.authorization).status_code, 204)
+        # Hidden before anything is purged.
+        self.assertIsNotNone(Event.all_objects.get(pk=self.event.pk).deleted_at)
+        self.assertFalse(Event.objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(self.client.get(path, HTTP_AUTHORIZATION=self.authorization).status_code, 404)
+        listed = self.client.get('/api/events/', {'exact_count': 'true'}, HTTP_AUTHORIZATION=self.authorization).json()
+        self.assertNotIn(self.event.pk, [item['id'] for item in listed['results']])
+        self.assertTrue(all(self.rows(self.event.pk)))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(Event.all_objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(self.rows(self.event.pk), [0, 0, 0, 0])
+        # Other events keep their rows.
+        self.assertTrue(all(self.rows(self.events[1].pk)[:2]))
+
+    def test_command_purges_what_was_left_behind(self):
+        with self.captureOnCommitCallbacks():
+            soft_delete(self.event)
+        out = StringIO()
+        call_command('purge_deleted_events', stdout=out)
+        self.assertIn('Purged 1 deleted events', out.getvalue())
+        self.assertFalse(Event.all_objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(self.rows(self.event.pk), [0, 0, 0, 0])
+        self.assertIsNotNone(Event.objects.get(pk=self.events[1].pk))
+
+
+@override_settings(ADMIN_PERFORMANCE={'CHUNK_SIZE': 2})
+class AdminTests(TestCase):
+    """Chunked RSVP actions, CSV export and estimated changelist counts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='pw')
+        start = timezone.now() + timedelta(days=1)
+        cls.event = Event.objects.create(
+            title='Admin', description='', organizer=cls.admin, location='Pune',
+            start_time=start, end_time=start + timedelta(hours=1),
+        )
+        for index, rsvp_status in enumerate(('Going', 'Going', 'Maybe', 'Maybe', 'Not Going')):
+            RSVP.objects.create(event=cls.event, user=User.objects.create_user(f'guest{index}'), status=rsvp_status)
+        # Saved outside the API, with a status the rollups don't count.
+        RSVP.objects.bulk_create([RSVP(event=cls.event, user=User.objects.create_user('imported'), status='Waitlist')])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def run_action(self, action):
+        pks = list(RSVP.objects.values_list('pk', flat=True))
+        return self.client.post('/admin/events/rsvp/', {'action': action, '_selected_action': pks}, follow=True)
+
+    def test_status_actions_keep_the_rollups_in_step(self):
+        response = self.run_action('mark_going')
+        self.assertContains(response, 'Marked 4 RSVPs as Going.')
+        self.assertEqual(set(RSVP.objects.values_list('status', flat=True)), {'Going'})
+        self.assertFalse(RSVP.objects.filter(ticket_issued_at__isnull=True).exists())
+        totals = EventStatsDaily.objects.filter(event=self.event).aggregate(Sum('going'), Sum('maybe'), Sum('not_going'))
+        self.assertEqual(totals, {'going__sum': 6, 'maybe__sum': 0, 'not_going__sum': 0})
+
+        self.run_action('mark_maybe')
+        self.assertFalse(RSVP.objects.exclude(status='Maybe').exists())
+        self.assertEqual(TicketRevocation.objects.filter(event=self.event).count(), 6)
+        totals = EventStatsDaily.objects.filter(event=self.event).aggregate(Sum('going'), Sum('maybe'))
+        self.assertEqual(totals, {'going__sum': 0, 'maybe__sum': 6})
+
+    def test_csv_export(self):
+        response = self.run_action('export_csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'event_id', 'event__title', 'user__username', 'status', 'created_at'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], sorted(RSVP.objects.values_list('pk', flat=True)))
+        self.assertEqual(rows[-1][2:5], ['Admin', 'imported', 'Waitlist'])
+
+    def test_changelist_estimates_large_counts(self):
+        low, high = RSVP.objects.order_by('pk')[0].pk, RSVP.objects.order_by('-pk')[0].pk
+        RSVP.objects.filter(pk=RSVP.objects.order_by('pk')[2].pk).delete()
+        with self.settings(ADMIN_PERFORMANCE={'COUNT_LIMIT': 3}):
+            # Unfiltered: the primary key range, which still includes the deleted row.
+            changelist = self.client.get('/admin/events/rsvp/').context['cl']
+            self.assertEqual(changelist.result_count, high - low + 1)
+            changelist = self.client.get('/admin/events/rsvp/', {'status__exact': 'Going'}).context['cl']
+            self.assertEqual(changelist.result_count, 2)
+        with self.settings(ADMIN_PERFORMANCE={'COUNT_LIMIT': 1}):
+            # Filtered past the limit: the limit itself, never the table estimate.
+            changelist = self.client.get('/admin/events/rsvp/', {'status__exact': 'Going'}).context['cl']
+            self.assertEqual(changelist.result_count, 1)
+
+    def test_sharded_tables_are_hidden(self):
+        self.assertEqual(self.client.get('/admin/events/review/').status_code, 200)
+        with self.settings(RSVP_SHARDS=['test_shard_1']):
+            self.assertEqual(self.client.get('/admin/events/rsvp/').status_code, 403)
+            self.assertEqual(self.client.get('/admin/events/review/').status_code, 403)
+            self.assertNotContains(self.client.get('/admin/'), '/admin/events/rsvp/')
+
+@override_settings(ADMISSION_CONTROL={'ENABLED': False}, PROFILING={'ENABLED': False})
+class IdempotencyTests(TestCase):
+    """Idempotency-Key on writes: replay, conflicts, failures and expiry."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        cls.guest = User.objects.create_user('guest')
+        start = timezone.now() + timedelta(days=1)
+        cls.events = [
+            Event.objects.create(
+                title=title, description='', organizer=cls.host, location='Pune',
+                start_time=start, end_time=start + timedelta(hours=2),
+            )
+            for title in ('Meetup', 'Talk')
+        ]
+
+    def post(self, key, event=None, status='Going'):
+        return self.client.post(
+            '/api/rsvps/', {'event': (event or self.events[0]).pk, 'status': status}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.guest)}', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_completed_response_is_replayed(self):
+        first = self.post('k1')
+        self.assertEqual(first.status_code, 201)
+        replay = self.post('k1')
+        # A second real request would have updated the RSVP and answered 200.
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(RSVP.objects.filter(user=self.guest).count(), 1)
+
+    def test_key_in_progress_conflicts(self):
+        self.assertEqual(self.post('k2').status_code, 201)
+        IdempotencyRecord.objects.filter(key='k2').update(status_code=None, response_body=None)
+        response = self.post('k2')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+        # A lock older than LOCK_TIMEOUT belongs to a dead request and is taken over.
+        IdempotencyRecord.objects.filter(key='k2').update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.post('k2').status_code, 200)
+
+    def test_key_reused_for_another_request(self):
+        self.post('k3')
+        response = self.post('k3', status='Maybe')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(RSVP.objects.get(user=self.guest).status, 'Going')
+
+    def test_server_error_releases_the_key(self):
+        failing = lambda view, request, *args, **kwargs: Response({'error': 'down'}, status=503)
+        with mock.patch.object(RSVPViewSet, 'create', failing):
+            self.assertEqual(self.post('k4').status_code, 503)
+        self.assertFalse(IdempotencyRecord.objects.filter(key='k4').exists())
+        self.assertEqual(self.post('k4').status_code, 201)
+
+    def test_expired_keys_run_again_and_are_pruned(self):
+        self.post('k5')
+        self.post('k6', event=self.events[1])
+        IdempotencyRecord.objects.filter(key='k5').update(expires_at=timezone.now() - timedelta(seconds=1))
+        # The RSVP exists now, so running again answers 200 rather than replaying 201.
+        self.assertEqual(self.post('k5').status_code, 200)
+
+        IdempotencyRecord.objects.filter(key='k5').update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('prune_idempotency_keys', stdout=StringIO())
+        self.assertEqual(list(IdempotencyRecord.objects.values_list('key', flat=True)), ['k6'])
+
+
+@override_settings(ADMISSION_CONTROL={'ENABLED': False}, PROFILING={'ENABLED': False})
+class ThrottlingTests(TestCase):
+    """Token-bucket throttles and priority-based admission control."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user('host')
+        cls.guest = User.objects.create_user('guest')
+        start = timezone.now() + timedelta(days=1)
+        cls.event = Event.objects.create(
+            title='Meetup', description='', organizer=cls.host, location='Pune',
+            start_time=start, end_time=start + timedelta(hours=2),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        clock = mock.patch('emsAPI.throttling.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def rates(self, **rates):
+        return mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, rates)
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def test_bucket_refills_and_sets_retry_after(self):
+        with self.rates(anon='2/min'):
+            self.assertEqual(self.client.get('/api/events/').status_code, 200)
+            self.assertEqual(self.client.get('/api/events/').status_code, 200)
+            response = self.client.get('/api/events/')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+
+            self.now += 15
+            self.assertEqual(self.client.get('/api/events/').status_code, 429)
+            self.now += 15
+            self.assertEqual(self.client.get('/api/events/').status_code, 200)
+            self.assertEqual(self.client.get('/api/events/').status_code, 429)
+
+    def test_scopes_are_limited_separately(self):
+        auth = self.auth(self.guest)
+        with self.rates(search='1/min', write='1/min'):
+            self.assertEqual(self.client.get('/api/events/', {'search': 'meet'}, **auth).status_code, 200)
+            self.assertEqual(self.client.get('/api/events/', {'search': 'meet'}, **auth).status_code, 429)
+            # Plain reads draw on the user bucket only.
+            self.assertEqual(self.client.get('/api/events/', **auth).status_code, 200)
+
+            rsvp = f'/api/events/{self.event.pk}/rsvp/'
+            self.assertEqual(self.client.post(rsvp, {'status': 'Going'}, **auth).status_code, 200)
+            self.assertEqual(self.client.post(rsvp, {'status': 'Maybe'}, **auth).status_code, 429)
+            # Buckets are per client.
+            self.assertEqual(self.client.post(rsvp, {'status': 'Going'}, **self.auth(self.host)).status_code, 200)
+
+    @override_settings(ADMISSION_CONTROL={'ENABLED': True, 'MAX_CONCURRENCY': 2})
+    def test_low_priority_reads_are_shed_first(self):
+        # One request already in flight fills the low-priority share (half of 2).
+        self.assertTrue(admission.acquire('high'))
+        self.addCleanup(admission.release)
+
+        guest, host = self.auth(self.guest), self.auth(self.host)
+        shed = self.client.get('/api/events/', **guest)
+        self.assertEqual(shed.status_code, 429)
+        self.assertEqual(shed['Retry-After'], '1')
+        self.assertEqual(self.client.get('/api/events/recommended/', **guest).status_code, 429)
+        self.assertEqual(
+            self.client.post(f'/api/events/{self.event.pk}/rsvp/', {'status': 'Going'}, **guest).status_code, 200
+        )
+        # Admitted, then turned away by validation rather than by admission control.
+        bulk = self.client.post(
+            f'/api/events/{self.event.pk}/checkins/bulk/', {'scans': []}, content_type='application/json', **host
+        )
+        self.assertEqual(bulk.status_code, 400)
+        self.assertEqual(admission.in_flight, 1)
+
+
+
+class ProfilingTests(TestCase):
+    """Header-triggered profiling is for staff only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.guest = User.objects.create_user('guest')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = override_settings(PROFILING={'DIRECTORY': directory.name})
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def test_only_staff_requests_start_the_sampler(self):
+        with mock.patch('emsAPI.profiling.StackSampler') as sampler:
+            sampler.return_value.stop.return_value = {'view': 3}
+            anonymous = self.client.get('/api/events/', HTTP_X_PROFILE='1')
+            guest = self.client.get('/api/events/', HTTP_X_PROFILE='1', **self.auth(self.guest))
+            self.assertEqual(sampler.call_count, 0)
+            staff = self.client.get('/api/events/', HTTP_X_PROFILE='1', **self.auth(self.staff))
+            self.assertEqual(sampler.call_count, 1)
+        self.assertNotIn('X-Profile-Samples', anonymous)
+        self.assertNotIn('X-Profile-Samples', guest)
+        self.assertEqual(staff['X-Profile-Samples'], '3')
+        self.assertEqual(profiling.labels(), ['EventViewSet.list'])
+
+
+@override_settings(LIVE_EVENTS={'COALESCE_SECONDS': 0.2, 'HEARTBEAT_SECONDS': 5})
+class LiveStreamTests(TransactionTestCase):
+    """The server-sent RSVP count stream, read through the ASGI test client."""
+
+    def setUp(self):
+        self.host = User.objects.create_user('host')
+        self.guests = [User.objects.create_user(f'guest{index}') for index in range(3)]
+        start = timezone.now() + timedelta(days=1)
+        self.event, self.private = [
+            Event.objects.create(
+                title=title, description='', organizer=self.host, location='Pune', is_public=title == 'Open',
+                start_time=start, end_time=start + timedelta(hours=2),
+            )
+            for title in ('Open', 'Closed')
+        ]
+
+    async def next_chunk(self, stream):
+        return (await asyncio.wait_for(anext(stream), 2)).decode()
+
+    def snapshot(self, chunk):
+        event, data = chunk.split('\n')[:2]
+        self.assertEqual(event, 'event: rsvp')
+        return json.loads(data.removeprefix('data: '))
+
+    async def test_initial_snapshot_then_one_query_per_burst(self):
+        await sync_to_async(RSVP.objects.create)(event=self.event, user=self.guests[0], status='Going')
+        response = await self.async_client.get(f'/api/events/{self.event.pk}/live/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await self.next_chunk(stream), f'retry: {RETRY_MS}\n\n')
+            first = self.snapshot(await self.next_chunk(stream))
+            self.assertEqual((first['rsvp_count'], first['status_counts']['Going']), (1, 1))
+
+            with mock.patch('events.live.load_snapshot', wraps=load_snapshot) as loads:
+                for guest, status in zip(self.guests[1:], ('Going', 'Maybe')):
+                    await sync_to_async(RSVP.objects.create)(event=self.event, user=guest, status=status)
+                    await sync_to_async(publish_rsvp_change)(self.event.pk)
+                update = self.snapshot(await self.next_chunk(stream))
+            self.assertEqual(loads.call_count, 1)
+            self.assertEqual(update['rsvp_count'], 3)
+            self.assertEqual(update['status_counts'], {'Going': 2, 'Maybe': 1, 'Not Going': 0})
+        finally:
+            await stream.aclose()
+
+    async def test_private_event_is_not_found(self):
+        response = await self.async_client.get(f'/api/events/{self.private.pk}/live/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_bad_token_is_rejected(self):
+        response = await self.async_client.get(
+            f'/api/events/{self.event.pk}/live/', headers={'Authorization': 'Bearer not-a-token'}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+SHARDS = ['test_shard_1', 'test_shard_2']
+# Registered at import so the test runner creates (in-memory) test databases for them.
+for alias in SHARDS:
+    register_database(
+        alias, sqlite_database(os.path.join(tempfile.gettempdir(), f'ems_{alias}.sqlite3'), foreign_keys=False)
+    )
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    EVENT_PURGE_ASYNC=False,
+    PROFILING={'ENABLED': False},
+    RSVP_SHARDS=SHARDS,
+)
+class ShardedRSVPTests(TransactionTestCase):
+    """RSVPs and reviews on two SQLite shards, read back through the API."""
+
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for alias in SHARDS:
+            # The in-memory test shards keep the connection migrate left with checks on.
+            connections[alias].disable_constraint_checking()
+            reserve_id_range(alias)
+
+    def setUp(self):
+        people, self.events = seed(users=6, events=12, rsvps_per_event=0, reviews_per_event=0)
+        self.member = people[0]
+        self.authorization = f'Bearer {AccessToken.for_user(self.member)}'
+        for event in self.events:
+            Event.objects.filter(pk=event.pk).update(is_public=True)
+
+    def post(self, path, data):
+        return self.client.post(path, data, content_type='application/json', HTTP_AUTHORIZATION=self.authorization)
+
+    def test_rows_live_on_their_event_shard(self):
+        for event in self.events:
+            self.assertEqual(self.post(f'/api/events/{event.pk}/rsvp/', {'status': 'Going'}).status_code, 200)
+            self.assertEqual(self.post('/api/reviews/', {'event': event.pk, 'rating': 4}).status_code, 201)
+        self.assertFalse(RSVP.objects.using('default').exists())
+        for event in self.events:
+            shard = shard_for_event(event.pk)
+            rsvp = RSVP.objects.for_event(event.pk).get(user=self.member)
+            self.assertEqual(rsvp._state.db, shard)
+            self.assertEqual(shard_for_pk(rsvp.pk), shard)
+            self.assertEqual(event.reviews.count(), 1)
+        self.assertEqual(len({shard_for_event(event.pk) for event in self.events}), 2)
+
+        listed = self.client.get('/api/events/', HTTP_AUTHORIZATION=self.authorization).json()['results']
+        self.assertTrue(all(item['rsvp_count'] == 1 and item['average_rating'] == 4 for item in listed))
+
+    def test_my_rsvps_merge_across_shards(self):
+        for event in self.events:
+            self.post('/api/rsvps/', {'event': event.pk, 'status': 'Maybe'})
+        expected = list(
+            sorted(RSVP.objects.all().across_shards(), key=lambda rsvp: (rsvp.created_at, rsvp.pk), reverse=True)
+        )
+        self.assertEqual(len(expected), len(self.events))
+
+        # Two pages, each merged from both shards.
+        for page, rows in ((1, expected[:10]), (2, expected[10:])):
+            response = self.client.get('/api/rsvps/', {'page': page}, HTTP_AUTHORIZATION=self.authorization).json()
+            self.assertEqual(response['count'], len(self.events))
+            self.assertEqual([item['id'] for item in response['results']], [rsvp.pk for rsvp in rows])
+
+        rsvp = expected[-1]
+        detail = f'/api/rsvps/{rsvp.pk}/'
+        response = self.client.get(detail, HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(response.json()['event']['id'], rsvp.event_id)
+        response = self.client.patch(detail, {'status': 'Going'}, content_type='application/json',
+                                     HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(response.json()['status'], 'Going')
+        self.assertEqual(self.client.delete(detail, HTTP_AUTHORIZATION=self.authorization).status_code, 204)
+        self.assertFalse(RSVP.objects.for_event(rsvp.event_id).filter(pk=rsvp.pk).exists())
+
+    def test_archived_rows_merge_with_the_shards(self):
+        for event in self.events[:3]:
+            self.post('/api/rsvps/', {'event': event.pk, 'status': 'Going'})
+        old = self.events[0]
+        past = timezone.now() - timedelta(days=400)
+        Event.objects.filter(pk=old.pk).update(start_time=past, end_time=past + timedelta(hours=1))
+        self.assertEqual(archive_chunk(timezone.now() - timedelta(days=180), chunk_size=10), 1)
+
+        listed = self.client.get('/api/rsvps/', HTTP_AUTHORIZATION=self.authorization).json()['results']
+        self.assertEqual(len(listed), 2)
+        listed = self.client.get(
+            '/api/rsvps/', {'include_archived': 'true'}, HTTP_AUTHORIZATION=self.authorization
+        ).json()['results']
+        self.assertEqual([item['event']['id'] for item in listed if item.get('archived')], [old.pk])
+        self.assertEqual(len(listed), 3)
+
+    def test_purge_reaches_the_shards(self):
+        event = self.events[0]
+        self.post(f'/api/events/{event.pk}/rsvp/', {'status': 'Going'})
+        self.post('/api/reviews/', {'event': event.pk, 'rating': 5})
+        organizer = f'Bearer {AccessToken.for_user(event.organizer)}'
+        self.assertEqual(self.client.delete(f'/api/events/{event.pk}/', HTTP_AUTHORIZATION=organizer).status_code, 204)
+        self.assertFalse(RSVP.objects.for_event(event.pk).exists())
+        self.assertFalse(Review.objects.for_event(event.pk).exists())
+
+
+REPLICA = 'test_replica'
+# A separate database rather than a mirror, so a replica that has not caught up can be told apart.
+register_database(REPLICA, sqlite_database(os.path.join(tempfile.gettempdir(), f'ems_{REPLICA}.sqlite3')))
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    PROFILING={'ENABLED': False},
+    DATABASE_REPLICAS=[REPLICA],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Reads on the replica, except in transactions, after writes and for pinned users."""
+
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        self.user = User.objects.create_user('writer')
+        start = timezone.now() + timedelta(days=1)
+        # Written to the primary only; the replica never catches up.
+        self.event = Event.objects.create(
+            title='Primary only', description='', organizer=self.user, location='Pune',
+            start_time=start, end_time=start + timedelta(hours=1),
+        )
+        cache.clear()
+        token = db_routers.begin_request(True)
+        self.addCleanup(db_routers.end_request, token)
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(Event.objects.all().db, REPLICA)
+        self.assertFalse(Event.objects.filter(pk=self.event.pk).exists())
+        self.assertTrue(Event.objects.using('default').filter(pk=self.event.pk).exists())
+
+    def test_transactions_and_later_reads_use_the_primary(self):
+        with transaction.atomic():
+            self.assertTrue(Event.objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(Event.objects.all().db, REPLICA)
+        db_routers.use_primary()
+        self.assertEqual(Event.objects.all().db, 'default')
+        self.assertTrue(Event.objects.filter(pk=self.event.pk).exists())
+
+    def test_a_write_moves_the_rest_of_the_request_to_the_primary(self):
+        Event.objects.filter(pk=self.event.pk).update(title='Renamed')
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, 'Renamed')
+
+    def test_pinned_users_read_from_the_primary(self):
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        # Unpinned, the user is looked up on the replica, which does not have them yet.
+        self.assertEqual(self.client.get('/api/events/', **auth).status_code, 401)
+
+        db_routers.pin_user(self.user.pk)
+        response = self.client.get('/api/events/', **auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.event.pk])
+
+    def test_pin_needs_a_shared_cache(self):
+        self.assertEqual([error.id for error in db_routers.check_pin_cache(None)], ['emsAPI.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(db_routers.check_pin_cache(None), [])
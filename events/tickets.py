@@ -0,0 +1,83 @@
+"""Signed door tickets that scanners can verify offline."""
+import base64
+import hashlib
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from Crypto.PublicKey import ECC
+from Crypto.Signature import eddsa
+from django.conf import settings
+
+DEFAULTS = {
+    'PRIVATE_KEY': None,
+    'MAX_BATCH': 500,
+}
+
+VERSION = 1
+PAYLOAD = struct.Struct('>BQQI')
+SIGNATURE_SIZE = 64
+
+
+class InvalidTicket(ValueError):
+    pass
+
+
+def get_option(name):
+    return getattr(settings, 'TICKETS', {}).get(name, DEFAULTS[name])
+
+
+@lru_cache(maxsize=4)
+def load_private_key(pem, secret):
+    if pem:
+        return ECC.import_key(pem)
+    return eddsa.import_private_key(hashlib.blake2b(secret.encode(), digest_size=32, person=b'ems-tickets').digest())
+
+
+def private_key():
+    return load_private_key(get_option('PRIVATE_KEY'), settings.SECRET_KEY)
+
+
+def public_key_bytes(key=None):
+    return (key or private_key()).public_key().export_key(format='raw')
+
+
+def encode(data):
+    return base64.b32encode(data).decode().rstrip('=')
+
+
+def decode(text):
+    text = text.strip().upper()
+    return base64.b32decode(text + '=' * (-len(text) % 8))
+
+
+def issue(event_id, user_id, issued_at):
+    payload = PAYLOAD.pack(VERSION, event_id, user_id, int(issued_at.timestamp()))
+    return encode(payload + eddsa.new(private_key(), 'rfc8032').sign(payload))
+
+
+def verify(ticket, public_key):
+    """(event_id, user_id, issued_at) of a genuine ticket; raises InvalidTicket otherwise."""
+    try:
+        data = decode(ticket)
+    except (ValueError, TypeError):
+        raise InvalidTicket('Ticket is not valid base32')
+    if len(data) != PAYLOAD.size + SIGNATURE_SIZE:
+        raise InvalidTicket('Ticket has the wrong length')
+    payload, signature = data[:PAYLOAD.size], data[PAYLOAD.size:]
+    version, event_id, user_id, issued = PAYLOAD.unpack(payload)
+    if version != VERSION:
+        raise InvalidTicket(f'Unknown ticket version {version}')
+    try:
+        eddsa.new(eddsa.import_public_key(public_key), 'rfc8032').verify(payload, signature)
+    except ValueError:
+        raise InvalidTicket('Ticket signature does not match')
+    return event_id, user_id, datetime.fromtimestamp(issued, dt_timezone.utc)
+
+
+def next_issue_time(now, previous):
+    """Whole seconds, and always after the previous ticket so revoking that one cannot void this one."""
+    now = now.replace(microsecond=0)
+    if previous is not None and now <= previous:
+        return previous.replace(microsecond=0) + timedelta(seconds=1)
+    return now
@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EventViewSet, RSVPViewSet, ReviewViewSet
+from .views import (
+    CalendarFeedView, EventViewSet, OrganizerAnalyticsView, RSVPViewSet, ReviewViewSet, calendar_feed, event_live,
+)
 
 router = DefaultRouter()
 router.register(r'events', EventViewSet, basename='event')
@@ -8,5 +10,9 @@ router.register(r'rsvps', RSVPViewSet, basename='rsvp')
 router.register(r'reviews', ReviewViewSet, basename='review')
 
 urlpatterns = [
+    path('organizers/me/analytics/', OrganizerAnalyticsView.as_view(), name='organizer-analytics'),
+    path('events/<int:pk>/live/', event_live, name='event-live'),
+    path('calendar/', CalendarFeedView.as_view(), name='calendar'),
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar-feed'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
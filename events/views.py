@@ -1,54 +1,532 @@
+import base64
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models
+from django.db.models import prefetch_related_objects
+from django.db.models.functions import Round
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.views import APIView
+from rest_framework.exceptions import AuthenticationFailed, NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Event, RSVP, Review
-from .serializers import EventSerializer, RSVPSerializer, ReviewSerializer
-from .permissions import IsOrganizerOrReadOnly, IsPrivateEventAccessible, IsOwnerOrReadOnly
+from emsAPI.compression import compression
+from emsAPI.profiling import ProfilingMixin
+from emsAPI.throttling import AdmissionControlMixin
+from users.authentication import ReplicaAwareJWTAuthentication
+from .access import EventAccessResolver, get_access_resolver
+from . import counts, ical, recommendations, tickets
+from .archive import soft_delete
+from .analytics import (
+    all_time_totals, archived_review_histogram, build_analytics, parse_window, review_histogram, summarize,
+)
+from .filters import ArchivedEventFilter, EventFilter
+from .idempotency import IdempotentMixin
+from .models import ArchivedEvent, ArchivedReview, ArchivedRSVP, CalendarFeed, CheckIn, Event, Invitation, RSVP, Review
+from .pagination import ApproximateCountPagination, UpcomingEventPagination
+from .recurrence import Timeline
+from .sharding import FanOut
+from .live import RETRY_MS, format_sse, get_backend, hub, publish_rsvp_change
+from .serializers import (
+    ArchivedEventSerializer, ArchivedReviewSerializer, ArchivedRSVPSerializer, BulkCheckInSerializer, BulkInvitationSerializer, EventSerializer,
+    InvitationSerializer, NearbyEventSerializer, RSVPSerializer, ReviewSerializer,
+)
+from .permissions import IsOrganizer, IsOrganizerOrReadOnly, IsPrivateEventAccessible, IsOwnerOrReadOnly
+
+def wants_archived(request):
+    return request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+def parse_moment(value):
+    parsed = parse_datetime(value) if value else None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
-class EventViewSet(viewsets.ModelViewSet):
+def resolve_occurrence(event, occurrence_start):
+    """(event, None) for the row an RSVP should target, materializing a recurring occurrence."""
+    if not occurrence_start:
+        return event, None
+    try:
+        moment = parse_moment(occurrence_start)
+    except ValueError:
+        moment = None
+    if moment is None:
+        return None, 'occurrence_start must be an ISO 8601 datetime'
+    try:
+        return event.materialize(moment), None
+    except ValidationError as exc:
+        return None, ' '.join(exc.messages)
+
+class EventViewSet(ProfilingMixin, IdempotentMixin, AdmissionControlMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    pagination_class = ApproximateCountPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['is_public', 'organizer']
+    filterset_class = EventFilter
     search_fields = ['title', 'description', 'location', 'organizer__username']
     ordering_fields = ['start_time', 'created_at', 'title']
     ordering = ['-created_at']
+    listing_actions = ('list', 'upcoming', 'nearby')
+    # Filters on the stored start/end; a recurring series is matched per occurrence instead.
+    time_filter_params = (
+        'start_time_after', 'start_time_before', 'end_time_after', 'end_time_before',
+        'overlaps_from', 'overlaps_to', 'when',
+    )
+    max_expansion_window = timedelta(days=366)
+    # Listing and aggregate reads are shed first under load; RSVPs keep priority.
+    admission_priorities = {
+        'list': 'low', 'upcoming': 'low', 'nearby': 'low', 'recommended': 'low', 'reviews': 'low',
+        'analytics': 'low',
+        'rsvp': 'high', 'checkins_bulk': 'high',
+    }
+    review_orderings = ('created_at', '-created_at', 'rating', '-rating')
 
     def get_permissions(self):
-        if self.action == 'list' or self.action == 'retrieve':
-            permission_classes = [AllowAny]
-        else:
+        if self.action == 'retrieve' or self.action in self.listing_actions:
+            permission_classes = [AllowAny, IsPrivateEventAccessible]
+        elif self.action in ('update', 'partial_update', 'destroy'):
             permission_classes = [IsAuthenticated, IsOrganizerOrReadOnly]
+        elif self.action == 'occurrences':
+            permission_classes = [AllowAny, IsPrivateEventAccessible, IsOrganizerOrReadOnly]
+        elif self.action in ('invitations', 'analytics', 'checkins_bulk', 'ticket_revocations'):
+            permission_classes = [IsAuthenticated, IsOrganizer]
+        else:
+            permission_classes = [IsAuthenticated, IsPrivateEventAccessible]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        queryset = Event.objects.all()
+        queryset = Event.objects.select_related('organizer__profile').with_stats()
         
         if not self.request.user.is_authenticated:
             return queryset.filter(is_public=True)
         
-        if self.action == 'list':
-            return queryset.filter(
-                models.Q(is_public=True) | 
-                models.Q(organizer=self.request.user) |
-                models.Q(rsvps__user=self.request.user)
-            ).distinct()
+        if self.action in self.listing_actions:
+            return queryset.filter(get_access_resolver(self.request).visibility_filter())
         
         return queryset
 
+    def approximate_count(self, items):
+        """The maintained count of the unfiltered listing or of an event's reviews, if there is one."""
+        params = counts.filter_params(self.request)
+        if self.action == 'reviews':
+            if params & {'rating', 'min_rating'}:
+                return None
+            return review_histogram(int(self.kwargs['pk']))['count']
+        if self.action != 'list' or params:
+            return None
+        public = counts.counter(counts.PUBLIC_EVENTS, lambda: Event.objects.filter(is_public=True).count())
+        if not self.request.user.is_authenticated:
+            return public
+        # Private events are the few a user can see beyond the public ones.
+        visibility = get_access_resolver(self.request).visibility_filter()
+        return public + Event.objects.filter(visibility, is_public=False).count()
+
+    def include_archived(self):
+        return wants_archived(self.request)
+
+    def get_archived_queryset(self):
+        # Invitations are not archived: archived private events stay visible to their organizer only.
+        queryset = ArchivedEvent.objects.all()
+        if not self.request.user.is_authenticated:
+            return queryset.filter(is_public=True)
+        return queryset.filter(models.Q(is_public=True) | models.Q(organizer=self.request.user))
+
+    def occurrence_window(self, default_days=None):
+        """((start, end), None) from overlaps_from/overlaps_to, or (None, error message)."""
+        params = self.request.query_params
+        try:
+            start = parse_moment(params.get('overlaps_from'))
+            end = parse_moment(params.get('overlaps_to'))
+        except ValueError:
+            start = end = None
+        if default_days is not None:
+            start = start or timezone.now()
+            end = end or start + timedelta(days=default_days)
+        if start is None or end is None:
+            return None, 'overlaps_from and overlaps_to (ISO 8601) are required to expand occurrences'
+        if not start < end <= start + self.max_expansion_window:
+            return None, 'overlaps_to must be after overlaps_from and at most 366 days later'
+        return (start, end), None
+
+    def build_timeline(self, rows, series, start, end):
+        series_by_id = {item.id: item for item in series}
+        longest = max((item.duration for item in series_by_id.values()), default=timedelta(0))
+        # Slots that already have a row (edited or with RSVPs) come from `rows`.
+        taken = set(
+            Event.all_objects.filter(
+                series__in=list(series_by_id),
+                occurrence_start__gte=start - longest, occurrence_start__lt=end,
+            ).values_list('series_id', 'occurrence_start')
+        )
+        virtual = sorted(
+            (moment, item.id)
+            for item in series_by_id.values()
+            for moment in item.occurrence_starts(start, end)
+            if (item.id, moment) not in taken
+        )
+        return Timeline(rows, virtual), series_by_id
+
+    def serialize_timeline(self, items, series_by_id):
+        real = Event.objects.select_related('organizer__profile').with_stats().in_bulk(
+            [pk for _, kind, pk in items if kind == Timeline.REAL]
+        )
+        context = self.get_serializer_context()
+        series_data = {}
+        results = []
+        for moment, kind, pk in items:
+            if kind == Timeline.REAL:
+                if pk in real:
+                    results.append(EventSerializer(real[pk], context=context).data)
+                continue
+            item = series_by_id[pk]
+            if pk not in series_data:
+                series_data[pk] = EventSerializer(item, context=context).data
+            if moment == item.start_time:
+                # The series row is its own first occurrence.
+                results.append(series_data[pk])
+                continue
+            results.append({
+                **series_data[pk],
+                'id': None, 'series': pk, 'occurrence_start': moment,
+                'start_time': moment, 'end_time': moment + item.duration,
+                'rsvp_count': 0, 'average_rating': 0, 'is_virtual': True,
+            })
+        return results
+
+    def list_occurrences(self, request):
+        window, error = self.occurrence_window()
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = window
+
+        rows = (
+            self.filter_queryset(self.get_queryset()).filter(recurrence_rule='')
+            .order_by('start_time', 'id').values_list('start_time', 'id')
+        )
+        params = request.query_params.copy()
+        for name in self.time_filter_params:
+            params.pop(name, None)
+        series = EventFilter(params, queryset=self.get_queryset(), request=request).qs
+        series = (
+            SearchFilter().filter_queryset(request, series, self)
+            .filter(recurrence_rule__gt='', start_time__lt=end)
+            .filter(models.Q(recurrence_end__isnull=True) | models.Q(recurrence_end__gt=start))
+        )
+        timeline, series_by_id = self.build_timeline(rows, series, start, end)
+        page = self.paginate_queryset(timeline)
+        return self.get_paginated_response(self.serialize_timeline(page, series_by_id))
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('expand', '').lower() in ('1', 'true', 'yes'):
+            return self.list_occurrences(request)
+        if not self.include_archived():
+            return super().list(request, *args, **kwargs)
+
+        # Page over the union of (id, sort keys) from both tables, then load
+        # and serialize only the rows on the page.
+        ordering = OrderingFilter().get_ordering(request, self.get_queryset(), self)
+        keys = ['id', *sorted({field.lstrip('-') for field in ordering} - {'id'})]
+        live = (
+            self.filter_queryset(self.get_queryset()).order_by()
+            .values(*keys).annotate(archived=models.Value(False, models.BooleanField()))
+        )
+        archived = ArchivedEventFilter(
+            request.query_params, queryset=self.get_archived_queryset(), request=request
+        ).qs
+        archived = (
+            SearchFilter().filter_queryset(request, archived, self).order_by()
+            .values(*keys).annotate(archived=models.Value(True, models.BooleanField()))
+        )
+        page = self.paginate_queryset(live.union(archived, all=True).order_by(*ordering, 'id'))
+
+        live_events = Event.objects.select_related('organizer__profile').with_stats().in_bulk(
+            [row['id'] for row in page if not row['archived']]
+        )
+        archived_events = ArchivedEvent.objects.select_related('organizer__profile').in_bulk(
+            [row['id'] for row in page if row['archived']]
+        )
+        context = self.get_serializer_context()
+        results = []
+        for row in page:
+            if row['archived'] and row['id'] in archived_events:
+                results.append(ArchivedEventSerializer(archived_events[row['id']], context=context).data)
+            elif not row['archived'] and row['id'] in live_events:
+                results.append(EventSerializer(live_events[row['id']], context=context).data)
+        return self.get_paginated_response(results)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if not self.include_archived():
+                raise
+        event = get_object_or_404(
+            self.get_archived_queryset().select_related('organizer__profile'), pk=kwargs['pk']
+        )
+        return Response(ArchivedEventSerializer(event, context=self.get_serializer_context()).data)
+
     def perform_create(self, serializer):
         serializer.save(organizer=self.request.user)
 
+    def perform_destroy(self, instance):
+        soft_delete(instance)
+
+    @action(
+        detail=False, methods=['get'], pagination_class=UpcomingEventPagination,
+        filter_backends=[DjangoFilterBackend, SearchFilter],
+    )
+    def upcoming(self, request):
+        queryset = self.filter_queryset(
+            self.get_queryset().filter(start_time__gte=timezone.now())
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def recommended(self, request):
+        """The user's precomputed "events for you" (build_recommendations), or the popular list until they have one."""
+        visibility = get_access_resolver(request).visibility_filter()
+        limit = recommendations.get_option('TOP_K')
+
+        def load(user):
+            queryset = recommendations.visible_recommendations(user, visibility)
+            return list(queryset.select_related('organizer__profile').with_stats()[:limit])
+
+        events = load(request.user)
+        personalized = bool(events)
+        if not personalized:
+            events = load(None)
+        serializer = self.get_serializer(events, many=True)
+        return Response({'personalized': personalized, 'results': serializer.data})
+
+    @action(detail=False, methods=['get'], filter_backends=[DjangoFilterBackend, SearchFilter])
+    def nearby(self, request):
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', 10))
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'lat and lng are required numbers; radius is in km'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= 500):
+            return Response(
+                {'error': 'lat must be within ±90, lng within ±180 and radius within (0, 500] km'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        matches = (
+            self.filter_queryset(self.get_queryset())
+            .within(latitude, longitude, radius)
+            .annotate(distance_km=Round('distance', 3))
+        )
+
+        results = self.paginate_queryset(matches)
+        serializer = NearbyEventSerializer(results, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get', 'patch', 'delete'])
+    def occurrences(self, request, pk=None):
+        event = self.get_object()
+        if not event.is_recurring:
+            return Response({'error': 'Event is not recurring'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'GET':
+            window, error = self.occurrence_window(default_days=90)
+            if error:
+                return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+            start, end = window
+            rows = (
+                Event.objects.filter(series=event, end_time__gt=start, start_time__lt=end)
+                .order_by('start_time', 'id').values_list('start_time', 'id')
+            )
+            timeline, series_by_id = self.build_timeline(rows, [event], start, end)
+            page = self.paginate_queryset(timeline)
+            return self.get_paginated_response(self.serialize_timeline(page, series_by_id))
+
+        try:
+            moment = parse_moment(request.data.get('occurrence_start'))
+        except ValueError:
+            moment = None
+        if moment is None:
+            return Response(
+                {'error': 'occurrence_start (ISO 8601) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            if request.method == 'DELETE':
+                occurrence = event.cancel_occurrence(moment)
+            else:
+                occurrence = event.materialize(moment)
+        except ValidationError as exc:
+            return Response({'error': ' '.join(exc.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'DELETE':
+            if occurrence is not None:
+                soft_delete(occurrence)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if occurrence is event:
+            return Response(
+                {'error': 'The first occurrence is the series itself; update the event instead'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = EventSerializer(
+            occurrence, data=request.data, partial=True, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get', 'post', 'delete'])
+    def invitations(self, request, pk=None):
+        event = self.get_object()
+
+        if request.method == 'GET':
+            invitations = event.invitations.select_related('user__profile').order_by('id')
+            page = self.paginate_queryset(invitations)
+            serializer = InvitationSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        payload = BulkInvitationSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        users = User.objects.filter(
+            models.Q(pk__in=payload.validated_data['users'])
+            | models.Q(username__in=payload.validated_data['usernames'])
+        ).exclude(pk=event.organizer_id)
+        user_ids = set(users.values_list('pk', flat=True))
+
+        if request.method == 'DELETE':
+            removed, _ = event.invitations.filter(user_id__in=user_ids).delete()
+            return Response({'removed': removed}, status=status.HTTP_200_OK)
+
+        existing = set(
+            event.invitations.filter(user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        Invitation.objects.bulk_create(
+            [Invitation(event=event, user_id=user_id, invited_by=request.user)
+             for user_id in user_ids - existing],
+            ignore_conflicts=True,
+        )
+        return Response(
+            {'invited': len(user_ids - existing), 'already_invited': len(existing)},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['post'], url_path='checkins/bulk', url_name='checkins-bulk')
+    def checkins_bulk(self, request, pk=None):
+        """Record a batch of door scans, checking each ticket's signature rather than the RSVPs."""
+        event = self.get_object()
+        payload = BulkCheckInSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+
+        public_key = tickets.public_key_bytes()
+        verified, duplicates, rejected = [], [], []
+        for index, item in enumerate(payload.validated_data['checkins']):
+            try:
+                event_id, user_id, issued_at = tickets.verify(item['ticket'], public_key)
+            except tickets.InvalidTicket as exc:
+                rejected.append({'index': index, 'error': str(exc)})
+                continue
+            if event_id != event.pk:
+                rejected.append({'index': index, 'error': 'Ticket is for another event'})
+            else:
+                verified.append((index, item, user_id, issued_at))
+
+        revoked = dict(
+            event.ticket_revocations.filter(user_id__in={user_id for _, _, user_id, _ in verified})
+            .values_list('user_id', 'issued_until')
+        )
+        scans = {}
+        for index, item, user_id, issued_at in verified:
+            if user_id in revoked and issued_at <= revoked[user_id]:
+                rejected.append({'index': index, 'error': 'Ticket has been revoked'})
+            elif user_id in scans:
+                duplicates.append({'index': index, 'user': user_id, 'checked_in_at': scans[user_id]['scanned_at']})
+            else:
+                scans[user_id] = {**item, 'index': index}
+        existing = dict(event.checkins.filter(user_id__in=scans).values_list('user_id', 'scanned_at'))
+        for user_id, scan in list(scans.items()):
+            if user_id in existing:
+                del scans[user_id]
+                duplicates.append({'index': scan['index'], 'user': user_id, 'checked_in_at': existing[user_id]})
+
+        CheckIn.objects.bulk_create(
+            [
+                CheckIn(event=event, user_id=user_id, scanned_at=scan['scanned_at'], scanner=scan['scanner'])
+                for user_id, scan in scans.items()
+            ],
+            ignore_conflicts=True,
+        )
+        return Response({
+            'checked_in': len(scans),
+            'duplicates': sorted(duplicates, key=lambda item: item['index']),
+            'rejected': sorted(rejected, key=lambda item: item['index']),
+        })
+
+    @action(detail=True, methods=['get'], url_path='tickets/revocations', url_name='ticket-revocations')
+    def ticket_revocations(self, request, pk=None):
+        """What a scanner needs to verify this event's tickets offline; ?since= for revocations after a sync."""
+        event = self.get_object()
+        as_of = timezone.now()
+        revocations = event.ticket_revocations.order_by('revoked_at', 'id')
+        if 'since' in request.query_params:
+            try:
+                since = parse_moment(request.query_params['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                return Response({'error': 'since must be an ISO 8601 datetime'}, status=status.HTTP_400_BAD_REQUEST)
+            revocations = revocations.filter(revoked_at__gt=since)
+        return Response({
+            'event': event.pk,
+            'algorithm': 'Ed25519',
+            'public_key': base64.b64encode(tickets.public_key_bytes()).decode(),
+            'as_of': as_of,
+            'revocations': [
+                {'user': user_id, 'issued_until': issued_until}
+                for user_id, issued_until in revocations.values_list('user_id', 'issued_until')
+            ],
+        })
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        event = self.get_object()
+        window, error = parse_window(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'event': event.id, **build_analytics([event.id], window)})
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def rsvp(self, request, pk=None):
-        event = self.get_object()
+        event, error = resolve_occurrence(self.get_object(), request.data.get('occurrence_start'))
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         rsvp_status = request.data.get('status', 'Going')
+        valid_statuses = [choice for choice, _ in RSVP.STATUS_CHOICES]
+        if rsvp_status not in valid_statuses:
+            return Response(
+                {'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        rsvp, created = RSVP.objects.get_or_create(
+        rsvp, created = RSVP.objects.for_event(event.pk).get_or_create(
             event=event,
             user=request.user,
             defaults={'status': rsvp_status}
@@ -57,29 +535,154 @@ class EventViewSet(viewsets.ModelViewSet):
         if not created:
             rsvp.status = rsvp_status
             rsvp.save()
+        elif hasattr(event, 'rsvp_total'):
+            # The annotation was computed before this RSVP existed.
+            event.rsvp_total += 1
+        publish_rsvp_change(event.id)
         
-        serializer = RSVPSerializer(rsvp)
+        serializer = RSVPSerializer(rsvp, context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def reviews(self, request, pk=None):
-        event = self.get_object()
-        reviews = event.reviews.all()
+        try:
+            event = self.get_object()
+        except Http404:
+            if not self.include_archived():
+                raise
+            event = get_object_or_404(self.get_archived_queryset(), pk=pk)
+        archived = isinstance(event, ArchivedEvent)
+        ordering = request.query_params.get('ordering', '-created_at')
+        if ordering not in self.review_orderings:
+            return Response(
+                {'error': f'Invalid ordering. Must be one of: {", ".join(self.review_orderings)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if archived:
+            reviews = event.reviews.select_related('user__profile')
+        else:
+            reviews = event.reviews.with_related('user__profile')
+        try:
+            if 'rating' in request.query_params:
+                reviews = reviews.filter(rating=int(request.query_params['rating']))
+            if 'min_rating' in request.query_params:
+                reviews = reviews.filter(rating__gte=int(request.query_params['min_rating']))
+        except ValueError:
+            return Response(
+                {'error': 'rating and min_rating must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        reviews = reviews.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+
         page = self.paginate_queryset(reviews)
+        histogram = archived_review_histogram(event.id) if archived else review_histogram(event.id)
+        serializer_class = ArchivedReviewSerializer if archived else ReviewSerializer
         
         if page is not None:
-            serializer = ReviewSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            serializer = serializer_class(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            response.data['histogram'] = histogram
+            return response
         
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        serializer = serializer_class(reviews, many=True)
+        return Response({'results': serializer.data, 'histogram': histogram})
+
+class OrganizerAnalyticsView(AdmissionControlMixin, APIView):
+    admission_priority = 'low'
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        window, error = parse_window(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        events = dict(
+            Event.objects.filter(organizer=request.user).values_list('id', 'title')
+        )
+        totals = all_time_totals(list(events))
+        data = build_analytics(list(events), window, totals)
+        data['events'] = [
+            {'id': event_id, 'title': title, **(summarize(totals[event_id]) if event_id in totals else {})}
+            for event_id, title in events.items()
+        ]
+        return Response(data)
+
+class CalendarFeedView(AdmissionControlMixin, APIView):
+    """The caller's iCalendar feed URL: GET shows it, POST replaces it so the old URL stops working."""
+
+    permission_classes = [IsAuthenticated]
+
+    def feed_url(self, request, feed):
+        return {'url': request.build_absolute_uri(reverse('calendar-feed', args=[feed.token]))}
+
+    def get(self, request):
+        feed, _ = CalendarFeed.objects.get_or_create(user=request.user)
+        return Response(self.feed_url(request, feed))
+
+    def post(self, request):
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if not created:
+            feed.rotate()
+        return Response(self.feed_url(request, feed))
+
+class OwnRowsCountMixin:
+    """Count the caller's own RSVPs or reviews with a counter kept by the model signals."""
+
+    def approximate_count(self, items):
+        if counts.filter_params(self.request):
+            return None
+        name = counts.user_counter(items.model._meta.model_name, self.request.user.pk)
+        return counts.counter(name, items.count)
+
+class ArchivedRowsMixin:
+    """`?include_archived=true` merges the caller's rows on archived events into the listing."""
+
+    archived_model = None
+    archived_serializer_class = None
+    archived_related = ('user__profile',)
 
-class RSVPViewSet(viewsets.ModelViewSet):
+    def get_archived_queryset(self):
+        return self.archived_model.objects.filter(user=self.request.user).select_related(*self.archived_related)
+
+    def list(self, request, *args, **kwargs):
+        if not wants_archived(request):
+            return super().list(request, *args, **kwargs)
+        live = self.filter_queryset(self.get_queryset())
+        if isinstance(live, FanOut):
+            querysets, ordering, lookups = live.querysets, live.ordering, live.prefetch
+        else:
+            querysets, ordering, lookups = [live], live.query.order_by, live._prefetch_related_lookups
+        # Archive tables have the same columns, so their rows merge in the same order.
+        merged = FanOut([*querysets, self.get_archived_queryset()], ordering=ordering, prefetch=[])
+        page = self.paginate_queryset(merged)
+        prefetch_related_objects([row for row in page if isinstance(row, live.model)], *lookups)
+        context = self.get_serializer_context()
+        return self.get_paginated_response([
+            self.get_serializer(row).data if isinstance(row, live.model)
+            else self.archived_serializer_class(row, context=context).data
+            for row in page
+        ])
+
+class RSVPViewSet(
+    ArchivedRowsMixin, OwnRowsCountMixin, ProfilingMixin, IdempotentMixin, AdmissionControlMixin, viewsets.ModelViewSet
+):
     serializer_class = RSVPSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = ApproximateCountPagination
+    archived_model = ArchivedRSVP
+    archived_serializer_class = ArchivedRSVPSerializer
+    archived_related = ('user__profile', 'event__organizer__profile')
 
     def get_queryset(self):
-        return RSVP.objects.filter(user=self.request.user)
+        return (
+            RSVP.objects.filter(user=self.request.user).visible()
+            .with_related('user__profile')
+            .order_by('-created_at', '-id')
+            .prefetch_related(models.Prefetch(
+                'event', queryset=Event.objects.select_related('organizer__profile').with_stats()
+            ))
+            .across_shards()
+        )
 
     def create(self, request, *args, **kwargs):
         event_id = request.data.get('event')
@@ -99,29 +702,40 @@ class RSVPViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            event = Event.objects.get(id=event_id)
+            event = Event.objects.select_related('organizer__profile').with_stats().get(id=event_id)
+            if not get_access_resolver(request).can_view(event):
+                raise Event.DoesNotExist
         except Event.DoesNotExist:
             return Response(
                 {'error': 'Event not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+
+        event, error = resolve_occurrence(event, request.data.get('occurrence_start'))
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
 
-            rsvp = RSVP.objects.get(event=event, user=request.user)
+            rsvp = RSVP.objects.for_event(event.pk).get(user=request.user)
 
             rsvp.status = rsvp_status
             rsvp.save()
+            publish_rsvp_change(event.id)
             serializer = self.get_serializer(rsvp)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except RSVP.DoesNotExist:
 
-            rsvp = RSVP.objects.create(
+            rsvp = RSVP.objects.for_event(event.pk).create(
                 event=event,
                 user=request.user,
                 status=rsvp_status
             )
+            if hasattr(event, 'rsvp_total'):
+                # The annotation was computed before this RSVP existed.
+                event.rsvp_total += 1
+            publish_rsvp_change(event.id)
             serializer = self.get_serializer(rsvp)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -138,18 +752,90 @@ class RSVPViewSet(viewsets.ModelViewSet):
         
         instance.status = rsvp_status
         instance.save()
+        publish_rsvp_change(instance.event_id)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        instance.delete()
+        publish_rsvp_change(instance.event_id)
+
+class ReviewViewSet(
+    ArchivedRowsMixin, OwnRowsCountMixin, IdempotentMixin, AdmissionControlMixin, viewsets.ModelViewSet
+):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = ApproximateCountPagination
+    archived_model = ArchivedReview
+    archived_serializer_class = ArchivedReviewSerializer
 
     def get_queryset(self):
-        return Review.objects.filter(user=self.request.user)
+        return (
+            Review.objects.filter(user=self.request.user).visible()
+            .with_related('user__profile')
+            .order_by('-created_at', '-id')
+            .across_shards()
+        )
 
     def perform_create(self, serializer):
         event_id = self.request.data.get('event')
         event = get_object_or_404(Event, id=event_id)
-        serializer.save(user=self.request.user, event=event)
\ No newline at end of file
+        if not get_access_resolver(self.request).can_view(event):
+            raise NotFound('Event not found')
+        serializer.save(user=self.request.user, event=event)
+
+@compression(enabled=False)
+async def event_live(request, pk):
+    """Server-sent events stream of an event's RSVP counts (ASGI only)."""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live updates require an ASGI server'}, status=501)
+
+    try:
+        authenticated = await sync_to_async(ReplicaAwareJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'error': str(exc.detail)}, status=401)
+    user = authenticated[0] if authenticated else AnonymousUser()
+
+    def visible_event():
+        event = Event.objects.filter(pk=pk).first()
+        if event is None or not EventAccessResolver(user).can_view(event):
+            return None
+        return event
+
+    event = await sync_to_async(visible_event)()
+    if event is None:
+        return JsonResponse({'error': 'Event not found'}, status=404)
+
+    get_backend().start()
+
+    async def stream():
+        yield f'retry: {RETRY_MS}\n\n'
+        async for snapshot in hub.subscribe(event.id):
+            yield format_sse(snapshot)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@require_GET
+def calendar_feed(request, token):
+    """The events a user is going to as iCalendar, for calendar apps to subscribe to (see events.ical)."""
+    user_id = CalendarFeed.objects.filter(token=token).values_list('user_id', flat=True).first()
+    if user_id is None:
+        return JsonResponse({'error': 'Calendar feed not found'}, status=404)
+
+    stamps = ical.feed_stamps(user_id)
+    version = ical.feed_etag(stamps)
+    etag = quote_etag(version)
+    headers = {'ETag': etag, 'Cache-Control': f'private, max-age={ical.get_option("MAX_AGE")}'}
+    # Compression weakens the ETag it sends out; the entity is the same either way.
+    if etag in {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}:
+        return HttpResponseNotModified(headers=headers)
+
+    content_type = 'text/calendar; charset=utf-8'
+    document = ical.cached_document(version)
+    if document is not None:
+        return HttpResponse(document, content_type=content_type, headers=headers)
+    return StreamingHttpResponse(ical.stream_feed(stamps, version), content_type=content_type, headers=headers)
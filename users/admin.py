@@ -1,7 +1,32 @@
 from django.contrib import admin
-from .models import UserProfile
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from emsAPI.changelist import PerformanceAdminMixin
+from .models import UserProfile, normalize_search, prefix_q
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'full_name', 'location', 'created_at']
-    search_fields = ['full_name', 'user__username', 'location']
\ No newline at end of file
+    list_select_related = ['user']
+    search_fields = ['search_username', 'search_name']
+    search_help_text = 'Prefix of the username or full name, or a profile id.'
+    autocomplete_fields = ['user']
+    readonly_fields = ['search_username', 'search_name', 'picture_hash', 'picture_variants']
+    csv_fields = ['user__username', 'user__email', 'full_name', 'location', 'created_at']
+
+    def search_filter(self, term):
+        term = normalize_search(term)
+        return prefix_q('search_username', term) | prefix_q('search_name', term)
+
+# Replaces the stock admin so event/RSVP/review autocompletes search users by
+# indexed prefix rather than LIKE-scanning four columns.
+admin.site.unregister(User)
+
+@admin.register(User)
+class EMSUserAdmin(PerformanceAdminMixin, UserAdmin):
+    search_help_text = 'Prefix of the username or full name, or a user id.'
+    csv_fields = ['username', 'email', 'first_name', 'last_name', 'is_active', 'date_joined']
+
+    def search_filter(self, term):
+        term = normalize_search(term)
+        return prefix_q('profile__search_username', term) | prefix_q('profile__search_name', term)
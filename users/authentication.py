@@ -0,0 +1,14 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from emsAPI.db_routers import is_user_pinned, use_primary
+
+
+class ReplicaAwareJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # Check the pin before loading the user, so a freshly written account
+        # is never looked up on a replica that hasn't caught up yet.
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and is_user_pinned(user_id):
+            use_primary()
+        return super().get_user(validated_token)
@@ -0,0 +1,17 @@
+from django.core import checks
+
+from emsAPI.db_routers import cache_is_process_local
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not cache_is_process_local():
+        return []
+    return [checks.Error(
+        'The default cache is local to each process.',
+        hint=(
+            'User projections are invalidated by deleting their cache entry, so other workers '
+            'would serve stale profiles for up to an hour. Set EMS_REDIS_URL or configure a shared CACHES backend.'
+        ),
+        id='users.E001',
+    )]
@@ -0,0 +1,50 @@
+"""Pillow work for profile pictures, kept free of Django so worker processes can run it."""
+import os
+
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+
+def inspect_image(file, max_pixels):
+    """(format, width, height) of an uploaded image, raising ValueError for anything unusable."""
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError('Upload a valid JPEG, PNG, WebP or GIF image')
+    finally:
+        file.seek(0)
+    if image_format not in ('JPEG', 'PNG', 'WEBP', 'GIF'):
+        raise ValueError('Upload a valid JPEG, PNG, WebP or GIF image')
+    if width * height > max_pixels:
+        raise ValueError('Image is too large')
+    return image_format, width, height
+
+
+def render_variants(source, targets):
+    """Write square crops of source; targets maps (size, format) -> absolute path.
+
+    Each file is written next to its target and renamed into place, so readers
+    never see a partial image.
+    """
+    largest = max(size for size, _ in targets)
+    with Image.open(source) as image:
+        # JPEG sources can be decoded at a reduced scale, which is far cheaper.
+        image.draft('RGB', (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for (size, image_format), path in sorted(targets.items(), reverse=True):
+            variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            if image_format == 'jpeg' and variant.mode != 'RGB':
+                variant = variant.convert('RGB')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f'{path}.part'
+            variant.save(partial, **SAVE_OPTIONS[image_format])
+            os.replace(partial, path)
+    return sorted(targets)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from users.models import UserProfile, normalize_search
+
+
+class Command(BaseCommand):
+    help = 'Recompute the normalized username/full-name columns used by the user directory search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch, updated = [], 0
+        profiles = UserProfile.objects.select_related('user').only('id', 'full_name', 'user__username')
+        for profile in profiles.iterator(chunk_size=options['batch_size']):
+            profile.search_username = normalize_search(profile.user.username)
+            profile.search_name = normalize_search(profile.full_name)
+            batch.append(profile)
+            if len(batch) >= options['batch_size']:
+                updated += self.flush(batch)
+        updated += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {updated} profiles'))
+
+    def flush(self, batch):
+        UserProfile.objects.bulk_update(batch, ['search_username', 'search_name'])
+        count = len(batch)
+        batch.clear()
+        return count
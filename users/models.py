@@ -1,20 +1,57 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+# Upper bound for an index range scan over every string with a given prefix.
+PREFIX_END = '\U0010ffff'
+
+def normalize_search(value):
+    return ' '.join((value or '').casefold().split())
+
+def prefix_q(field, prefix):
+    # A range comparison rather than LIKE, so the lookup can use the column's index.
+    return models.Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + PREFIX_END})
+
+def projection_key(user_id):
+    return f'users:projection:{user_id}'
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     full_name = models.CharField(max_length=255)
     bio = models.TextField(blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # sha256 of the current original and the storage names of its resized
+    # variants ({size: {format: name}}), filled in once they are rendered.
+    picture_hash = models.CharField(max_length=64, blank=True, default='')
+    picture_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Case-folded copies for indexed prefix search in the user directory.
+    search_username = models.CharField(max_length=150, blank=True, default='', db_index=True)
+    search_name = models.CharField(max_length=255, blank=True, default='', db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.search_username = normalize_search(self.user.username)
+        self.search_name = normalize_search(self.full_name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.full_name
 
+class RevokedToken(models.Model):
+    """A refresh token that may no longer be used, kept until it would have expired anyway."""
+
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -22,4 +59,9 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    instance.profile.save()
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_user_projection(sender, instance, **kwargs):
+    cache.delete(projection_key(instance.pk if sender is User else instance.user_id))
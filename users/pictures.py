@@ -0,0 +1,128 @@
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from .imaging import inspect_image, render_variants
+from .models import UserProfile, projection_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SIZES': {'small': 64, 'medium': 256, 'large': 512},
+    'FORMATS': ['webp', 'jpeg'],
+    'MAX_PIXELS': 40_000_000,
+    'WORKERS': 2,
+    # False renders variants inline, which is handy in tests and scripts.
+    'ASYNC': True,
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+DIRECTORY = 'profile_pictures'
+
+_pool = None
+
+
+def get_option(name):
+    return getattr(settings, 'PROFILE_PICTURES', {}).get(name, DEFAULTS[name])
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=get_option('WORKERS'))
+    return _pool
+
+
+def content_hash(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def variant_names(digest):
+    """{size name: {format: storage name}}; names depend only on the content hash."""
+    return {
+        label: {
+            image_format: f'{DIRECTORY}/{digest[:2]}/{digest}/{size}.{image_format}'
+            for image_format in get_option('FORMATS')
+        }
+        for label, size in get_option('SIZES').items()
+    }
+
+
+def store_upload(upload):
+    """Validate and store an upload under its content hash; return (digest, original name)."""
+    image_format, _, _ = inspect_image(upload, get_option('MAX_PIXELS'))
+    digest = content_hash(upload)
+    name = f'{DIRECTORY}/{digest[:2]}/{digest}/original.{EXTENSIONS[image_format]}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, upload)
+    return digest, name
+
+
+def schedule_variants(profile_id, digest, original):
+    names = variant_names(digest)
+    if all(default_storage.exists(name) for formats in names.values() for name in formats.values()):
+        # The same image was uploaded before; its variants are already there.
+        finish_variants(profile_id, digest, names)
+        return
+    sizes = get_option('SIZES')
+    targets = {
+        (sizes[label], image_format): default_storage.path(name)
+        for label, formats in names.items()
+        for image_format, name in formats.items()
+    }
+    source = default_storage.path(original)
+    if not get_option('ASYNC'):
+        render_variants(source, targets)
+        finish_variants(profile_id, digest, names)
+        return
+    future = get_pool().submit(render_variants, source, targets)
+    future.add_done_callback(lambda done: _on_rendered(done, profile_id, digest, names))
+
+
+def _on_rendered(future, profile_id, digest, names):
+    # Runs on the executor's management thread, outside any request.
+    try:
+        future.result()
+        finish_variants(profile_id, digest, names)
+    except Exception:
+        logger.exception('Rendering profile picture variants for profile %s failed', profile_id)
+    finally:
+        close_old_connections()
+
+
+def finish_variants(profile_id, digest, names):
+    # Only if the picture hasn't been replaced while the variants were rendering.
+    updated = UserProfile.objects.filter(pk=profile_id, picture_hash=digest).update(picture_variants=names)
+    if updated:
+        user_id = UserProfile.objects.filter(pk=profile_id).values_list('user_id', flat=True).first()
+        cache.delete(projection_key(user_id))
+
+
+def variant_urls(variants):
+    return {
+        label: {image_format: default_storage.url(name) for image_format, name in formats.items()}
+        for label, formats in variants.items()
+    }
+
+
+def primary_url(variants):
+    """The single picture URL older clients get: a medium JPEG."""
+    formats = variants.get('medium') or next(iter(variants.values()), {})
+    name = formats.get('jpeg') or next(iter(formats.values()), None)
+    return default_storage.url(name) if name else None
+
+
+def remove_picture(profile):
+    profile.profile_picture = None
+    profile.picture_hash = ''
+    profile.picture_variants = {}
+    profile.save()
+
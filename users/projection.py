@@ -0,0 +1,90 @@
+from django.core.cache import cache
+
+from .models import projection_key
+from .pictures import primary_url, variant_urls
+
+# Projections hold relative media URLs; they are made absolute per request.
+# Writes delete the entry; with a per-process cache other workers only see
+# the change when their copy expires, which is why deploys need a shared cache.
+PROJECTION_TIMEOUT = 60 * 60
+MEMO_KEY = '_user_projections'
+
+
+def build_projection(user):
+    try:
+        profile = user.profile
+    except user._meta.model.profile.RelatedObjectDoesNotExist:
+        profile = None
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'profile': profile and {
+            'full_name': profile.full_name,
+            'bio': profile.bio,
+            'location': profile.location,
+            # Variants only; the original upload is never served to clients.
+            'profile_picture': primary_url(profile.picture_variants),
+            'profile_picture_variants': variant_urls(profile.picture_variants),
+        },
+    }
+
+
+def directory_entry(data):
+    """The part of a projection any signed-in user may see of others: no email, bio or location."""
+    profile = data['profile']
+    return {
+        'id': data['id'],
+        'username': data['username'],
+        'first_name': data['first_name'],
+        'last_name': data['last_name'],
+        'profile': profile and {
+            'full_name': profile['full_name'],
+            'profile_picture': profile['profile_picture'],
+            'profile_picture_variants': profile['profile_picture_variants'],
+        },
+    }
+
+
+def _memo(context):
+    # Shared by every nested serializer under one root, so a user who appears
+    # on many rows of a response is looked up once.
+    return context.setdefault(MEMO_KEY, {}) if isinstance(context, dict) else {}
+
+
+def get_projections(users, context):
+    memo = _memo(context)
+    missing = [user for user in users if user.pk not in memo]
+    if not missing:
+        return
+    cached = cache.get_many([projection_key(user.pk) for user in missing])
+    fresh = {}
+    for user in missing:
+        data = cached.get(projection_key(user.pk))
+        if data is None:
+            data = fresh[projection_key(user.pk)] = build_projection(user)
+        memo[user.pk] = data
+    if fresh:
+        cache.set_many(fresh, PROJECTION_TIMEOUT)
+
+
+def project(user, context):
+    memo = _memo(context)
+    if user.pk not in memo:
+        get_projections([user], context)
+    data = memo[user.pk]
+    request = context.get('request')
+    profile = data['profile']
+    if request is None or not profile or not profile['profile_picture']:
+        return data
+    absolute = request.build_absolute_uri
+    return {**data, 'profile': {
+        **profile,
+        'profile_picture': absolute(profile['profile_picture']),
+        'profile_picture_variants': {
+            label: {image_format: absolute(url) for image_format, url in formats.items()}
+            for label, formats in profile['profile_picture_variants'].items()
+        },
+    }}
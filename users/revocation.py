@@ -0,0 +1,108 @@
+"""Refresh-token revocation: a jti table fronted by an in-memory Bloom filter."""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+DEFAULTS = {
+    'FALSE_POSITIVE_RATE': 0.001,
+    # The filter is rebuilt from scratch this often, dropping expired entries.
+    'REBUILD_SECONDS': 300,
+    'MIN_CAPACITY': 1024,
+}
+
+
+def get_option(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, DEFAULTS[name])
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing: k positions from two independent 64-bit halves.
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationStore:
+    """Per-process view of the revocation table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._built_at = 0.0
+        self._last_pk = 0
+
+    def _rebuild(self):
+        rows = list(
+            RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('pk', 'jti')
+        )
+        bloom = BloomFilter(max(len(rows) * 2, get_option('MIN_CAPACITY')), get_option('FALSE_POSITIVE_RATE'))
+        for _, jti in rows:
+            bloom.add(jti)
+        self._filter = bloom
+        self._last_pk = max((pk for pk, _ in rows), default=self._last_pk)
+        self._built_at = time.monotonic()
+
+    def _catch_up(self):
+        rows = RevokedToken.objects.filter(pk__gt=self._last_pk).values_list('pk', 'jti')
+        for pk, jti in rows:
+            self._filter.add(jti)
+            self._last_pk = max(self._last_pk, pk)
+        if self._filter.count > self._filter.capacity:
+            # Past capacity the false-positive rate climbs; resize.
+            self._rebuild()
+
+    def sync(self):
+        with self._lock:
+            if self._filter is None or time.monotonic() - self._built_at > get_option('REBUILD_SECONDS'):
+                self._rebuild()
+            else:
+                # Ids only grow, so the newest one seen is this process's
+                # generation: one range query on the primary key picks up
+                # revocations made by any worker.
+                self._catch_up()
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti, exp, user_id=None):
+        """Record a revocation; False if the jti was already revoked."""
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(
+                    jti=jti, user_id=user_id,
+                    expires_at=datetime.fromtimestamp(exp, tz=dt_timezone.utc),
+                )
+        except IntegrityError:
+            return False
+        return True
+
+
+store = RevocationStore()
@@ -1,15 +1,46 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
 from .models import UserProfile
+from .projection import directory_entry, get_projections, project
+from .tokens import RevocableRefreshToken
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['full_name', 'bio', 'location', 'profile_picture']
 
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, 'all') else data)
+        # One cache round trip for the whole page instead of one per user.
+        get_projections(users, self.context)
+        return super().to_representation(users)
+
 class UserSerializer(serializers.ModelSerializer):
+    """Read-only representation of a user and profile, served from a cached projection."""
+
     profile = UserProfileSerializer(read_only=True)
     
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'profile']
\ No newline at end of file
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'profile']
+        list_serializer_class = UserListSerializer
+
+    def to_representation(self, instance):
+        return project(instance, self.context)
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
+class RevokeTokenSerializer(TokenBlacklistSerializer):
+    token_class = RevocableRefreshToken
+
+class UserDirectorySerializer(UserSerializer):
+    """A user as listed in the directory, which every signed-in user can page through."""
+
+    class Meta(UserSerializer.Meta):
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile']
+
+    def to_representation(self, instance):
+        return directory_entry(super().to_representation(instance))
@@ -1,3 +1,269 @@
-from django.test import TestCase
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from emsAPI.media import serve_media
+from emsAPI.testing import BudgetTestMixin, Case
+from events.management.commands._bench import seed
+from .checks import check_shared_cache
+from .models import RevokedToken
+from .revocation import BloomFilter, RevocationStore
+from .serializers import UserSerializer
+from .tokens import RevocableRefreshToken
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png_upload():
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), 'teal').save(buffer, 'PNG')
+    buffer.seek(0)
+    buffer.name = 'avatar.png'
+    return buffer
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    MEDIA_ROOT=MEDIA_ROOT,
+    PROFILE_PICTURES={'ASYNC': False},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class UserRouteBudgetTests(BudgetTestMixin, TestCase):
+    """Query and latency budgets for every route in users/urls.py."""
+
+    urlconf = 'users.urls'
+    baseline_path = Path(__file__).with_name('query_baselines.json')
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(users=60, events=10, rsvps_per_event=2, reviews_per_event=1)
+        member = User.objects.create_user('member', password='pw', first_name='Mem', last_name='Ber')
+        cls.users = {'member': member}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def cases(self):
+        refresh = lambda: str(RefreshToken.for_user(self.users['member']))
+        return [
+            Case('token_obtain_pair', 'POST', '/api/auth/token/', 200, 1,
+                 data={'username': 'member', 'password': 'pw'}),
+            Case('token_refresh', 'POST', '/api/auth/token/refresh/', 200, 5, data={'refresh': refresh()}),
+            Case('token_revoke', 'POST', '/api/auth/token/revoke/', 200, 4, data={'refresh': refresh()}),
+            Case('user-directory', 'GET', '/api/auth/users/', 200, 2, user='member', latency_ms=40),
+            Case('user-directory', 'GET', '/api/auth/users/', 200, 2, user='member', label='prefix',
+                 data={'q': 'bench 1'}, latency_ms=40),
+            Case('profile-picture', 'PUT', '/api/auth/users/me/picture/', 202, 5, user='member',
+                 data={'picture': png_upload()}, format='multipart'),
+            Case('profile-picture', 'DELETE', '/api/auth/users/me/picture/', 204, 2, user='member'),
+        ]
+
+    def test_directory_uses_cached_projections(self):
+        authorization = self.authorization('member')
+        self.client.get('/api/auth/users/', HTTP_AUTHORIZATION=authorization)
+        # Warm projections leave only the user and the page query.
+        with self.assertNumQueries(2):
+            self.client.get('/api/auth/users/', HTTP_AUTHORIZATION=authorization)
+
+    def test_directory_does_not_expose_emails(self):
+        User.objects.filter(username='member').update(email='member@example.com')
+        response = self.client.get('/api/auth/users/', {'q': 'mem'}, HTTP_AUTHORIZATION=self.authorization('member'))
+        entry = response.json()['results'][0]
+        self.assertEqual(entry['username'], 'member')
+        self.assertNotIn('email', entry)
+        self.assertEqual(set(entry['profile']), {'full_name', 'profile_picture', 'profile_picture_variants'})
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class TokenRevocationTests(TestCase):
+    """Refresh rotation and revocation through the Bloom-filtered RevokedToken table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', password='pw')
+
+    def setUp(self):
+        cache.clear()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': token}, content_type='application/json')
+
+    def test_refresh_rotates_and_old_token_is_rejected(self):
+        tokens = self.client.post(
+            '/api/auth/token/', {'username': 'member', 'password': 'pw'}, content_type='application/json'
+        ).json()
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()['refresh']
+        self.assertNotEqual(rotated, tokens['refresh'])
+
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_revoke_endpoint(self):
+        token = str(RefreshToken.for_user(self.user))
+        response = self.client.post('/api/auth/token/revoke/', {'refresh': token}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(
+            self.client.post('/api/auth/token/revoke/', {'refresh': token}, content_type='application/json').status_code,
+            401,
+        )
+
+    def test_racing_refreshes_rotate_once(self):
+        token = str(RefreshToken.for_user(self.user))
+        # Both requests verified the token before either revoked it.
+        first, second = RevocableRefreshToken(token), RevocableRefreshToken(token)
+        first.blacklist()
+        with self.assertRaises(TokenError):
+            second.blacklist()
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        values = [f'jti-{index}' for index in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_workers_catch_up_through_the_table(self):
+        expires = (timezone.now() + timedelta(days=1)).timestamp()
+        this, other = RevocationStore(), RevocationStore()
+        self.assertFalse(other.is_revoked('a'))
+        this.revoke('a', expires)
+        # The other worker is within REBUILD_SECONDS and shares no cache with
+        # this one, but still sees the revocation.
+        cache.clear()
+        self.assertTrue(other.is_revoked('a'))
+        # An unrevoked token costs one primary key range query, not a jti lookup.
+        with self.assertNumQueries(1):
+            self.assertFalse(other.is_revoked('b'))
+        self.assertFalse(this.revoke('a', expires))
+
+    @override_settings(TOKEN_REVOCATION={'REBUILD_SECONDS': 0})
+    def test_rebuild_drops_expired_revocations(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti='expired', expires_at=now - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(days=1))
+        store = RevocationStore()
+        store.sync()
+        self.assertNotIn('expired', store._filter)
+        self.assertIn('live', store._filter)
+
+        call_command('prune_revoked_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+
+@override_settings(
+    ADMISSION_CONTROL={'ENABLED': False},
+    MEDIA_ROOT=MEDIA_ROOT,
+    PROFILE_PICTURES={'ASYNC': False},
+)
+class ProfilePictureTests(TestCase):
+    """Uploads stored by content hash, their rendered variants and removal."""
+
+    PATH = '/api/auth/users/me/picture/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', first_name='Mem', last_name='Ber')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.member)}'}
+
+    def put(self, picture):
+        # The test client only encodes multipart bodies for POST.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(
+                self.PATH, encode_multipart(BOUNDARY, {'picture': picture}), content_type=MULTIPART_CONTENT, **self.auth
+            )
+
+    def serialized_profile(self):
+        return UserSerializer(User.objects.select_related('profile').get(pk=self.member.pk)).data['profile']
+
+    def test_upload_is_stored_under_its_hash_with_variants(self):
+        picture = png_upload()
+        digest = hashlib.sha256(picture.getvalue()).hexdigest()
+        response = self.put(picture)
+        self.assertEqual(response.status_code, 202)
+
+        profile = self.member.profile
+        profile.refresh_from_db()
+        self.assertEqual(profile.picture_hash, digest)
+        self.assertEqual(profile.profile_picture.name, f'profile_pictures/{digest[:2]}/{digest}/original.png')
+        self.assertTrue(default_storage.exists(profile.profile_picture.name))
+
+        data = self.serialized_profile()
+        self.assertEqual(set(data['profile_picture_variants']), {'small', 'medium', 'large'})
+        for label, size in (('small', 64), ('medium', 256), ('large', 512)):
+            for image_format in ('webp', 'jpeg'):
+                name = f'profile_pictures/{digest[:2]}/{digest}/{size}.{image_format}'
+                self.assertEqual(data['profile_picture_variants'][label][image_format], default_storage.url(name))
+                with Image.open(default_storage.path(name)) as image:
+                    self.assertLessEqual(max(image.size), size)
+        self.assertEqual(data['profile_picture'], data['profile_picture_variants']['medium']['jpeg'])
+
+    def test_unusable_uploads_are_rejected(self):
+        text = io.BytesIO(b'not an image')
+        text.name = 'notes.txt'
+        self.assertEqual(self.put(text).status_code, 400)
+        self.assertEqual(self.client.put(self.PATH, **self.auth).status_code, 400)
+        with self.settings(PROFILE_PICTURES={'ASYNC': False, 'MAX_PIXELS': 1000}):
+            response = self.put(png_upload())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Image is too large')
+        self.assertFalse(User.objects.filter(profile__picture_hash__gt='').exists())
+
+    def test_delete_removes_the_picture(self):
+        self.put(png_upload())
+        self.assertEqual(self.client.delete(self.PATH, **self.auth).status_code, 204)
+        profile = self.member.profile
+        profile.refresh_from_db()
+        self.assertEqual((profile.picture_hash, profile.picture_variants), ('', {}))
+        self.assertFalse(profile.profile_picture)
+        self.assertIsNone(self.serialized_profile()['profile_picture'])
+
+    def test_hashed_media_is_cached_forever(self):
+        digest = '0' * 64
+        default_storage.save(f'profile_pictures/00/{digest}/64.jpeg', io.BytesIO(b'jpeg'))
+        default_storage.save('notes/plain.txt', io.BytesIO(b'text'))
+        request = RequestFactory().get('/media/')
+        hashed = serve_media(request, f'profile_pictures/00/{digest}/64.jpeg', document_root=MEDIA_ROOT)
+        self.assertEqual(hashed['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertFalse(serve_media(request, 'notes/plain.txt', document_root=MEDIA_ROOT).has_header('Cache-Control'))
+
+class SharedCacheCheckTests(TestCase):
+    def test_deploys_need_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['users.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
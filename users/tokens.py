@@ -0,0 +1,25 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import store
+
+
+class RevocableRefreshToken(RefreshToken):
+    """A refresh token checked against the revocation store, which `blacklist()` also writes to."""
+
+    def verify(self, *args, **kwargs):
+        if store.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is revoked'))
+        super().verify(*args, **kwargs)
+
+    def blacklist(self):
+        revoked = store.revoke(
+            self.payload[api_settings.JTI_CLAIM],
+            self.payload['exp'],
+            self.payload.get(api_settings.USER_ID_CLAIM),
+        )
+        if not revoked:
+            # Two refreshes racing with the same token: only the first may rotate it.
+            raise TokenError(_('Token is revoked'))
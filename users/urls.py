@@ -1,7 +1,11 @@
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenRefreshView
+from .views import ProfilePictureView, ThrottledTokenObtainPairView, UserDirectoryView
 
 urlpatterns = [
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/revoke/', TokenBlacklistView.as_view(), name='token_revoke'),
+    path('users/', UserDirectoryView.as_view(), name='user-directory'),
+    path('users/me/picture/', ProfilePictureView.as_view(), name='profile-picture'),
 ]
\ No newline at end of file
@@ -1,3 +1,72 @@
-from django.shortcuts import render
+from django.contrib.auth.models import User
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from rest_framework import generics, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
 
-# Create your views here.
+from emsAPI.throttling import TokenObtainBucketThrottle
+from .models import UserProfile, normalize_search, prefix_q
+from .pictures import remove_picture, schedule_variants, store_upload
+from .pagination import UserDirectoryPagination
+from .serializers import UserDirectorySerializer, UserSerializer
+
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    throttle_classes = [TokenObtainBucketThrottle]
+
+
+class UserDirectoryView(generics.ListAPIView):
+    serializer_class = UserDirectorySerializer
+    pagination_class = UserDirectoryPagination
+    filter_backends = []
+
+    def get_queryset(self):
+        queryset = User.objects.filter(is_active=True).select_related('profile')
+        prefix = normalize_search(self.request.query_params.get('q'))
+        if prefix:
+            queryset = queryset.filter(
+                prefix_q('profile__search_username', prefix) | prefix_q('profile__search_name', prefix)
+            )
+        return queryset
+
+
+class ProfilePictureView(APIView):
+    """Upload (PUT, multipart `picture`) or remove (DELETE) the current user's picture."""
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def dispatch(self, request, *args, **kwargs):
+        # Must be set before DRF wraps the request and anything reads the body.
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().dispatch(request, *args, **kwargs)
+
+    def put(self, request):
+        upload = request.FILES.get('picture')
+        if upload is None:
+            return Response({'error': 'Upload an image in the "picture" field'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            digest, original = store_upload(upload)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        profile, _ = UserProfile.objects.get_or_create(
+            user=request.user, defaults={'full_name': request.user.get_full_name()}
+        )
+        if profile.picture_hash != digest:
+            profile.profile_picture = original
+            profile.picture_hash = digest
+            profile.picture_variants = {}
+            profile.save()
+        transaction.on_commit(lambda: schedule_variants(profile.pk, digest, original))
+        user = User.objects.select_related('profile').get(pk=request.user.pk)
+        return Response(UserSerializer(user, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+    def delete(self, request):
+        profile = UserProfile.objects.filter(user=request.user).first()
+        if profile is not None and profile.picture_hash:
+            remove_picture(profile)
+        return Response(status=status.HTTP_204_NO_CONTENT)